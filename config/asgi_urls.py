@@ -0,0 +1,24 @@
+"""
+URL configuration for requests served over ASGI.
+
+The feed, post, comment and profile pages are served by their async
+views, which read from the database with the async ORM. Every other URL
+is routed as in config.urls.
+"""
+from django.urls import path
+
+from mainfeed import views as mainfeed_views
+from userprofile import views as userprofile_views
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('', mainfeed_views.AsyncPostList.as_view(), name='feed'),
+    path('view-post/<int:post_id>',
+         mainfeed_views.async_view_post, name='view_post'),
+    path('view-post/<int:post_id>/view-comment/<int:comment_id>',
+         mainfeed_views.async_view_comment, name='view_comment'),
+    path('user-profile/<int:user_profile_id>',
+         userprofile_views.async_view_user_profile, name='user_profile'),
+    *sync_urlpatterns,
+]
@@ -1,7 +1,9 @@
 from django.contrib import admin
 
-from .models import Comment, Post
+from .models import Comment, PendingUpload, Post, Tag
 
 # Register your models here.
 admin.site.register(Post)
 admin.site.register(Comment)
+admin.site.register(PendingUpload)
+admin.site.register(Tag)
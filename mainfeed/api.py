@@ -0,0 +1,388 @@
+import json
+from functools import wraps
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (Http404, HttpResponse, HttpResponseNotAllowed,
+                         StreamingHttpResponse)
+from django.shortcuts import get_object_or_404, reverse
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition
+from userprofile.models import UserProfile
+
+from .conditional import feed_etag, post_etag, profile_etag
+from .models import Comment, ImageStatus, Post
+from .pagination import InvalidCursor, KeysetPaginator
+from .templatetags.responsive_images import IMAGE_WIDTHS, image_url
+
+# The number of posts in a page when the client does not ask for a size,
+# and the most it may ask for.
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+# Comments are streamed, so a page of them may be much larger.
+DEFAULT_COMMENT_PAGE_SIZE = 100
+MAX_COMMENT_PAGE_SIZE = 1000
+
+# How many comments are read from the database, and sent, at once while
+# streaming.
+COMMENT_STREAM_CHUNK_SIZE = 200
+
+
+class ApiError(Exception):
+    """Raised when an API request cannot be served.
+
+    The message is sent to the client along with the status code.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def dumps(data):
+    """Serialises data as compact JSON."""
+
+    return json.dumps(data, cls=DjangoJSONEncoder, ensure_ascii=False,
+                      separators=(",", ":"))
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), status=status,
+                        content_type="application/json")
+
+
+def api_view(view):
+    """Makes a view an API endpoint.
+
+    Only GET and HEAD requests are served. Responses are compressed when
+    the client accepts gzip, and errors are sent as JSON objects holding
+    their message.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return json_response({"error": str(error)}, error.status)
+        except Http404:
+            return json_response({"error": "Not found."}, 404)
+
+    return gzip_page(wrapper)
+
+
+def serialize_author(profile):
+    return {"id": profile.id, "username": profile.user.username}
+
+
+def serialize_image(image):
+    return image_url(image, max(IMAGE_WIDTHS)) if image else None
+
+
+def serialize_post_image(post):
+    if post.image_status != ImageStatus.READY:
+        return None
+    return {
+        "url": serialize_image(post.image),
+        "width": post.image_width,
+        "height": post.image_height,
+        "placeholder": post.placeholder_colour or None,
+    }
+
+
+# The fields of each resource and how each is read from its object. Only
+# the fields a client selects are read.
+POST_FIELDS = {
+    "id": lambda post, request: post.id,
+    "author": lambda post, request: serialize_author(post.author),
+    "text": lambda post, request: post.text,
+    "tags": lambda post, request: [tag.name for tag in post.tags.all()],
+    "image": lambda post, request: serialize_post_image(post),
+    "image_status": lambda post, request: post.image_status,
+    "comment_count": lambda post, request: post.comment_count,
+    "created_on": lambda post, request: post.created_on,
+    "updated_on": lambda post, request: post.updated_on,
+    "url": lambda post, request: request.build_absolute_uri(
+        reverse('view_post', args=[post.id])),
+}
+
+COMMENT_FIELDS = {
+    "id": lambda comment, request: comment.id,
+    "post": lambda comment, request: comment.post_id,
+    "author": lambda comment, request: serialize_author(comment.author),
+    "body": lambda comment, request: comment.body,
+    "created_on": lambda comment, request: comment.created_on,
+    "updated_on": lambda comment, request: comment.updated_on,
+}
+
+PROFILE_FIELDS = {
+    "id": lambda profile, request: profile.id,
+    "username": lambda profile, request: profile.user.username,
+    "bio": lambda profile, request: profile.bio,
+    "image": lambda profile, request: serialize_image(profile.image),
+    "updated_on": lambda profile, request: profile.updated_on,
+    "posts": lambda profile, request: request.build_absolute_uri(
+        reverse('api_feed') + f"?author={profile.id}"),
+    "url": lambda profile, request: request.build_absolute_uri(
+        reverse('user_profile', args=[profile.id])),
+}
+
+
+def selected_fields(request, fields):
+    """Gets the fields the client selected with the fields parameter.
+
+    Args:
+        request (HttpRequest): The request, which may include a comma
+        separated list of fields.
+        fields (dict): The fields of the resource requested.
+
+    Returns:
+        list: the names of the selected fields, or of every field if none
+        were selected.
+
+    Raises:
+        ApiError: if a selected field does not exist.
+    """
+
+    requested = request.GET.get("fields")
+    if not requested:
+        return list(fields)
+    names = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown:
+        raise ApiError("Unknown fields: " + ", ".join(unknown))
+    return [name for name in fields if name in names]
+
+
+def serialize(obj, fields, names, request):
+    return {name: fields[name](obj, request) for name in names}
+
+
+def page_size(request, default, maximum):
+    """Gets the page size the client asked for with the limit parameter.
+
+    Raises:
+        ApiError: if the limit is not a number from 1 to maximum.
+    """
+
+    limit = request.GET.get("limit")
+    if limit is None:
+        return default
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ApiError("The limit must be a number.")
+    if not 1 <= limit <= maximum:
+        raise ApiError(f"The limit must be from 1 to {maximum}.")
+    return limit
+
+
+@api_view
+@condition(etag_func=feed_etag)
+def api_feed(request):
+    """Handles a request for a page of the feed as JSON.
+
+    Published posts are listed newest first and paged by the after and
+    before cursors, like the HTML feed. The author parameter lists only
+    the posts of one profile.
+
+    Args:
+        request (HttpRequest): The request, which may include cursors, a
+        limit, an author and the fields to include.
+
+    Returns:
+        HttpResponse: the posts on the page and the cursors of the pages
+        either side of it.
+    """
+
+    names = selected_fields(request, POST_FIELDS)
+    posts = Post.objects.published().with_authors()
+    if "tags" in names:
+        posts = posts.prefetch_related("tags")
+    author = request.GET.get("author")
+    if author is not None:
+        if not author.isdigit():
+            raise ApiError("The author must be a profile id.")
+        posts = posts.filter(author_id=author)
+
+    paginator = KeysetPaginator(
+        posts, page_size(request, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    try:
+        page = paginator.page(after=request.GET.get("after"),
+                              before=request.GET.get("before"))
+    except InvalidCursor as error:
+        raise ApiError(f"Invalid cursor: {error}")
+
+    return json_response({
+        "data": [serialize(post, POST_FIELDS, names, request)
+                 for post in page],
+        "next": page.next_cursor,
+        "previous": page.previous_cursor,
+    })
+
+
+@api_view
+@condition(etag_func=post_etag)
+def api_post(request, post_id):
+    """Handles a request for a post as JSON.
+
+    Args:
+        request (HttpRequest): The request, which may include the fields
+        to include.
+        post_id (int): The id of the post.
+
+    Returns:
+        HttpResponse: the post.
+    """
+
+    names = selected_fields(request, POST_FIELDS)
+    posts = Post.objects.with_authors()
+    if "tags" in names:
+        posts = posts.prefetch_related("tags")
+    post = get_object_or_404(posts, pk=post_id)
+    return json_response({
+        "data": serialize(post, POST_FIELDS, names, request),
+    })
+
+
+class CommentPageEncoder:
+    """Encodes a page of comments as JSON, one comment at a time, as they
+    are read while streaming.
+
+    The limit's worth of comments is followed by one more comment if there
+    is a next page, whose cursor is then encoded last.
+    """
+
+    start = '{"data":['
+
+    def __init__(self, paginator, limit, names, request):
+        self.paginator = paginator
+        self.limit = limit
+        self.names = names
+        self.request = request
+        self.count = 0
+        self.last = None
+        self.next_cursor = None
+
+    def add(self, comment):
+        """Encodes the next comment read.
+
+        Returns:
+            Union[str, None]: the encoded comment, or None once the page
+            is full and no more comments should be read.
+        """
+
+        if self.count == self.limit:
+            self.next_cursor = self.paginator.encode_cursor(self.last)
+            return None
+        data = dumps(serialize(comment, COMMENT_FIELDS, self.names,
+                               self.request))
+        part = f",{data}" if self.count else data
+        self.last = comment
+        self.count += 1
+        return part
+
+    def end(self):
+        return f'],"next":{dumps(self.next_cursor)}}}'
+
+
+@api_view
+@condition(etag_func=post_etag)
+def api_comments(request, post_id):
+    """Handles a request for a page of a post's comments as JSON.
+
+    Comments are listed oldest first and paged by the after cursor. The
+    page is streamed as it is read from the database, a chunk of comments
+    at a time, so large pages are never held in memory. The cursor of the
+    next page is only known once the page is read, so it comes last.
+
+    Over ASGI the page is read by an async generator, as ASGI servers read
+    a sync iterator in full before sending any of it. Each chunk is sent
+    as one piece, since GZipMiddleware compresses each piece of an async
+    response on its own.
+
+    Args:
+        request (HttpRequest): The request, which may include a cursor, a
+        limit and the fields to include.
+        post_id (int): The id of the post whose comments to list.
+
+    Returns:
+        StreamingHttpResponse: the comments on the page and the cursor of
+        the next page.
+    """
+
+    names = selected_fields(request, COMMENT_FIELDS)
+    limit = page_size(request, DEFAULT_COMMENT_PAGE_SIZE,
+                      MAX_COMMENT_PAGE_SIZE)
+    if not Post.objects.filter(pk=post_id).exists():
+        raise Http404("No post matches the given query.")
+
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author__user')
+    paginator = KeysetPaginator(comments, limit,
+                                ordering=Comment.THREAD_ORDERING)
+    try:
+        queryset = paginator.page_queryset(after=request.GET.get("after"))
+    except InvalidCursor as error:
+        raise ApiError(f"Invalid cursor: {error}")
+
+    page = CommentPageEncoder(paginator, limit, names, request)
+    rows = queryset[:limit + 1]
+
+    def stream():
+        parts = [page.start]
+        for comment in rows.iterator(chunk_size=COMMENT_STREAM_CHUNK_SIZE):
+            part = page.add(comment)
+            if part is None:
+                break
+            parts.append(part)
+            if page.count % COMMENT_STREAM_CHUNK_SIZE == 0:
+                yield "".join(parts)
+                parts = []
+        parts.append(page.end())
+        yield "".join(parts)
+
+    async def astream():
+        parts = [page.start]
+        async for comment in rows.aiterator(
+                chunk_size=COMMENT_STREAM_CHUNK_SIZE):
+            part = page.add(comment)
+            if part is None:
+                break
+            parts.append(part)
+            if page.count % COMMENT_STREAM_CHUNK_SIZE == 0:
+                yield "".join(parts)
+                parts = []
+        parts.append(page.end())
+        yield "".join(parts)
+
+    content = astream() if isinstance(request, ASGIRequest) else stream()
+    return StreamingHttpResponse(content, content_type="application/json")
+
+
+@api_view
+@condition(etag_func=profile_etag)
+def api_profile(request, user_profile_id):
+    """Handles a request for a user profile as JSON.
+
+    The profile's posts are listed by the feed endpoint, linked to as
+    posts.
+
+    Args:
+        request (HttpRequest): The request, which may include the fields
+        to include.
+        user_profile_id (int): The id of the profile.
+
+    Returns:
+        HttpResponse: the profile.
+    """
+
+    names = selected_fields(request, PROFILE_FIELDS)
+    profile = get_object_or_404(
+        UserProfile.objects.select_related('user'), pk=user_profile_id)
+    return json_response({
+        "data": serialize(profile, PROFILE_FIELDS, names, request),
+    })
@@ -1,6 +1,61 @@
+from allauth.account.apps import AccountConfig
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+# The migration creating the search index.
+SEARCH_INDEX_MIGRATION = ("mainfeed", "0016_search_index")
+
+# The account middleware allauth needs, in place of its own.
+ACCOUNT_MIDDLEWARE = "mainfeed.middleware.AsyncAccountMiddleware"
 
 
 class MainfeedConfig(AppConfig):
+    default = True
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mainfeed'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .instrumentation import install_query_recorder
+
+        connection_created.connect(install_query_recorder)
+        post_migrate.connect(reinstall_search_index, sender=self)
+
+
+class AllauthAccountConfig(AccountConfig):
+    """Allauth's account app, checking for the site's account middleware.
+
+    Allauth requires its own middleware to be installed, but it only
+    supports sync middleware chains. The site installs its async-capable
+    subclass instead, which is required here in its place.
+    """
+
+    def ready(self):
+        if ACCOUNT_MIDDLEWARE not in settings.MIDDLEWARE:
+            raise ImproperlyConfigured(
+                f"{ACCOUNT_MIDDLEWARE} must be added to settings.MIDDLEWARE")
+
+
+def reinstall_search_index(sender, using, plan=None, **kwargs):
+    """Installs the search index again after migrations were applied.
+
+    SQLite migrations drop the triggers maintaining the index whenever
+    they rebuild a table, so they are restored and the index rebuilt.
+    Nothing is done until the migration creating the index has run.
+    """
+
+    from .search import install_search_index
+
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+    if not any(not backwards for _, backwards in plan or []):
+        return
+    if SEARCH_INDEX_MIGRATION in (MigrationRecorder(connection)
+                                  .applied_migrations()):
+        install_search_index(connection)
@@ -0,0 +1,155 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY, get_user)
+from django.core.cache import cache
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.crypto import constant_time_compare
+from django.db import transaction
+
+FEED_VERSION_KEY = "feed:version"
+USERNAMES_VERSION_KEY = "usernames:version"
+
+
+def post_comments_version_key(post_id):
+    """Gets the key of the version counter for a post's comments."""
+
+    return f"post:{post_id}:comments:version"
+
+
+def user_cache_key(user_id):
+    """Gets the key a signed-in user is cached under between requests."""
+
+    return f"user:{user_id}"
+
+
+def get_versions(keys):
+    """Gets the current values of version counters held in the cache.
+
+    Cached content is stored under keys that include a version, so moving
+    a version on discards everything stored under the old one. A missing
+    counter starts from the current time, so a counter lost from the cache
+    is never restarted at a number already used by stored content.
+
+    Args:
+        keys (list): The keys of the version counters.
+
+    Returns:
+        dict: the version held by each key.
+    """
+
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def bump_version(key):
+    """Moves a version counter on to discard content stored under it.
+
+    The version is bumped straight away, so this process stops serving the
+    old content. It is bumped again once the current transaction commits,
+    so content rendered from uncommitted data is discarded as well.
+    """
+
+    _increment(key)
+    transaction.on_commit(lambda: _increment(key))
+
+
+def _increment(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        get_versions([key])
+
+
+def invalidate_feed():
+    """Discards every rendered feed page."""
+
+    bump_version(FEED_VERSION_KEY)
+
+
+def feed_page_cache_key(request):
+    """Gets the key a rendered feed page is stored under for a request.
+
+    Pages are keyed by the feed version, the path and query selecting the
+    page and the viewer. Anonymous viewers share pages, while authenticated
+    viewers see their own navigation and edit and delete buttons so each
+    has their own pages.
+
+    Args:
+        request (HttpRequest): The request for a page of the feed.
+
+    Returns:
+        Union[str, None]:
+            - The cache key for the page.
+            - None if the response must not be cached, such as when it
+            will include messages for the viewer.
+    """
+
+    if request.method != "GET" or len(messages.get_messages(request)):
+        return None
+
+    if request.user.is_authenticated:
+        viewer = f"user-{request.user.pk}"
+    else:
+        viewer = "anonymous"
+
+    version = get_versions([FEED_VERSION_KEY])[FEED_VERSION_KEY]
+    page = hashlib.sha256(request.get_full_path().encode()).hexdigest()
+    return f"feed:page:{version}:{viewer}:{page}"
+
+
+def cache_feed_page(cache_key, response):
+    """Stores a rendered feed page if it was successful."""
+
+    if response.status_code == 200:
+        cache.set(cache_key, response.content, settings.FEED_CACHE_TIMEOUT)
+
+
+def get_cached_user(request):
+    """Gets the user signed in to a request's session, from the cache when
+    it holds them.
+
+    The user is cached along with their profile, which every page links
+    to and content is authored by.
+
+    A cached user is only used if the session's auth hash still matches
+    theirs, so changing a password signs out other sessions as before.
+    Otherwise the user is read and verified by Django's get_user and
+    cached for later requests. Anonymous requests never reach the cache.
+
+    Args:
+        request (HttpRequest): The request whose session to read.
+
+    Returns:
+        Union[User, AnonymousUser]: the signed-in user, or an anonymous
+        user if no one is signed in.
+    """
+
+    user_id = request.session.get(SESSION_KEY)
+    backend_path = request.session.get(BACKEND_SESSION_KEY)
+    if user_id is None or backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return get_user(request)
+
+    key = user_cache_key(user_id)
+    user = cache.get(key)
+    if user is not None and constant_time_compare(
+            request.session.get(HASH_SESSION_KEY, ""),
+            user.get_session_auth_hash()):
+        return user
+
+    user = get_user(request)
+    if user.is_authenticated:
+        # Load the profile so it is cached along with the user.
+        try:
+            user.user_profile
+        except ObjectDoesNotExist:
+            pass
+        cache.set(key, user, settings.USER_CACHE_TIMEOUT)
+    return user
@@ -0,0 +1,122 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+from userprofile.models import UserProfile
+
+from .cache import FEED_VERSION_KEY, USERNAMES_VERSION_KEY, get_versions
+from .models import Post
+
+
+def make_etag(request, *state):
+    """Builds an ETag for a page from the state of its content.
+
+    The ETag also covers the viewer the page is rendered for, the path and
+    query selecting the page and the usernames version, since usernames
+    are not timestamped. A client holding the page is then only sent a 304
+    if the page would be rendered the same again.
+
+    Args:
+        request (HttpRequest): The request for the page.
+        *state: Values that change whenever the content of the page does.
+
+    Returns:
+        Union[str, None]:
+            - The ETag of the page.
+            - None if the page must not be revalidated, such as when it
+            will include messages for the viewer.
+    """
+
+    if len(messages.get_messages(request)):
+        return None
+
+    if request.user.is_authenticated:
+        viewer = f"user-{request.user.pk}"
+    else:
+        viewer = "anonymous"
+
+    usernames_version = get_versions(
+        [USERNAMES_VERSION_KEY])[USERNAMES_VERSION_KEY]
+    parts = [viewer, request.get_full_path(), usernames_version, *state]
+    return hashlib.sha256(
+        "|".join(str(part) for part in parts).encode()).hexdigest()
+
+
+def async_condition(etag_func):
+    """Async version of Django's condition decorator, for ETags only.
+
+    The ETag is computed in a thread, as it reads the session and cache
+    synchronously. Clients holding the current page are sent a 304 without
+    the view being called.
+
+    Args:
+        etag_func (callable): Called with the view's arguments to get the
+        ETag of the page, or None if it must not be revalidated.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, *args, **kwargs)
+
+            etag = await sync_to_async(etag_func)(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if etag and not response.has_header("ETag"):
+                response.headers["ETag"] = etag
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def feed_etag(request, *args, **kwargs):
+    """Gets the ETag of a page of the feed.
+
+    The feed version already moves on whenever a post, comment or profile
+    changes, so no query is made.
+    """
+
+    version = get_versions([FEED_VERSION_KEY])[FEED_VERSION_KEY]
+    return make_etag(request, version)
+
+
+def post_etag(request, post_id, *args, **kwargs):
+    """Gets the ETag of a page showing a post and its comments.
+
+    The comment count catches deleted comments, which leave no timestamp
+    behind.
+    """
+
+    state = Post.objects.filter(pk=post_id).aggregate(
+        post_updated=Max('updated_on'),
+        comment_total=Count('comments'),
+        comment_updated=Max('comments__updated_on'),
+    )
+    if state['post_updated'] is None:
+        return None
+    return make_etag(request, *state.values())
+
+
+def profile_etag(request, user_profile_id, *args, **kwargs):
+    """Gets the ETag of a profile page showing a user's posts and their
+    comments."""
+
+    state = UserProfile.objects.filter(pk=user_profile_id).aggregate(
+        profile_updated=Max('updated_on'),
+        post_total=Count('users_posts', distinct=True),
+        post_updated=Max('users_posts__updated_on'),
+        comment_total=Count('users_posts__comments', distinct=True),
+        comment_updated=Max('users_posts__comments__updated_on'),
+    )
+    if state['profile_updated'] is None:
+        return None
+    return make_etag(request, *state.values())
@@ -0,0 +1,130 @@
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+from userprofile.models import UserProfile
+
+from .images import destroy_images
+from .models import PendingDeletion, Post
+from .queues import claim_batch
+
+logger = logging.getLogger(__name__)
+
+# Cloudinary deletes at most this many images in one request.
+DELETION_BATCH_SIZE = 100
+
+# How many times an image is tried before it is left for the orphan scan.
+MAX_DELETION_ATTEMPTS = 5
+
+# How long a worker holds a batch before another worker may retry it.
+DELETION_LEASE = timedelta(minutes=5)
+
+# How long a failed deletion waits before each retry, multiplied by the
+# number of attempts made so far.
+DELETION_RETRY_DELAY = timedelta(minutes=1)
+
+# Images shared by every profile without a picture, which are never deleted.
+KEPT_IMAGES = {UserProfile._meta.get_field("image").get_default()}
+
+
+def image_public_id(image):
+    """Gets the public id of an image field's value, if it has one."""
+
+    if isinstance(image, str):
+        image = Post._meta.get_field("image").to_python(image)
+    return getattr(image, "public_id", None)
+
+
+def queue_image_deletions(images):
+    """Queues images for the deletion worker to destroy.
+
+    Unset images and images kept for every profile are skipped, and
+    images already queued are not queued twice.
+
+    Args:
+        images (list): The images, as stored by CloudinaryField or as
+        public ids.
+    """
+
+    public_ids = {image_public_id(image) for image in images}
+    public_ids -= KEPT_IMAGES | {None, ""}
+    PendingDeletion.objects.bulk_create(
+        [PendingDeletion(public_id=public_id)
+         for public_id in sorted(public_ids)],
+        ignore_conflicts=True)
+
+
+def referenced_public_ids(public_ids):
+    """Finds which images are still shown by a post or profile.
+
+    Rows are found by the public id recorded alongside their image, which
+    is indexed.
+
+    Args:
+        public_ids (list): The public ids to look for.
+
+    Returns:
+        set: the public ids still referenced.
+    """
+
+    referenced = set()
+    for model in (Post, UserProfile):
+        referenced.update(
+            model.objects.filter(image_public_id__in=public_ids)
+            .values_list("image_public_id", flat=True))
+    return referenced
+
+
+def process_pending_deletions(limit=DELETION_BATCH_SIZE):
+    """Claims a batch of queued images and destroys them in one request.
+
+    Images still shown by a post or profile, such as placeholders shared
+    by synthetic posts, are dropped from the queue without being
+    destroyed. If the request fails the batch is retried later, and after
+    MAX_DELETION_ATTEMPTS it is dropped and left for scan_orphan_images.
+
+    Args:
+        limit (int): The most images to destroy, at most
+        DELETION_BATCH_SIZE.
+
+    Returns:
+        int: the number of queued images claimed.
+    """
+
+    pending = claim_batch(PendingDeletion.objects.all(), limit,
+                          DELETION_LEASE)
+    if not pending:
+        return 0
+
+    public_ids = [deletion.public_id for deletion in pending]
+    referenced = referenced_public_ids(public_ids)
+    unreferenced = [public_id for public_id in public_ids
+                    if public_id not in referenced]
+    try:
+        if unreferenced:
+            destroy_images(unreferenced)
+    except Exception as error:
+        record_failures(pending, error)
+    else:
+        PendingDeletion.objects.filter(
+            pk__in=[deletion.pk for deletion in pending]).delete()
+    return len(pending)
+
+
+def record_failures(pending, error):
+    """Schedules a failed batch to be retried, or gives up on it."""
+
+    logger.warning("Deleting %s images failed: %s", len(pending), error)
+    now = timezone.now()
+    for deletion in pending:
+        attempts = deletion.attempts + 1
+        if attempts < MAX_DELETION_ATTEMPTS:
+            PendingDeletion.objects.filter(pk=deletion.pk).update(
+                attempts=attempts,
+                last_error=str(error),
+                available_on=now + DELETION_RETRY_DELAY * attempts,
+            )
+        else:
+            logger.error("Gave up deleting image %s after %s attempts.",
+                         deletion.public_id, attempts)
+            PendingDeletion.objects.filter(pk=deletion.pk).delete()
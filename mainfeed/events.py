@@ -0,0 +1,311 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import NamedTuple
+
+import redis
+import redis.asyncio
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# How many recent events are kept for streams reconnecting with the id of
+# the last event they received.
+EVENT_HISTORY_LENGTH = 200
+
+# How many events may wait to be sent to a slow stream. A stream falling
+# further behind is closed, and catches up from the history when the
+# browser reconnects.
+SUBSCRIPTION_QUEUE_SIZE = 100
+
+# How long, in seconds, an idle stream waits before sending a comment, so
+# that proxies do not close it. Heroku closes connections idle for 55s.
+KEEPALIVE_INTERVAL = 20
+
+# How long, in seconds, a stream is held open before it is closed for the
+# browser to reconnect, so no stream outlives a client that went away.
+MAX_STREAM_DURATION = 5 * 60
+
+# How long browsers wait before reconnecting, in milliseconds, when a
+# stream is closed and when it cannot be held open at all.
+RECONNECT_DELAY = 3000
+POLL_DELAY = 30000
+
+# How long the Redis listener waits before reconnecting after a failure.
+LISTENER_RETRY_DELAY = 5
+
+
+class Event(NamedTuple):
+    """Something new for connected feeds, such as a new post."""
+
+    id: int
+    type: str
+    data: dict
+
+    def encode(self):
+        """Formats the event as a server-sent event."""
+
+        data = json.dumps(self.data, separators=(",", ":"))
+        return f"id: {self.id}\nevent: {self.type}\ndata: {data}\n\n"
+
+
+class Subscription:
+    """The events waiting to be sent to one connected stream.
+
+    Events are delivered from whichever thread publishes them and read by
+    the stream on its event loop.
+    """
+
+    def __init__(self, loop, size=SUBSCRIPTION_QUEUE_SIZE):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=size)
+        self.overflowed = False
+
+    def deliver(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The event loop has closed along with the stream.
+            pass
+
+    def _put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    async def next_event(self, timeout):
+        """Waits for the next event.
+
+        Returns:
+            Union[Event, None]: the event, or None if none arrived within
+            the timeout.
+        """
+
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class LocalEventBroker:
+    """Passes events to the streams connected to this process.
+
+    Only events published in this process are seen, so a site served by
+    several processes, or publishing from its upload worker, needs the
+    RedisEventBroker.
+    """
+
+    def __init__(self, history=EVENT_HISTORY_LENGTH):
+        self.lock = threading.Lock()
+        self.history = deque(maxlen=history)
+        self.subscriptions = set()
+        # Ids start from the current time so that a restarted process does
+        # not reuse the ids browsers hold.
+        self.last_id = time.time_ns() // 1000000
+
+    def publish(self, type, data):
+        with self.lock:
+            self.last_id += 1
+            event = Event(self.last_id, type, data)
+        self.dispatch(event)
+
+    def dispatch(self, event):
+        """Records an event and passes it to every connected stream."""
+
+        with self.lock:
+            self.history.append(event)
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+    def latest_id(self):
+        return self.last_id
+
+    def since(self, last_event_id):
+        """Gets the recent events after the one with the given id."""
+
+        with self.lock:
+            return [event for event in self.history
+                    if event.id > last_event_id]
+
+    def subscribe(self, loop):
+        subscription = Subscription(loop)
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+
+class RedisEventBroker(LocalEventBroker):
+    """Passes events between processes through a Redis channel.
+
+    Ids are counted in Redis and recent events kept in a Redis list, so
+    every process sees the same events. Each process holds one
+    subscription to the channel, however many streams it serves, and
+    passes the events it receives to them.
+    """
+
+    def __init__(self, url, channel="foodfeed:events", **kwargs):
+        super().__init__(**kwargs)
+        self.url = url
+        self.channel = channel
+        self.client = redis.Redis.from_url(url)
+        self.listener = None
+
+    def publish(self, type, data):
+        event_id = self.client.incr(f"{self.channel}:id")
+        message = json.dumps([event_id, type, data])
+        with self.client.pipeline() as pipeline:
+            pipeline.lpush(f"{self.channel}:history", message)
+            pipeline.ltrim(f"{self.channel}:history", 0,
+                           self.history.maxlen - 1)
+            pipeline.publish(self.channel, message)
+            pipeline.execute()
+
+    def latest_id(self):
+        return int(self.client.get(f"{self.channel}:id") or 0)
+
+    def since(self, last_event_id):
+        messages = self.client.lrange(f"{self.channel}:history", 0, -1)
+        events = [Event(*json.loads(message)) for message in messages]
+        return sorted(event for event in events if event.id > last_event_id)
+
+    def subscribe(self, loop):
+        if self.listener is None or self.listener.done():
+            self.listener = loop.create_task(self.listen())
+        return super().subscribe(loop)
+
+    async def listen(self):
+        """Passes events from the channel to this process's streams until
+        the process stops, reconnecting after failures."""
+
+        while True:
+            try:
+                client = redis.asyncio.Redis.from_url(self.url)
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.dispatch(Event(*json.loads(message["data"])))
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                logger.warning("Listening for feed events failed: %s", error)
+                await asyncio.sleep(LISTENER_RETRY_DELAY)
+
+
+@lru_cache(maxsize=None)
+def get_event_broker():
+    """Gets the event broker configured by the EVENT_BROKER setting."""
+
+    broker_class = import_string(settings.EVENT_BROKER["BACKEND"])
+    return broker_class(**settings.EVENT_BROKER.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_event_broker(setting, **kwargs):
+    if setting == "EVENT_BROKER":
+        get_event_broker.cache_clear()
+
+
+def publish_event(type, data):
+    """Publishes an event to connected feeds once the current transaction
+    commits, so no feed hears of content that was rolled back.
+
+    Failing to publish is logged rather than failing the request, as
+    feeds catch up whenever they are reloaded.
+    """
+
+    def publish():
+        try:
+            get_event_broker().publish(type, data)
+        except Exception as error:
+            logger.warning("Publishing a %s event failed: %s", type, error)
+
+    transaction.on_commit(publish)
+
+
+def encode_preamble(retry, last_event_id=None):
+    """Formats the start of an event stream.
+
+    It sets how long the browser waits before reconnecting and, when
+    given, the id the browser reconnects from, without firing an event.
+    """
+
+    preamble = f"retry: {retry}\n"
+    if last_event_id is not None:
+        preamble += f"id: {last_event_id}\n"
+    return preamble + "\n"
+
+
+def poll_events(broker, last_event_id=None):
+    """Formats the events missed since the one with the given id, for
+    browsers polling rather than holding a stream open."""
+
+    if last_event_id is None:
+        return encode_preamble(POLL_DELAY, broker.latest_id())
+    return encode_preamble(POLL_DELAY) + "".join(
+        event.encode() for event in broker.since(last_event_id))
+
+
+async def stream_events(broker, last_event_id=None):
+    """Yields the events of a stream as they are published.
+
+    A browser reconnecting with the id of the last event it received is
+    first sent the events it missed. An idle stream waits on its queue
+    without holding a thread, sending a comment every KEEPALIVE_INTERVAL.
+    The stream ends after MAX_STREAM_DURATION, or when it falls too far
+    behind, and the browser reconnects.
+
+    Args:
+        broker (LocalEventBroker): The broker to subscribe to.
+        last_event_id (int): The id of the last event the browser
+        received, if it is reconnecting.
+
+    Yields:
+        str: parts of the event stream.
+    """
+
+    loop = asyncio.get_running_loop()
+    subscription = broker.subscribe(loop)
+    try:
+        if last_event_id is None:
+            sent_id = await sync_to_async(
+                broker.latest_id, thread_sensitive=False)()
+            yield encode_preamble(RECONNECT_DELAY, sent_id)
+        else:
+            sent_id = last_event_id
+            yield encode_preamble(RECONNECT_DELAY)
+            missed = await sync_to_async(
+                broker.since, thread_sensitive=False)(last_event_id)
+            for event in missed:
+                yield event.encode()
+                sent_id = event.id
+
+        closes_at = loop.time() + MAX_STREAM_DURATION
+        while not subscription.overflowed:
+            remaining = closes_at - loop.time()
+            if remaining <= 0:
+                break
+            event = await subscription.next_event(
+                min(KEEPALIVE_INTERVAL, remaining))
+            if event is None:
+                yield ": keepalive\n\n"
+            elif event.id > sent_id:
+                yield event.encode()
+                sent_id = event.id
+    finally:
+        broker.unsubscribe(subscription)
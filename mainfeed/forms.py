@@ -1,6 +1,6 @@
-from cloudinary.forms import CloudinaryFileField
 from django import forms
 
+from .images import ImageFileField
 from .models import Comment, Post
 
 
@@ -9,14 +9,23 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'image')
 
-    image = CloudinaryFileField(
+    image = ImageFileField(
         options={"folder": "foodfeed/",
-                 "crop": "limit", "width": 600, "height": 600, }
+                 "crop": "limit", "width": 600, "height": 600,
+                 "colors": True, }
         )
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, defer_upload=False, **kwargs):
+        """Builds the form.
+
+        Args:
+            defer_upload (bool): Leave the cleaned image as the submitted
+            file, for the upload worker, instead of uploading it.
+        """
+
         super(PostForm, self).__init__(*args, **kwargs)
         self.fields['image'].label = "Image to share"
+        self.fields['image'].autosave = not defer_upload
         self.fields['text'].label = "Post text"
 
 
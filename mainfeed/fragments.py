@@ -0,0 +1,130 @@
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .cache import USERNAMES_VERSION_KEY, get_versions, post_comments_version_key
+from .models import comment_preview_prefetch
+
+# The templates rendering each variant of a post fragment.
+FRAGMENT_TEMPLATES = {
+    "feed": "mainfeed/post_feed.html",
+    "detail": "mainfeed/post_detail.html",
+}
+
+# Bumped whenever the fragment templates change, so that fragments cached
+# before a deploy are not served after it.
+FRAGMENT_VERSION = 5
+
+# How many posts at the top of a feed page load their images straight
+# away. The images of later posts wait until they are scrolled near.
+EAGER_FEED_IMAGES = 2
+
+# Markers left in fragments where controls depend on the viewer, holding
+# the control, the user id of the owner and the post and comment ids.
+VIEWER_CONTROL = re.compile(
+    r"<!--viewer:(?P<control>[a-z-]+):(?P<owner>\d*):"
+    r"(?P<post_id>\d+):(?P<comment_id>\d*)-->")
+
+# Controls shown to every signed in viewer rather than only to the owner.
+SIGNED_IN_CONTROLS = {"make-comment"}
+
+
+def post_fragment_key(post, variant, versions):
+    """Gets the key a rendered post fragment is stored under.
+
+    The key changes whenever the post is edited, its comments change or a
+    username shown in it may have changed, so stale fragments are never
+    read back and simply expire.
+    """
+
+    comments_version = versions[post_comments_version_key(post.id)]
+    usernames_version = versions[USERNAMES_VERSION_KEY]
+    return (f"post:{post.id}:fragment:{FRAGMENT_VERSION}:{variant}:"
+            f"{post.updated_on.timestamp()}:{comments_version}:"
+            f"{usernames_version}")
+
+
+def render_post_fragments(posts, user, variant="feed"):
+    """Renders posts as HTML, reusing fragments rendered for other pages.
+
+    Fragments are rendered without a viewer, so one fragment is shared by
+    every page and viewer showing the post. The preview comments of the
+    feed variant are only fetched for posts whose fragment is not cached.
+
+    Feed fragments are also shared by every position on a page, so their
+    images are rendered to load lazily and switched to load straight away
+    for the first EAGER_FEED_IMAGES posts.
+
+    Args:
+        posts (list): The posts to render, with their authors loaded.
+        user (User): The viewer the controls are layered on for.
+        variant (str): The key of the template in FRAGMENT_TEMPLATES.
+
+    Returns:
+        list: the HTML of each post, in the order given.
+    """
+
+    posts = list(posts)
+    if not posts:
+        return []
+
+    versions = get_versions(
+        [USERNAMES_VERSION_KEY]
+        + [post_comments_version_key(post.id) for post in posts])
+    keys = [post_fragment_key(post, variant, versions) for post in posts]
+    fragments = cache.get_many(keys)
+
+    missing = [post for post, key in zip(posts, keys)
+               if key not in fragments]
+    if missing:
+        if variant == "feed":
+            prefetch_related_objects(missing, comment_preview_prefetch())
+        rendered = {}
+        for post in missing:
+            key = post_fragment_key(post, variant, versions)
+            rendered[key] = render_to_string(
+                FRAGMENT_TEMPLATES[variant],
+                {"post": post, "lazy_image": variant == "feed"})
+        cache.set_many(rendered, settings.POST_FRAGMENT_CACHE_TIMEOUT)
+        fragments.update(rendered)
+
+    html = [fragments[key] for key in keys]
+    if variant == "feed":
+        html[:EAGER_FEED_IMAGES] = [
+            fragment.replace('loading="lazy"', 'loading="eager"', 1)
+            for fragment in html[:EAGER_FEED_IMAGES]]
+    return [layer_viewer_controls(fragment, user) for fragment in html]
+
+
+def layer_viewer_controls(html, user):
+    """Replaces the viewer control markers in rendered HTML.
+
+    Owners are given the edit and delete buttons of their posts and
+    comments, signed in viewers the button to make a comment, and every
+    other marker is removed.
+
+    Args:
+        html (str): HTML holding viewer control markers.
+        user (User): The viewer of the page.
+
+    Returns:
+        SafeString: the HTML with controls for the viewer.
+    """
+
+    def control(match):
+        if not user.is_authenticated:
+            return ""
+        if (match["control"] not in SIGNED_IN_CONTROLS
+                and match["owner"] != str(user.pk)):
+            return ""
+        return render_to_string("mainfeed/viewer_controls.html", {
+            "control": match["control"],
+            "post_id": match["post_id"],
+            "comment_id": match["comment_id"],
+        })
+
+    return mark_safe(VIEWER_CONTROL.sub(control, html))
@@ -0,0 +1,249 @@
+import hashlib
+import os
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+
+import cloudinary
+import cloudinary.api
+import cloudinary.uploader
+from cloudinary.forms import CloudinaryFileField
+from django import forms
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.module_loading import import_string
+
+from .validation import InvalidImage, inspect_image
+
+
+class CloudinaryImageBackend:
+    """Image backend storing images on Cloudinary."""
+
+    def upload(self, file, **options):
+        return cloudinary.uploader.upload(file, **options)
+
+    def destroy(self, public_id):
+        return cloudinary.uploader.destroy(public_id)
+
+    def destroy_many(self, public_ids):
+        return cloudinary.api.delete_resources(list(public_ids))
+
+    def list(self, prefix):
+        """Yields the public id and upload time of each stored image whose
+        public id starts with a prefix."""
+
+        options = {"type": "upload", "prefix": prefix, "max_results": 500}
+        while True:
+            result = cloudinary.api.resources(**options)
+            for resource in result["resources"]:
+                yield {
+                    "public_id": resource["public_id"],
+                    "created_at": parse_datetime(resource["created_at"]),
+                }
+            if not result.get("next_cursor"):
+                return
+            options["next_cursor"] = result["next_cursor"]
+
+
+class LocalImageBackend:
+    """Image backend storing images in memory or on local disk.
+
+    Used by the tests so that no request is made to Cloudinary. Images are
+    given the same upload result Cloudinary would give, with a public id
+    taken from a hash of their content and a version of 1, so the URLs
+    built for them are the same on every run. Their size is read from
+    their headers, but their colours are not given, as that would need
+    them decoded.
+
+    Args:
+        root (str): A directory to write images to. Images are only held
+        in memory if not given.
+    """
+
+    FORMATS = {
+        "image/jpeg": "jpg",
+        "image/png": "png",
+        "image/svg+xml": "svg",
+    }
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else None
+        self.images = {}
+        self.uploaded_on = {}
+
+    def upload(self, file, folder="", **options):
+        if hasattr(file, "seek"):
+            file.seek(0)
+        content = file.read() if hasattr(file, "read") else bytes(file)
+
+        public_id = hashlib.sha256(content).hexdigest()[:20]
+        if folder:
+            public_id = f"{folder.strip('/')}/{public_id}"
+        image_format = self.get_format(file)
+        try:
+            info = inspect_image(ContentFile(content))
+            width, height = limited_size(info.width, info.height, options)
+        except InvalidImage:
+            width = height = None
+
+        if self.root:
+            path = self.root / f"{public_id}.{image_format}"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(content)
+        else:
+            self.images[public_id] = content
+            self.uploaded_on[public_id] = timezone.now()
+
+        return {
+            "public_id": public_id,
+            "version": 1,
+            "format": image_format,
+            "resource_type": "image",
+            "type": "upload",
+            "bytes": len(content),
+            "width": width,
+            "height": height,
+        }
+
+    def destroy(self, public_id):
+        if self.root:
+            paths = list(self.root.glob(f"{public_id}.*"))
+            for path in paths:
+                path.unlink()
+            found = bool(paths)
+        else:
+            found = self.images.pop(public_id, None) is not None
+            self.uploaded_on.pop(public_id, None)
+        return {"result": "ok" if found else "not found"}
+
+    def destroy_many(self, public_ids):
+        deleted = {}
+        for public_id in public_ids:
+            found = self.destroy(public_id)["result"] == "ok"
+            deleted[public_id] = "deleted" if found else "not_found"
+        return {"deleted": deleted}
+
+    def list(self, prefix):
+        if self.root:
+            for path in sorted(self.root.rglob("*.*")):
+                public_id = path.relative_to(self.root).with_suffix("")
+                if str(public_id).startswith(prefix):
+                    modified = path.stat().st_mtime
+                    yield {
+                        "public_id": public_id.as_posix(),
+                        "created_at": datetime.fromtimestamp(
+                            modified, dt_timezone.utc),
+                    }
+        else:
+            for public_id, created_at in list(self.uploaded_on.items()):
+                if public_id.startswith(prefix):
+                    yield {"public_id": public_id, "created_at": created_at}
+
+    def get_format(self, file):
+        """Gets the format of an uploaded file from its type or name."""
+
+        content_type = getattr(file, "content_type", None)
+        if content_type in self.FORMATS:
+            return self.FORMATS[content_type]
+        extension = os.path.splitext(getattr(file, "name", "") or "")[1]
+        return extension.lstrip(".").lower() or "jpg"
+
+
+def limited_size(width, height, options):
+    """Gets the size an image is stored at after its upload options.
+
+    A "limit" crop scales an image down to fit within its width and
+    height, keeping its aspect ratio, and never scales it up.
+
+    Args:
+        width (int): The width of the uploaded image.
+        height (int): The height of the uploaded image.
+        options (dict): The Cloudinary upload options.
+
+    Returns:
+        tuple: the width and height of the stored image.
+    """
+
+    if not width or not height or options.get("crop") != "limit":
+        return width, height
+    scale = min(1, options.get("width", width) / width,
+                options.get("height", height) / height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+@lru_cache(maxsize=None)
+def get_image_backend():
+    """Gets the image backend configured by the IMAGE_BACKEND setting."""
+
+    backend_class = import_string(settings.IMAGE_BACKEND["BACKEND"])
+    return backend_class(**settings.IMAGE_BACKEND.get("OPTIONS", {}))
+
+
+@receiver(setting_changed)
+def reset_image_backend(setting, **kwargs):
+    if setting == "IMAGE_BACKEND":
+        get_image_backend.cache_clear()
+
+
+def upload_image(file, **options):
+    """Uploads an image through the configured image backend.
+
+    Args:
+        file (File): The image to upload.
+        **options: Cloudinary upload options, such as the folder.
+
+    Returns:
+        CloudinaryImage: the uploaded image, as stored by CloudinaryField.
+    """
+
+    result = get_image_backend().upload(file, **options)
+    return cloudinary.CloudinaryImage(
+        result["public_id"], version=str(result["version"]),
+        format=result.get("format"), metadata=result)
+
+
+def destroy_image(public_id):
+    """Deletes an image through the configured image backend."""
+
+    return get_image_backend().destroy(public_id)
+
+
+def destroy_images(public_ids):
+    """Deletes many images through the configured image backend at once.
+
+    Args:
+        public_ids (list): The public ids of the images, at most 100.
+
+    Returns:
+        dict: the result of deleting each image, by public id, under
+        "deleted".
+    """
+
+    return get_image_backend().destroy_many(public_ids)
+
+
+class ImageFileField(CloudinaryFileField):
+    """CloudinaryFileField uploading through the configured image backend.
+
+    Files are checked to be JPEG, PNG or SVG images by their content, and
+    given the content type found, before being uploaded. What was found is
+    kept on the file as image_info.
+    """
+
+    def to_python(self, value):
+        value = forms.FileField.to_python(self, value)
+        if not value:
+            return None
+        try:
+            value.image_info = inspect_image(value)
+        except InvalidImage as error:
+            raise forms.ValidationError(str(error), code="invalid_image")
+        value.content_type = value.image_info.content_type
+        if self.autosave:
+            return upload_image(value, **self.options)
+        return value
@@ -0,0 +1,284 @@
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.template.backends.django import DjangoTemplates, Template
+
+from .metrics import percentile
+
+logger = logging.getLogger(__name__)
+
+# The metrics of the request being handled, if any.
+current_metrics = ContextVar("current_metrics", default=None)
+
+# The measurements a budget can limit, with how they are described.
+BUDGETED_MEASUREMENTS = {
+    "queries": "queries",
+    "db_ms": "ms of SQL",
+    "template_ms": "ms rendering templates",
+    "total_ms": "ms in total",
+    "bytes": "bytes",
+}
+
+
+class BudgetExceeded(AssertionError):
+    """Raised when a view exceeds its budget and budgets are enforced."""
+
+
+class RequestMetrics:
+    """The measurements of a single request.
+
+    While it is the current metrics, it sees and times each query the
+    request makes through record_query.
+    """
+
+    def __init__(self):
+        self.view_name = "unresolved"
+        self.queries = 0
+        self.db_ms = 0.0
+        self.template_ms = 0.0
+        self.total_ms = 0.0
+        self.bytes = None
+        self.template_depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_ms += (time.perf_counter() - start) * 1000
+
+    def as_dict(self):
+        return {key: getattr(self, key)
+                for key in ("view_name", *BUDGETED_MEASUREMENTS)}
+
+    def server_timing(self):
+        """Formats the timings as the value of a Server-Timing header."""
+
+        return (f'db;dur={self.db_ms:.1f};desc="{self.queries} queries", '
+                f'tpl;dur={self.template_ms:.1f};desc="Templates", '
+                f'total;dur={self.total_ms:.1f}')
+
+    def over_budget(self, budget):
+        """Lists the measurements exceeding a budget.
+
+        Args:
+            budget (dict): The most of each measurement a view may use.
+
+        Returns:
+            list: a description of each measurement over its limit.
+        """
+
+        breaches = []
+        for key, unit in BUDGETED_MEASUREMENTS.items():
+            value = getattr(self, key)
+            if key in budget and value is not None and value > budget[key]:
+                breaches.append(f"{value:g} {unit} (budget {budget[key]:g})")
+        return breaches
+
+
+class RollingSummary:
+    """The most recent request metrics of each view, kept in memory.
+
+    Each process keeps its own summary, which is lost when it restarts.
+    """
+
+    def __init__(self, size=500):
+        self.size = size
+        self.lock = threading.Lock()
+        self.records = defaultdict(lambda: deque(maxlen=self.size))
+        self.breaches = defaultdict(int)
+
+    def add(self, metrics, over_budget):
+        with self.lock:
+            self.records[metrics.view_name].append(metrics.as_dict())
+            if over_budget:
+                self.breaches[metrics.view_name] += 1
+
+    def clear(self):
+        with self.lock:
+            self.records.clear()
+            self.breaches.clear()
+
+    def rows(self):
+        """Summarises the recorded requests of each view.
+
+        Returns:
+            list: a dict of statistics for each view, by view name.
+        """
+
+        with self.lock:
+            records = {name: list(entries)
+                       for name, entries in self.records.items()}
+            breaches = dict(self.breaches)
+
+        rows = []
+        for name in sorted(records):
+            entries = records[name]
+            total = [entry["total_ms"] for entry in entries]
+            queries = [entry["queries"] for entry in entries]
+            sizes = [entry["bytes"] for entry in entries
+                     if entry["bytes"] is not None]
+            rows.append({
+                "view_name": name,
+                "requests": len(entries),
+                "p50_ms": percentile(total, 50),
+                "p95_ms": percentile(total, 95),
+                "p95_db_ms": percentile(
+                    [entry["db_ms"] for entry in entries], 95),
+                "p95_template_ms": percentile(
+                    [entry["template_ms"] for entry in entries], 95),
+                "mean_queries": sum(queries) / len(queries),
+                "max_queries": max(queries),
+                "mean_bytes": sum(sizes) / len(sizes) if sizes else None,
+                "budget_breaches": breaches.get(name, 0),
+            })
+        return rows
+
+
+summary = RollingSummary()
+
+
+def record_query(execute, sql, params, many, context):
+    """Counts and times a query in the current request's metrics."""
+
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """Adds record_query to the execute wrappers of a new connection.
+
+    It is installed on each connection rather than around each request,
+    since the async views run their queries on connections of a worker
+    thread the middleware never sees. The current metrics follow the
+    request into that thread with its context.
+    """
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RequestMetricsMiddleware:
+    """Measures each request and checks it against its view's budget.
+
+    The number and duration of SQL queries, the time spent rendering
+    templates, the total time and the response size are recorded under
+    the resolved view name. They are sent to the client in a Server-Timing
+    header and added to the rolling summary shown to staff.
+
+    Budgets are set per view name in the VIEW_BUDGETS setting. A request
+    over budget is logged, or fails with BudgetExceeded when
+    VIEW_BUDGET_MODE is "raise", as it is in the tests.
+
+    Requests are measured the same way whether the middleware chain is
+    run synchronously, under WSGI, or asynchronously, under ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        return self.record(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        return self.record(request, response, metrics)
+
+    def record(self, request, response, metrics):
+        """Records a request's metrics and checks them against its
+        view's budget.
+
+        Args:
+            request (HttpRequest): The request measured.
+            response (HttpResponse): The response to the request.
+            metrics (RequestMetrics): The measurements of the request.
+
+        Returns:
+            HttpResponse: the response, with a Server-Timing header.
+
+        Raises:
+            BudgetExceeded: if the request is over budget and budgets are
+            enforced.
+        """
+
+        if request.resolver_match is not None:
+            metrics.view_name = request.resolver_match.view_name
+        if not response.streaming:
+            metrics.bytes = len(response.content)
+        response["Server-Timing"] = metrics.server_timing()
+
+        budget = getattr(settings, "VIEW_BUDGETS", {}).get(metrics.view_name)
+        breaches = metrics.over_budget(budget) if budget else []
+        summary.add(metrics, bool(breaches))
+        if breaches:
+            message = (f"{metrics.view_name} exceeded its budget: "
+                       + ", ".join(breaches))
+            if getattr(settings, "VIEW_BUDGET_MODE", "log") == "raise":
+                raise BudgetExceeded(message)
+            logger.warning(message)
+
+        return response
+
+
+class TimedTemplate(Template):
+    """Template adding its render time to the current request's metrics.
+
+    Only the outermost render is timed, since templates rendered by tags
+    and includes during it are already inside its time.
+    """
+
+    def render(self, context=None, request=None):
+        metrics = current_metrics.get()
+        if metrics is None:
+            return super().render(context, request)
+
+        metrics.template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics.template_depth -= 1
+            if metrics.template_depth == 0:
+                metrics.template_ms += (time.perf_counter() - start) * 1000
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Django template backend whose templates record their render time."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from mainfeed.cache import invalidate_feed
+from mainfeed.tags import backfill_post_tags
+
+
+class Command(BaseCommand):
+    help = ("Tags every existing post from the hashtags in its text, in "
+            "batches. Tags a post no longer uses are removed, so the "
+            "command can be run again at any time.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="The most posts read at once.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("The batch size must be positive.")
+
+        def progress(tagged, added):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Tagged {tagged} posts.")
+
+        tagged, added = backfill_post_tags(options['batch_size'], progress)
+        invalidate_feed()
+        self.stdout.write(self.style.SUCCESS(
+            f"Tagged {tagged} posts, adding {added} tags."))
@@ -0,0 +1,481 @@
+import json
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from mainfeed import urls as mainfeed_urls
+from mainfeed.metrics import percentile
+from mainfeed.models import Comment, Post
+from mainfeed.pagination import encode_cursor
+from mainfeed.search import SEARCH_TERM
+from mainfeed.synthetic import PLACEHOLDER_IMAGES, seed_dataset
+from mainfeed.views import PostList
+from userprofile import urls as userprofile_urls
+from userprofile.models import UserProfile
+
+# The measurements compared against a baseline and how much each may grow
+# before it counts as a regression. Query counts may not grow at all.
+REGRESSION_LIMITS = {
+    "p95_ms": "max_latency_regression",
+    "queries": None,
+    "bytes": "max_size_regression",
+}
+
+
+class Command(BaseCommand):
+    help = ("Seeds a synthetic feed into a throwaway test database and "
+            "requests every page of the mainfeed and userprofile apps with "
+            "the test client, reporting latency percentiles, queries, "
+            "rendered bytes and peak memory for each. The report can be "
+            "saved as JSON and compared against a saved baseline, such as "
+            "one measured over the other of WSGI and ASGI.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Seed of the synthetic dataset.")
+        parser.add_argument('--requests', type=int, default=50,
+                            help="Timed requests made to each page.")
+        parser.add_argument('--warmup', type=int, default=3,
+                            help="Untimed requests made to each page first.")
+        parser.add_argument('--endpoint', action='append', default=[],
+                            help="Only measure the named pages.")
+        parser.add_argument(
+            '--cold', action='store_true',
+            help="Disable caching so every request renders its page.")
+        parser.add_argument(
+            '--asgi', action='store_true',
+            help="Request pages over ASGI with the async client, so the "
+                 "async views are measured, instead of over WSGI.")
+        parser.add_argument(
+            '--in-place', action='store_true',
+            help="Seed and measure the configured database instead of a "
+                 "throwaway test database. The seeded rows are left in it.")
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false',
+            dest='interactive',
+            help="Do not ask for confirmation before seeding the configured "
+                 "database.")
+        parser.add_argument('--json', metavar='PATH',
+                            help="Write the report to a JSON file.")
+        parser.add_argument(
+            '--baseline', metavar='PATH',
+            help="Compare the report with a JSON report saved earlier and "
+                 "exit with an error if any page regressed.")
+        parser.add_argument(
+            '--max-latency-regression', type=float, default=0.25,
+            help="Allowed growth of p95 latency over the baseline, as a "
+                 "fraction.")
+        parser.add_argument(
+            '--max-size-regression', type=float, default=0.05,
+            help="Allowed growth of rendered bytes over the baseline, as a "
+                 "fraction.")
+
+    def handle(self, *args, **options):
+        if options['in_place'] and options['interactive']:
+            self.confirm_in_place()
+
+        cache_backend = 'django.core.cache.backends.locmem.LocMemCache'
+        if options['cold']:
+            cache_backend = 'django.core.cache.backends.dummy.DummyCache'
+
+        # Never touch a shared cache or upload to Cloudinary.
+        with override_settings(
+            CACHES={'default': {'BACKEND': cache_backend,
+                                'LOCATION': 'bench'}},
+            IMAGE_BACKEND={'BACKEND': 'mainfeed.images.LocalImageBackend'},
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+        ):
+            if options['in_place']:
+                report = self.run_benchmark(options)
+            else:
+                old_name = connection.creation.create_test_db(
+                    verbosity=0, autoclobber=True, serialize=False)
+                try:
+                    report = self.run_benchmark(options)
+                finally:
+                    connection.creation.destroy_test_db(old_name,
+                                                        verbosity=0)
+
+        self.write_report(report)
+
+        if options['json']:
+            with open(options['json'], 'w') as file:
+                json.dump(report, file, indent=2, sort_keys=True)
+                file.write('\n')
+
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            regressions = self.compare(report, baseline, options)
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(regression))
+            if regressions:
+                raise CommandError(
+                    f"{len(regressions)} regressions against the baseline.")
+            self.stdout.write(self.style.SUCCESS(
+                "No regressions against the baseline."))
+
+    def confirm_in_place(self):
+        """Asks for confirmation before seeding the configured database,
+        which may be holding real data."""
+
+        name = connection.settings_dict['NAME']
+        answer = input(
+            f"This will seed synthetic users, posts and comments into the "
+            f"database '{name}' and leave them there.\n"
+            f"Type 'yes' to continue, or 'no' to cancel: ")
+        if answer != 'yes':
+            raise CommandError("Benchmark cancelled.")
+
+    def run_benchmark(self, options):
+        """Seeds the dataset and measures every page.
+
+        Returns:
+            dict: the dataset options and the measurements of each page.
+        """
+
+        seed_dataset(options['users'], options['posts'],
+                     options['comments'], seed=options['seed'])
+        staff, created = User.objects.get_or_create(
+            username="bench_staff", defaults={"is_staff": True})
+        try:
+            return self.measure_scenarios(self.scenarios(staff), options)
+        finally:
+            if created:
+                staff.delete()
+
+    def measure_scenarios(self, scenarios, options):
+        """Measures the selected pages, skipping those the seeded data
+        cannot build a request for.
+
+        Returns:
+            dict: the dataset options and the measurements of each page.
+        """
+
+        missing = self.url_names() - {scenario['url_name']
+                                      for scenario in scenarios.values()}
+        if missing:
+            raise CommandError(
+                "No benchmark scenario for: " + ", ".join(sorted(missing)))
+
+        selected = options['endpoint'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(
+                "Unknown endpoints: " + ", ".join(sorted(unknown)))
+
+        endpoints = {}
+        for name in selected:
+            if scenarios[name].get('skip'):
+                self.stdout.write(self.style.NOTICE(
+                    f"{name}: skipped, {scenarios[name]['skip']}"))
+                continue
+            endpoints[name] = self.measure(
+                scenarios[name], options['requests'], options['warmup'],
+                options['asgi'])
+
+        dataset = {key: options[key]
+                   for key in ('users', 'posts', 'comments', 'seed', 'cold')}
+        interface = "asgi" if options['asgi'] else "wsgi"
+        return {"dataset": dataset, "interface": interface,
+                "endpoints": endpoints}
+
+    def url_names(self):
+        """Gets the names of every URL the benchmark must cover."""
+
+        return {pattern.name
+                for module in (mainfeed_urls, userprofile_urls)
+                for pattern in module.urlpatterns}
+
+    def scenarios(self, staff):
+        """Builds the request made to each page from the seeded data.
+
+        Pages are requested for the busiest objects, such as the post with
+        the most comments, as those are the slowest to render. Pages for
+        editing are requested by the owner of the object. Deletions are made
+        of an object created for each request. Scenarios the data holds no
+        object for are marked to be skipped, with the reason.
+
+        Args:
+            staff (User): The staff user requesting the staff-only pages.
+
+        Returns:
+            dict: the URL name, owner and URL builder of each scenario.
+
+        Raises:
+            CommandError: if there are no posts to request pages for.
+        """
+
+        hot_post = (Post.objects.select_related('author__user')
+                    .order_by('-comment_count', 'id').first())
+        if hot_post is None:
+            raise CommandError("The benchmark needs at least one post.")
+        comment = (hot_post.comments.select_related('author__user')
+                   .order_by('-created_on').first())
+        profile = (UserProfile.objects.select_related('user')
+                   .annotate(total=Count('users_posts'))
+                   .order_by('-total', 'id').first())
+        page_size = PostList.paginate_by
+        cursor_post = Post.objects.order_by(
+            '-created_on', '-id')[page_size - 1:page_size].first()
+        after = None
+        if cursor_post is not None:
+            after = encode_cursor(cursor_post, ('-created_on', '-id'))
+
+        tag = hot_post.tags.first()
+        # A word of the busiest post, so the search finds it.
+        search_terms = SEARCH_TERM.findall(hot_post.text)
+        search_term = search_terms[-1] if search_terms else None
+
+        def new_post():
+            return Post.objects.create(author=hot_post.author,
+                                       image=PLACEHOLDER_IMAGES[0],
+                                       text="Benchmark post")
+
+        def new_comment():
+            post = new_post()
+            return Comment.objects.create(post=post, author=hot_post.author,
+                                          body="Benchmark comment")
+
+        owner = hot_post.author.user
+        return {
+            "feed": {
+                "url_name": "feed", "user": None,
+                "url": lambda: reverse('feed'),
+            },
+            "feed_next_page": {
+                "url_name": "feed", "user": None,
+                "url": lambda: reverse('feed') + f"?after={after}",
+                "skip": None if after else (
+                    f"fewer than {page_size} posts to page through"),
+            },
+            "tag_feed": {
+                "url_name": "tag_feed", "user": None,
+                "url": lambda: reverse('tag_feed', args=[tag.name]),
+                "skip": None if tag else "the busiest post has no tags",
+            },
+            "search": {
+                "url_name": "search", "user": None,
+                "url": lambda: reverse('search') + f"?q={search_term}",
+                "skip": None if search_term else (
+                    "the busiest post has no words to search for"),
+            },
+            "create_post": {
+                "url_name": "create_post", "user": owner,
+                "url": lambda: reverse('create_post'),
+            },
+            "create_comment": {
+                "url_name": "create_comment", "user": owner,
+                "url": lambda: reverse('create_comment', args=[hot_post.id]),
+            },
+            "edit_post": {
+                "url_name": "edit_post", "user": owner,
+                "url": lambda: reverse('edit_post', args=[hot_post.id]),
+            },
+            "edit_comment": {
+                "url_name": "edit_comment",
+                "user": comment and comment.author.user,
+                "url": lambda: reverse('edit_comment',
+                                       args=[hot_post.id, comment.id]),
+                "skip": None if comment else (
+                    "the busiest post has no comments"),
+            },
+            "delete_post": {
+                "url_name": "delete_post", "user": owner,
+                "url": lambda: reverse('delete_post', args=[new_post().id]),
+            },
+            "delete_comment": {
+                "url_name": "delete_comment", "user": owner,
+                "url": lambda: reverse('delete_comment',
+                                       args=[new_comment().id]),
+            },
+            "view_post": {
+                "url_name": "view_post", "user": None,
+                "url": lambda: reverse('view_post', args=[hot_post.id]),
+            },
+            "comment_list": {
+                "url_name": "comment_list", "user": None,
+                "url": lambda: reverse('comment_list', args=[hot_post.id]),
+            },
+            "post_fragment": {
+                "url_name": "post_fragment", "user": None,
+                "url": lambda: reverse('post_fragment', args=[hot_post.id]),
+            },
+            "feed_events": {
+                "url_name": "feed_events", "user": None,
+                "url": lambda: reverse('feed_events'),
+            },
+            "view_comment": {
+                "url_name": "view_comment", "user": None,
+                "url": lambda: reverse('view_comment',
+                                       args=[hot_post.id, comment.id]),
+                "skip": None if comment else (
+                    "the busiest post has no comments"),
+            },
+            "user_profile": {
+                "url_name": "user_profile", "user": None,
+                "url": lambda: reverse('user_profile', args=[profile.id]),
+            },
+            "edit_user_profile": {
+                "url_name": "edit_user_profile", "user": profile.user,
+                "url": lambda: reverse('edit_user_profile',
+                                       args=[profile.id]),
+            },
+            "api_feed": {
+                "url_name": "api_feed", "user": None,
+                "url": lambda: reverse('api_feed'),
+            },
+            "api_post": {
+                "url_name": "api_post", "user": None,
+                "url": lambda: reverse('api_post', args=[hot_post.id]),
+            },
+            "api_comments": {
+                "url_name": "api_comments", "user": None,
+                "url": lambda: reverse('api_comments', args=[hot_post.id]),
+            },
+            "api_profile": {
+                "url_name": "api_profile", "user": None,
+                "url": lambda: reverse('api_profile', args=[profile.id]),
+            },
+            "request_metrics": {
+                "url_name": "request_metrics", "user": staff,
+                "url": lambda: reverse('request_metrics'),
+            },
+        }
+
+    def measure(self, scenario, requests, warmup, asgi=False):
+        """Requests a page repeatedly and summarises the measurements.
+
+        Peak memory is measured by one extra request, since tracing memory
+        allocations slows down the timed requests.
+
+        Returns:
+            dict: the measurements of the page.
+        """
+
+        client = AsyncClient() if asgi else Client()
+        if scenario['user'] is not None:
+            client.force_login(scenario['user'])
+
+        for _ in range(warmup):
+            self.request(client, scenario)
+
+        latencies = []
+        queries = []
+        sizes = []
+        statuses = set()
+        for _ in range(requests):
+            url = scenario['url']()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = self.get(client, url)
+                size = self.content_length(response)
+                latencies.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured.captured_queries))
+            sizes.append(size)
+            statuses.add(response.status_code)
+            client.cookies.pop('messages', None)
+
+        tracemalloc.start()
+        try:
+            tracemalloc.reset_peak()
+            self.request(client, scenario)
+            peak_memory = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "url": scenario['url'](),
+            "requests": requests,
+            "status": sorted(statuses),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "queries": max(queries),
+            "bytes": max(sizes),
+            "peak_memory_kb": round(peak_memory / 1024, 1),
+        }
+
+    def get(self, client, url):
+        """Requests a page, over ASGI if the client is async."""
+
+        if isinstance(client, AsyncClient):
+            async def get():
+                return await client.get(url)
+            return async_to_sync(get)()
+        return client.get(url)
+
+    def request(self, client, scenario):
+        response = self.get(client, scenario['url']())
+        self.content_length(response)
+        client.cookies.pop('messages', None)
+        return response
+
+    def content_length(self, response):
+        """Gets the size of a response body, consuming it if streamed.
+
+        Event streams served over ASGI never end, so only their first part
+        is read.
+        """
+
+        if response.streaming and response.is_async:
+            async def first_part():
+                return len(await anext(aiter(response.streaming_content)))
+            return async_to_sync(first_part)()
+        if response.streaming:
+            return sum(len(chunk) for chunk in response.streaming_content)
+        return len(response.content)
+
+    def write_report(self, report):
+        self.stdout.write(
+            f"{'endpoint':<20}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'bytes':>9}{'peak KiB':>10}")
+        for name, result in report['endpoints'].items():
+            self.stdout.write(
+                f"{name:<20}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}"
+                f"{result['p99_ms']:>9.2f}{result['queries']:>9}"
+                f"{result['bytes']:>9}{result['peak_memory_kb']:>10.1f}")
+
+    def compare(self, report, baseline, options):
+        """Lists the measurements that regressed against a baseline.
+
+        Pages missing from either report are not compared.
+
+        Returns:
+            list: a description of each regression.
+        """
+
+        if report['dataset'] != baseline.get('dataset'):
+            self.stdout.write(self.style.WARNING(
+                "The baseline was measured on a different dataset."))
+        interface = baseline.get('interface', 'wsgi')
+        if report['interface'] != interface:
+            self.stdout.write(
+                f"Comparing {report['interface'].upper()} with a baseline "
+                f"measured over {interface.upper()}.")
+
+        regressions = []
+        for name, result in report['endpoints'].items():
+            previous = baseline.get('endpoints', {}).get(name)
+            if previous is None:
+                continue
+            for key, limit_option in REGRESSION_LIMITS.items():
+                limit = options[limit_option] if limit_option else 0
+                allowed = previous[key] * (1 + limit)
+                if result[key] > allowed:
+                    regressions.append(
+                        f"{name}: {key} rose from {previous[key]} to "
+                        f"{result[key]}")
+        return regressions
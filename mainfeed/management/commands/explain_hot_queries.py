@@ -0,0 +1,130 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from mainfeed.models import Post, Tag, comment_preview_prefetch
+from mainfeed.pagination import KeysetPaginator
+from mainfeed.views import (COMMENTS_PER_PAGE, PostList, TagPostList,
+                            comment_paginator)
+from userprofile.models import UserProfile
+from userprofile.views import profile_posts
+
+
+def explain(queryset):
+    """Runs EXPLAIN on the SQL of a queryset.
+
+    QuerySet.explain() cannot explain the windowed query of the comment
+    preview in Django 4.2, as the explain prefix is also added to the
+    subquery filtering on the window, so the compiled SQL is explained
+    instead.
+
+    Returns:
+        str: the query plan, one line per row.
+    """
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"{connection.ops.explain_query_prefix()} {sql}",
+                       params)
+        return "\n".join(" ".join(str(column) for column in row)
+                         for row in cursor.fetchall())
+
+
+class Command(BaseCommand):
+    help = ("Runs EXPLAIN on the hot queries made by the feed, tag feed, "
+            "post and profile views and reports whether each uses its index. "
+            "Planners may prefer a table scan while tables are small, so run "
+            "this against a database holding realistic data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fail-on-miss', action='store_true',
+            help="Exit with an error if any query does not use its index.")
+
+    def handle(self, *args, **options):
+        misses = []
+        for label, queryset, index_name in self.hot_queries():
+            plan = explain(queryset)
+            used = index_name in plan
+            if used:
+                self.stdout.write(self.style.SUCCESS(
+                    f"{label}: uses {index_name}"))
+            else:
+                misses.append(label)
+                self.stdout.write(self.style.WARNING(
+                    f"{label}: does not use {index_name}"))
+            if options['verbosity'] > 1 or not used:
+                self.stdout.write(plan)
+
+        if misses and options['fail_on_miss']:
+            raise CommandError(
+                f"{len(misses)} queries not using their index: "
+                + ", ".join(misses))
+
+    def hot_queries(self):
+        """Builds the querysets the views run for typical requests.
+
+        The querysets are built by the same views and helpers that run
+        them, and sample objects are taken from existing rows so the plans
+        reflect the data held in the database. Queries needing a sample
+        the database does not hold are skipped.
+
+        Returns:
+            list: tuples of a label, the queryset and the expected index.
+        """
+
+        page_size = PostList.paginate_by
+        paginator = KeysetPaginator(PostList().get_queryset(), page_size,
+                                    ordering=PostList.cursor_ordering)
+        first_page = paginator.page_queryset()
+        queries = [("feed first page",
+                    first_page[:page_size + 1], "post_created_id_idx")]
+
+        newest_post = first_page.first()
+        if newest_post is None:
+            self.skip("feed cursor page", "no published posts")
+        else:
+            cursor_page = paginator.page_queryset(
+                after=paginator.encode_cursor(newest_post))
+            queries.append(("feed cursor page",
+                            cursor_page[:page_size + 1],
+                            "post_created_id_idx"))
+
+        tag = Tag.objects.filter(post_tags__isnull=False).first()
+        if tag is None:
+            self.skip("tag feed page", "no tagged posts")
+        else:
+            view = TagPostList(kwargs={'tag_name': tag.name})
+            tag_page = KeysetPaginator(
+                view.get_queryset(), page_size,
+                ordering=TagPostList.cursor_ordering).page_queryset()
+            queries.append(("tag feed page",
+                            tag_page[:page_size + 1], "post_tag_feed_idx"))
+
+        profile = UserProfile.objects.select_related('user').first()
+        if profile is None:
+            self.skip("profile posts", "no profiles")
+        else:
+            queries.append(("profile posts",
+                            profile_posts(profile, AnonymousUser()),
+                            "post_author_created_idx"))
+
+        page_post_ids = list(
+            first_page.values_list('id', flat=True)[:page_size])
+        preview = comment_preview_prefetch().queryset
+        queries.append(("feed page comments",
+                        preview.filter(post_id__in=page_post_ids or [0]),
+                        "comment_post_created_idx"))
+
+        post = Post.objects.order_by('-comment_count', '-id').first()
+        if post is None:
+            self.skip("post comments", "no posts")
+        else:
+            comment_page = comment_paginator(post).page_queryset()
+            queries.append(("post comments",
+                            comment_page[:COMMENTS_PER_PAGE + 1],
+                            "comment_post_created_idx"))
+        return queries
+
+    def skip(self, label, reason):
+        self.stdout.write(self.style.NOTICE(f"{label}: skipped, {reason}"))
@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from mainfeed.deletions import DELETION_BATCH_SIZE, process_pending_deletions
+
+
+class Command(BaseCommand):
+    help = ("Runs the deletion worker, which destroys the stored images "
+            "queued when posts and profiles are deleted or given another "
+            "image, many in each request to the image backend.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Destroy the images queued now and exit instead of "
+                 "polling for more.")
+        parser.add_argument(
+            '--batch-size', type=int, default=DELETION_BATCH_SIZE,
+            help="The most images destroyed in one request, at most "
+                 f"{DELETION_BATCH_SIZE}.")
+        parser.add_argument(
+            '--interval', type=float, default=30.0,
+            help="Seconds to wait before polling again when no images are "
+                 "queued.")
+
+    def handle(self, *args, **options):
+        if not 1 <= options['batch_size'] <= DELETION_BATCH_SIZE:
+            raise CommandError(
+                f"The batch size must be from 1 to {DELETION_BATCH_SIZE}.")
+        if options['interval'] < 0:
+            raise CommandError("The interval must be positive.")
+
+        processed = 0
+        while True:
+            # Drop connections the database has closed while idle.
+            close_old_connections()
+            claimed = process_pending_deletions(options['batch_size'])
+            processed += claimed
+            if claimed and options['verbosity'] > 1:
+                self.stdout.write(f"Processed {claimed} deletions.")
+            if not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} deletions."))
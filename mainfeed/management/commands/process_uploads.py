@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from mainfeed.uploads import process_pending_uploads
+
+
+class Command(BaseCommand):
+    help = ("Runs the upload worker, which uploads the images staged by "
+            "post creation and profile edits to the image backend and "
+            "publishes their posts. Several workers can run at once.")
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Process the uploads waiting now and exit instead of "
+                 "polling for more.")
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help="The most uploads claimed at a time.")
+        parser.add_argument(
+            '--interval', type=float, default=2.0,
+            help="Seconds to wait before polling again when no uploads "
+                 "are waiting.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['interval'] < 0:
+            raise CommandError(
+                "The batch size and interval must be positive.")
+
+        processed = 0
+        while True:
+            # Drop connections the database has closed while idle.
+            close_old_connections()
+            claimed = process_pending_uploads(options['batch_size'])
+            processed += claimed
+            if claimed and options['verbosity'] > 1:
+                self.stdout.write(f"Processed {claimed} uploads.")
+            if not claimed:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} uploads."))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.template.defaultfilters import pluralize
+
+from mainfeed.cache import (bump_version, invalidate_feed,
+                            post_comments_version_key)
+from mainfeed.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = ("Repairs posts whose stored comment_count differs from the "
+            "number of comments they have.")
+
+    batch_size = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report drifted posts without updating them.")
+
+    def handle(self, *args, **options):
+        counted = (Comment.objects.filter(post=OuterRef('pk')).order_by()
+                   .values('post').annotate(total=Count('pk'))
+                   .values('total'))
+        actual_count = Coalesce(Subquery(counted), 0)
+
+        drifted_ids = list(
+            Post.objects.annotate(actual_count=actual_count)
+            .exclude(comment_count=F('actual_count'))
+            .values_list('id', flat=True))
+
+        if options['dry_run']:
+            drifted = len(drifted_ids)
+            self.stdout.write(
+                f"{drifted} post{pluralize(drifted)} "
+                f"{pluralize(drifted, 'has,have')} a drifted comment count.")
+            return
+
+        # Recount within the update so comments made since are included.
+        # Updates send no signals, so the cached fragments and feed pages
+        # showing the drifted counts are discarded here.
+        repaired = 0
+        for start in range(0, len(drifted_ids), self.batch_size):
+            batch = drifted_ids[start:start + self.batch_size]
+            repaired += Post.objects.filter(pk__in=batch).update(
+                comment_count=actual_count)
+            for post_id in batch:
+                bump_version(post_comments_version_key(post_id))
+        if repaired:
+            invalidate_feed()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Repaired the comment count of {repaired} "
+            f"post{pluralize(repaired)}."))
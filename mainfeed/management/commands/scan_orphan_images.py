@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from mainfeed.deletions import KEPT_IMAGES, queue_image_deletions
+from mainfeed.images import get_image_backend
+from mainfeed.models import PendingDeletion, Post
+from userprofile.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = ("Compares the images stored by the image backend with the "
+            "images posts and profiles show, and queues every stored image "
+            "nothing shows for the deletion worker.")
+
+    batch_size = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix', default='foodfeed/',
+            help="Only scan stored images whose public id starts with this.")
+        parser.add_argument(
+            '--min-age', type=float, default=24,
+            help="Hours an image must have been stored for. Newer images "
+                 "may belong to an upload that is still being saved.")
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report orphaned images without queueing them.")
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0:
+            raise CommandError("The minimum age must be positive.")
+
+        referenced = set(KEPT_IMAGES)
+        for model in (Post, UserProfile):
+            referenced.update(
+                model.objects.exclude(image_public_id="").order_by()
+                .values_list('image_public_id', flat=True)
+                .iterator(chunk_size=self.batch_size))
+        # Images already queued are left to the deletion worker.
+        referenced.update(
+            PendingDeletion.objects.values_list('public_id', flat=True))
+
+        stored_before = timezone.now() - timedelta(hours=options['min_age'])
+        orphans = [
+            stored['public_id']
+            for stored in get_image_backend().list(options['prefix'])
+            if stored['public_id'] not in referenced
+            and stored['created_at'] <= stored_before
+        ]
+
+        if options['verbosity'] > 1:
+            for public_id in orphans:
+                self.stdout.write(public_id)
+
+        if options['dry_run']:
+            self.stdout.write(f"{len(orphans)} orphaned images found.")
+            return
+
+        for start in range(0, len(orphans), self.batch_size):
+            queue_image_deletions(orphans[start:start + self.batch_size])
+        self.stdout.write(self.style.SUCCESS(
+            f"Queued {len(orphans)} orphaned images for deletion."))
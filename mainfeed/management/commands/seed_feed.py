@@ -0,0 +1,66 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from mainfeed.synthetic import PLACEHOLDER_IMAGES, seed_dataset
+
+
+class Command(BaseCommand):
+    help = ("Fills the database with synthetic users, profiles, posts and "
+            "comments for load testing, inserting them in batches. Posts "
+            "are given placeholder image public ids, so nothing is uploaded "
+            "to Cloudinary. The same seed always gives the same data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=0,
+                            help="Seed of the synthetic data.")
+        parser.add_argument('--days', type=int, default=90,
+                            help="How many days the posts are spread over.")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="The most rows inserted by one query.")
+        parser.add_argument(
+            '--prefix', default='synthetic',
+            help="The start of each synthetic username. Use a new prefix to "
+                 "seed more users into a database seeded before.")
+        parser.add_argument(
+            '--image', action='append', dest='images', default=[],
+            help="An image public id to give posts in place of the "
+                 "placeholders. May be given more than once.")
+
+    def handle(self, *args, **options):
+        users = options['users']
+        posts = options['posts']
+        comments = options['comments']
+
+        if min(users, posts, comments) < 0 or options['batch_size'] < 1:
+            raise CommandError("Counts and the batch size must be positive.")
+        if posts and not users:
+            raise CommandError("Posts need at least one user to write them.")
+        if comments and not posts:
+            raise CommandError("Comments need at least one post.")
+
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=f"{prefix}_user_").exists():
+            raise CommandError(
+                f"Users prefixed '{prefix}' already exist. Choose another "
+                "--prefix to add more.")
+
+        def progress(name, done):
+            if options['verbosity'] > 1:
+                self.stdout.write(f"Inserted {done} {name}.")
+
+        created = seed_dataset(
+            users, posts, comments,
+            seed=options['seed'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            prefix=prefix,
+            images=tuple(options['images']) or PLACEHOLDER_IMAGES,
+            progress=progress,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['users']} users, {created['posts']} posts "
+            f"and {created['comments']} comments."))
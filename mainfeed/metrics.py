@@ -0,0 +1,22 @@
+import math
+
+
+def percentile(values, percent):
+    """Gets a percentile of some values by linear interpolation.
+
+    Args:
+        values (list): The measured values.
+        percent (float): The percentile to get, from 0 to 100.
+
+    Returns:
+        Union[float, None]: the percentile, or None if there are no values.
+    """
+
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * percent / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    fraction = rank - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
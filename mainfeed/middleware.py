@@ -0,0 +1,104 @@
+from allauth.account.middleware import AccountMiddleware
+from allauth.core import context
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.core.handlers.asgi import ASGIRequest
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.functional import SimpleLazyObject
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .cache import get_cached_user
+
+
+class AsgiUrlconfMiddleware(MiddlewareMixin):
+    """Routes requests served over ASGI through the ASGI_URLCONF.
+
+    The ASGI_URLCONF serves the busiest read-only pages with their async
+    views, while requests served over WSGI keep their sync views.
+    """
+
+    def process_request(self, request):
+        if isinstance(request, ASGIRequest):
+            request.urlconf = settings.ASGI_URLCONF
+
+
+class CachedAuthenticationMiddleware(AuthenticationMiddleware):
+    """Sets the user of each request, reading signed-in users from the
+    cache rather than the database.
+
+    As with Django's AuthenticationMiddleware, the user is only read when
+    the request first uses it.
+    """
+
+    def process_request(self, request):
+        super().process_request(request)
+        request.user = SimpleLazyObject(lambda: get_cached_user(request))
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """WhiteNoise's middleware, able to run in an async middleware chain.
+
+    WhiteNoise only supports sync chains, so under ASGI it would have the
+    whole chain run in a thread. Static files are found in memory, so
+    they are served on the event loop and every other request is passed
+    on asynchronously. In development, where WhiteNoise looks files up
+    on disk, they are looked up in a thread.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            response = await sync_to_async(self.process_request)(request)
+        else:
+            response = self.process_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return response
+
+
+class AsyncAccountMiddleware(AccountMiddleware):
+    """Allauth's account middleware, able to run in an async middleware
+    chain.
+
+    Allauth's middleware only supports sync chains, so under ASGI it
+    would have the whole chain run in a thread. Its pending login is only
+    read from the session in a thread when the session may have to be
+    loaded, since requests without a session have none.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        with context.request_context(request):
+            response = await self.get_response(request)
+            if request.session.session_key is None:
+                self._remove_dangling_login(request, response)
+            else:
+                await sync_to_async(self._remove_dangling_login)(
+                    request, response)
+            return response
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:11
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_existing_comments(apps, schema_editor):
+    """Sets the comment count of each existing post."""
+
+    Post = apps.get_model('mainfeed', 'Post')
+    Comment = apps.get_model('mainfeed', 'Comment')
+    comment_counts = (Comment.objects.filter(post=OuterRef('pk')).order_by()
+                      .values('post').annotate(total=Count('pk'))
+                      .values('total'))
+    Post.objects.update(comment_count=Coalesce(Subquery(comment_counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainfeed', '0011_post_comment_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing_comments,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:39
+
+import cloudinary.models
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userprofile', '0007_userprofile_updated_on'),
+        ('mainfeed', '0012_post_comment_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', editable=False, max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=cloudinary.models.CloudinaryField(blank=True, max_length=255, verbose_name='image'),
+        ),
+        migrations.CreateModel(
+            name='PendingUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('content_type', models.CharField(blank=True, max_length=100)),
+                ('content', models.BinaryField()),
+                ('options', models.JSONField(default=dict)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_on', models.DateTimeField(auto_now_add=True)),
+                ('available_on', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('post', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pending_upload', to='mainfeed.post')),
+                ('profile', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='pending_uploads', to='userprofile.userprofile')),
+            ],
+            options={
+                'ordering': ['created_on', 'id'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='pendingupload',
+            constraint=models.CheckConstraint(check=models.Q(('post__isnull', True), ('profile__isnull', True), _connector='XOR'), name='pending_upload_has_one_target'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from mainfeed.search import install_search_index, uninstall_search_index
+
+
+def install(apps, schema_editor):
+    """Creates the search index of posts and comments."""
+
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    """Drops the search index of posts and comments."""
+
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainfeed', '0015_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+def record_image_public_ids(apps, schema_editor):
+    """Sets the image public id of each existing post."""
+
+    Post = apps.get_model('mainfeed', 'Post')
+    for post in Post.objects.exclude(image='').iterator():
+        Post.objects.filter(pk=post.pk).update(
+            image_public_id=post.image.public_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mainfeed', '0017_tag_posttag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_public_id',
+            field=models.CharField(blank=True, db_index=True, editable=False,
+                                   max_length=255),
+        ),
+        migrations.RunPython(record_image_public_ids,
+                             migrations.RunPython.noop),
+    ]
@@ -1,24 +1,152 @@
 from cloudinary.models import CloudinaryField
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from userprofile.models import UserProfile
 
+from .pagination import CursorPage, encode_cursor
+from .search import search_posts
+
 # Create your models here
 
+# The number of latest comments shown under each post in a feed.
+COMMENT_PREVIEW_LENGTH = 3
+
+# The longest a tag may be. Longer hashtags are not tagged.
+TAG_MAX_LENGTH = 50
+
+
+def comment_preview_prefetch(comment_preview_length=COMMENT_PREVIEW_LENGTH):
+    """Builds the prefetch loading the latest comments of each post.
+
+    The latest comments of every post, with their authors and users, are
+    fetched together in one windowed query and stored on each post as
+    preview_comments, oldest first.
+
+    Args:
+        comment_preview_length (int): The most comments to load for each
+        post.
+
+    Returns:
+        Prefetch: the prefetch of the comment preview.
+    """
+
+    latest_first = Window(
+        RowNumber(),
+        partition_by=F('post_id'),
+        order_by=[F('created_on').desc(), F('id').desc()],
+    )
+    preview = (Comment.objects.select_related('author__user')
+               .annotate(recency=latest_first)
+               .filter(recency__lte=comment_preview_length)
+               .order_by(*Comment.THREAD_ORDERING))
+    return models.Prefetch('comments', queryset=preview,
+                           to_attr='preview_comments')
+
+
+class ImageStatus(models.TextChoices):
+    """How far a post's image has got through the upload worker."""
+
+    PROCESSING = "processing"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class PostQuerySet(models.QuerySet):
+    """QuerySet shared by every view that renders a feed of posts."""
+
+    def published(self):
+        """Filters out posts whose image has not been uploaded yet."""
+
+        return self.filter(image_status=ImageStatus.READY)
+
+    def with_authors(self):
+        """Joins the author profile and user onto the post query."""
+
+        return self.select_related('author__user')
+
+    def search(self, query):
+        """Filters posts matching a search by their text or comments.
+
+        The posts are annotated with their rank, which is higher for
+        better matches, and ordered best match first.
+        """
+
+        return search_posts(self, query)
+
+    def for_feed(self, comment_preview_length=COMMENT_PREVIEW_LENGTH):
+        """Loads the related objects rendered alongside each post.
+
+        The authors are joined onto the post query and the latest comments
+        of every post are prefetched as preview_comments.
+
+        Args:
+            comment_preview_length (int): The most comments to load for
+            each post.
+
+        Returns:
+            PostQuerySet: posts rendered in a fixed number of queries.
+        """
+
+        return self.with_authors().prefetch_related(
+            comment_preview_prefetch(comment_preview_length))
+
 
 class Post(models.Model):
     author = models.ForeignKey(UserProfile, on_delete=models.CASCADE,
                                related_name="users_posts")
-    image = CloudinaryField('image')
+    image = CloudinaryField('image', blank=True)
+    # The public id of the image, kept in step with it on saving, so the
+    # deletion worker can find the posts showing an image by index.
+    image_public_id = models.CharField(max_length=255, blank=True,
+                                       editable=False, db_index=True)
+    image_status = models.CharField(max_length=10, choices=ImageStatus.choices,
+                                    default=ImageStatus.READY, editable=False)
+    # The size the image is stored at and its dominant colour, so pages can
+    # reserve its space and paint its colour before it loads.
+    image_width = models.PositiveIntegerField(null=True, blank=True,
+                                              editable=False)
+    image_height = models.PositiveIntegerField(null=True, blank=True,
+                                               editable=False)
+    placeholder_colour = models.CharField(max_length=7, blank=True,
+                                          editable=False)
     text = models.TextField(max_length=1000)
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    tags = models.ManyToManyField("Tag", through="PostTag",
+                                  related_name="posts", editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_on"]
+        indexes = [
+            models.Index(fields=["author", "-created_on"],
+                         name="post_author_created_idx"),
+            models.Index(fields=["-created_on", "-id"],
+                         name="post_created_id_idx"),
+        ]
 
     def __str__(self):
         return f"Post written by {self.author} starting '{self.text[:40]}'"
 
+    @property
+    def comment_preview(self):
+        """The preview comments loaded by for_feed as a page of comments.
+
+        The page links to earlier comments when the post has more comments
+        than the preview holds.
+        """
+
+        comments = self.preview_comments
+        previous_cursor = None
+        if comments and self.comment_count > len(comments):
+            previous_cursor = encode_cursor(comments[0],
+                                            Comment.THREAD_ORDERING)
+        return CursorPage(comments, None, previous_cursor)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
@@ -29,8 +157,114 @@ class Comment(models.Model):
     created_on = models.DateTimeField(auto_now_add=True)
     updated_on = models.DateTimeField(auto_now=True)
 
+    # Unique ordering used to paginate the comments of a post by cursor.
+    THREAD_ORDERING = ("created_on", "id")
+
     class Meta:
         ordering = ["created_on"]
+        indexes = [
+            models.Index(fields=["post", "created_on"],
+                         name="comment_post_created_idx"),
+        ]
 
     def __str__(self):
         return f"Comment {self.body} by {self.author}"
+
+
+class Tag(models.Model):
+    """A hashtag used in the text of posts, stored in normalised form."""
+
+    name = models.CharField(max_length=TAG_MAX_LENGTH, unique=True)
+
+    class Meta:
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostTag(models.Model):
+    """A tag used by a post.
+
+    The post's creation time is copied onto each of its tags, so the
+    newest posts with a tag are read from the tag's index entries alone.
+    """
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name="post_tags")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE,
+                            related_name="post_tags")
+    created_on = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["post", "tag"],
+                                    name="post_tag_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["tag", "-created_on", "-post"],
+                         name="post_tag_feed_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.tag} on post {self.post_id}"
+
+
+class PendingUpload(models.Model):
+    """An uploaded image waiting for the upload worker.
+
+    The file is staged in the database, so that any worker process can
+    upload it to the image backend, and is deleted once its post or
+    profile has been given the uploaded image.
+    """
+
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, null=True,
+                                blank=True, related_name="pending_upload")
+    profile = models.ForeignKey(UserProfile, on_delete=models.CASCADE,
+                                null=True, blank=True,
+                                related_name="pending_uploads")
+    name = models.CharField(max_length=255, blank=True)
+    content_type = models.CharField(max_length=100, blank=True)
+    content = models.BinaryField()
+    options = models.JSONField(default=dict)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    # When a worker may next claim the upload. Claiming moves it forward by
+    # a lease, so an upload abandoned by a crashed worker is retried.
+    available_on = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["created_on", "id"]
+        constraints = [
+            models.CheckConstraint(
+                check=(models.Q(post__isnull=True)
+                       ^ models.Q(profile__isnull=True)),
+                name="pending_upload_has_one_target"),
+        ]
+
+    def __str__(self):
+        target = self.post or self.profile
+        return f"Pending upload of {self.name or 'an image'} for {target}"
+
+
+class PendingDeletion(models.Model):
+    """A stored image waiting for the deletion worker to destroy it.
+
+    Images are queued when the post or profile showing them is deleted or
+    given another image, in the same transaction, so none is lost if the
+    worker is not running.
+    """
+
+    public_id = models.CharField(max_length=255, unique=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_on = models.DateTimeField(auto_now_add=True)
+    # When a worker may next claim the deletion, as for PendingUpload.
+    available_on = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        ordering = ["created_on", "id"]
+
+    def __str__(self):
+        return f"Pending deletion of {self.public_id}"
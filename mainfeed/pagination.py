@@ -0,0 +1,237 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    """Raised when a cursor cannot be decoded for the paginated ordering."""
+
+
+def encode_cursor(obj, ordering):
+    """Encodes the values an object holds for an ordering as a cursor.
+
+    Args:
+        obj (Model): The object at the edge of a page.
+        ordering (tuple): The field names the objects are ordered by.
+
+    Returns:
+        str: an opaque, URL-safe cursor.
+    """
+
+    values = []
+    for key in ordering:
+        value = obj
+        for attribute in key.lstrip('-').split('__'):
+            value = getattr(value, attribute)
+        if isinstance(value, datetime.datetime):
+            value = value.isoformat()
+        values.append(value)
+    data = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+
+class CursorPage:
+    """A page of objects returned by a KeysetPaginator.
+
+    Unlike Django's Page, a CursorPage knows nothing about the total number
+    of objects. It only knows whether there are objects either side of it
+    and holds the cursors that fetch them.
+    """
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+
+class KeysetPaginator:
+    """Paginates a queryset by seeking past the keys of the last object seen.
+
+    Each page is fetched with a WHERE clause on the ordering keys and a
+    LIMIT, so page N costs the same as page 1 and no COUNT query is made.
+    The ordering must be unique, which is why it ends with the primary key.
+
+    Cursors are opaque, URL-safe strings encoding the ordering key values of
+    the object at the edge of a page.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_on', '-id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.keys = [(key.lstrip('-'), key.startswith('-'))
+                     for key in self.ordering]
+
+    def page(self, after=None, before=None):
+        """Returns the page following the after cursor or preceding the
+        before cursor.
+
+        Args:
+            after (str): The cursor of the last object on the previous page.
+            before (str): The cursor of the first object on the next page.
+
+        Returns:
+            CursorPage: the first page if neither cursor is given.
+
+        Raises:
+            InvalidCursor: if a cursor cannot be decoded.
+        """
+
+        queryset = self.page_queryset(after=after, before=before)
+        return self._page(list(queryset[:self.per_page + 1]), after, before)
+
+    async def apage(self, after=None, before=None):
+        """Async version of page(), reading the page with the async ORM."""
+
+        queryset = self.page_queryset(after=after, before=before)
+        object_list = [obj async for obj in queryset[:self.per_page + 1]]
+        return self._page(object_list, after, before)
+
+    def _page(self, object_list, after, before):
+        """Builds the page from the objects read for it, which include one
+        more object than fits if there are more to come."""
+
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+
+        if before:
+            object_list.reverse()
+            has_next = True
+            has_previous = has_more
+        else:
+            has_next = has_more
+            has_previous = bool(after)
+
+        next_cursor = None
+        previous_cursor = None
+        if object_list and has_next:
+            next_cursor = self.encode_cursor(object_list[-1])
+        if object_list and has_previous:
+            previous_cursor = self.encode_cursor(object_list[0])
+        return CursorPage(object_list, next_cursor, previous_cursor)
+
+    def page_queryset(self, after=None, before=None):
+        """Returns the ordered queryset a page is sliced from.
+
+        When seeking backwards from a before cursor the ordering is
+        reversed, so the objects nearest the cursor come first.
+
+        Args:
+            after (str): The cursor of the last object on the previous page.
+            before (str): The cursor of the first object on the next page.
+
+        Returns:
+            QuerySet: the unsliced queryset for the page.
+        """
+
+        if before:
+            values = self.decode_cursor(before)
+            reverse_ordering = [key[1:] if key.startswith('-') else f'-{key}'
+                                for key in self.ordering]
+            return self.queryset.filter(
+                self._seek(values, forward=False)).order_by(*reverse_ordering)
+
+        queryset = self.queryset
+        if after:
+            values = self.decode_cursor(after)
+            queryset = queryset.filter(self._seek(values, forward=True))
+        return queryset.order_by(*self.ordering)
+
+    def encode_cursor(self, obj):
+        """Encodes the ordering key values of an object as a cursor."""
+
+        return encode_cursor(obj, self.ordering)
+
+    def decode_cursor(self, cursor):
+        """Decodes a cursor back into ordering key values.
+
+        Values of model fields and annotations are converted back to their
+        Python type so they compare correctly with the database column.
+        Only strings and numbers are accepted, as cursors never hold other
+        values.
+        """
+
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+            raise InvalidCursor('Cursor could not be decoded.') from error
+
+        if not isinstance(values, list) or len(values) != len(self.keys):
+            raise InvalidCursor('Cursor does not match the ordering.')
+
+        decoded = []
+        for (name, _), value in zip(self.keys, values):
+            if (isinstance(value, bool)
+                    or not isinstance(value, (str, int, float))):
+                raise InvalidCursor('Cursor value is invalid.')
+            field = self.key_field(name)
+            if field is None:
+                decoded.append(value)
+                continue
+            try:
+                decoded.append(field.to_python(value))
+            except (ValidationError, TypeError, ValueError) as error:
+                raise InvalidCursor('Cursor value is invalid.') from error
+            if decoded[-1] is None:
+                raise InvalidCursor('Cursor value is invalid.')
+        return decoded
+
+    def key_field(self, name):
+        """Gets the model field or annotation an ordering key is read from.
+
+        Returns:
+            Union[Field, None]: the field, or None if its type is unknown.
+        """
+
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            pass
+        annotation = self.queryset.query.annotations.get(name)
+        return getattr(annotation, 'output_field', None)
+
+    def _seek(self, values, forward):
+        """Builds the condition selecting rows past the given key values.
+
+        For keys (a, b) this is a < x OR (a = x AND b < y), with each
+        comparison flipped for ascending keys or when seeking backwards.
+        The redundant a <= x bound lets the database range scan the index
+        on the leading key instead of testing every row against the OR.
+        """
+
+        condition = Q()
+        for index, (name, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending == forward else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            for (equal_name, _), equal_value in zip(self.keys[:index],
+                                                    values[:index]):
+                step &= Q(**{equal_name: equal_value})
+            condition |= step
+
+        name, descending = self.keys[0]
+        bound = 'lte' if descending == forward else 'gte'
+        return Q(**{f'{name}__{bound}': values[0]}) & condition
@@ -0,0 +1,32 @@
+from django.utils import timezone
+
+
+def claim_batch(queryset, limit, lease):
+    """Claims the next rows of a work queue that no worker is holding.
+
+    Queue rows record when they are next available. The batch is claimed
+    by moving that forward by the lease in one update conditional on the
+    rows still being available, then read back by the new time, so two
+    workers never claim the same row. Rows held by a worker that crashed
+    are claimed again once their lease runs out.
+
+    Args:
+        queryset (QuerySet): The rows of the queue, in the order they are
+        to be worked on.
+        limit (int): The most rows to claim.
+        lease (timedelta): How long the claimed rows are held.
+
+    Returns:
+        list: the claimed rows.
+    """
+
+    now = timezone.now()
+    leased_until = now + lease
+    available = queryset.filter(available_on__lte=now)
+    claimed_ids = list(available.values_list("id", flat=True)[:limit])
+    if not claimed_ids:
+        return []
+
+    available.filter(pk__in=claimed_ids).update(available_on=leased_until)
+    return list(queryset.filter(pk__in=claimed_ids,
+                                available_on=leased_until))
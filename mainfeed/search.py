@@ -0,0 +1,258 @@
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+# The words of a search, which are all that is matched. Punctuation and
+# search operators are dropped, so no search can be malformed.
+SEARCH_TERM = re.compile(r"\w+")
+
+# The most words of a search that are matched.
+MAX_SEARCH_TERMS = 8
+
+# How much the best matching comment of a post counts towards its rank,
+# relative to the post's own text.
+COMMENT_RANK_WEIGHT = 0.5
+
+# Unique ordering of search results, best match first.
+SEARCH_ORDERING = ("-rank", "-id")
+
+
+def search_terms(query):
+    """Splits a search into the lowercase words that are matched.
+
+    Args:
+        query (str): The search as the user typed it.
+
+    Returns:
+        list: the words of the search, at most MAX_SEARCH_TERMS of them.
+    """
+
+    return [term.lower()
+            for term in SEARCH_TERM.findall(query or "")][:MAX_SEARCH_TERMS]
+
+
+class PostgresSearchBackend:
+    """Searches posts and comments with PostgreSQL full-text search.
+
+    Post text and comment bodies are indexed by a stored tsvector column,
+    which PostgreSQL generates whenever a row is written, under a GIN
+    index. Matching posts are found through the indexes and ranked with
+    ts_rank.
+    """
+
+    INSTALL_SQL = [
+        """ALTER TABLE mainfeed_post ADD COLUMN IF NOT EXISTS search_vector
+           tsvector GENERATED ALWAYS AS (to_tsvector('english', "text"))
+           STORED""",
+        """CREATE INDEX IF NOT EXISTS post_search_idx ON mainfeed_post
+           USING gin (search_vector)""",
+        """ALTER TABLE mainfeed_comment ADD COLUMN IF NOT EXISTS
+           search_vector tsvector
+           GENERATED ALWAYS AS (to_tsvector('english', body)) STORED""",
+        """CREATE INDEX IF NOT EXISTS comment_search_idx ON mainfeed_comment
+           USING gin (search_vector)""",
+    ]
+
+    UNINSTALL_SQL = [
+        "ALTER TABLE mainfeed_post DROP COLUMN IF EXISTS search_vector",
+        "ALTER TABLE mainfeed_comment DROP COLUMN IF EXISTS search_vector",
+    ]
+
+    MATCHING_SQL = """
+        SELECT id FROM mainfeed_post
+        WHERE search_vector @@ plainto_tsquery('english', %s)
+        UNION
+        SELECT post_id FROM mainfeed_comment
+        WHERE search_vector @@ plainto_tsquery('english', %s)"""
+
+    RANK_SQL = """
+        ts_rank(mainfeed_post.search_vector, plainto_tsquery('english', %s))
+        + %s * COALESCE((
+            SELECT max(ts_rank(search_comment.search_vector, query))
+            FROM mainfeed_comment search_comment,
+                 plainto_tsquery('english', %s) query
+            WHERE search_comment.post_id = mainfeed_post.id
+              AND search_comment.search_vector @@ query), 0)"""
+
+    def match_query(self, terms):
+        return " ".join(terms)
+
+    def matching_sql(self, terms):
+        query = self.match_query(terms)
+        return self.MATCHING_SQL, [query, query]
+
+    def rank_sql(self, terms):
+        query = self.match_query(terms)
+        return self.RANK_SQL, [query, COMMENT_RANK_WEIGHT, query]
+
+
+class SQLiteSearchBackend:
+    """Searches posts and comments with SQLite FTS5, for local use.
+
+    Post text and comment bodies are indexed by external content FTS5
+    tables, kept up to date by triggers on the tables they index. Matching
+    posts are ranked with bm25, negated so that better matches rank
+    higher.
+
+    SQLite migrations rebuild a table to alter it, which drops its
+    triggers, so installing is safe to repeat and is done again after
+    every migration.
+    """
+
+    INSTALL_SQL = [
+        """CREATE VIRTUAL TABLE IF NOT EXISTS mainfeed_post_fts USING fts5(
+           text, content='mainfeed_post', content_rowid='id',
+           tokenize='porter unicode61')""",
+        """CREATE TRIGGER IF NOT EXISTS mainfeed_post_fts_insert
+           AFTER INSERT ON mainfeed_post BEGIN
+           INSERT INTO mainfeed_post_fts(rowid, text)
+           VALUES (new.id, new.text); END""",
+        """CREATE TRIGGER IF NOT EXISTS mainfeed_post_fts_delete
+           AFTER DELETE ON mainfeed_post BEGIN
+           INSERT INTO mainfeed_post_fts(mainfeed_post_fts, rowid, text)
+           VALUES ('delete', old.id, old.text); END""",
+        """CREATE TRIGGER IF NOT EXISTS mainfeed_post_fts_update
+           AFTER UPDATE OF text ON mainfeed_post BEGIN
+           INSERT INTO mainfeed_post_fts(mainfeed_post_fts, rowid, text)
+           VALUES ('delete', old.id, old.text);
+           INSERT INTO mainfeed_post_fts(rowid, text)
+           VALUES (new.id, new.text); END""",
+        "INSERT INTO mainfeed_post_fts(mainfeed_post_fts) VALUES ('rebuild')",
+        """CREATE VIRTUAL TABLE IF NOT EXISTS mainfeed_comment_fts USING fts5(
+           body, content='mainfeed_comment', content_rowid='id',
+           tokenize='porter unicode61')""",
+        """CREATE TRIGGER IF NOT EXISTS mainfeed_comment_fts_insert
+           AFTER INSERT ON mainfeed_comment BEGIN
+           INSERT INTO mainfeed_comment_fts(rowid, body)
+           VALUES (new.id, new.body); END""",
+        """CREATE TRIGGER IF NOT EXISTS mainfeed_comment_fts_delete
+           AFTER DELETE ON mainfeed_comment BEGIN
+           INSERT INTO mainfeed_comment_fts(mainfeed_comment_fts, rowid, body)
+           VALUES ('delete', old.id, old.body); END""",
+        """CREATE TRIGGER IF NOT EXISTS mainfeed_comment_fts_update
+           AFTER UPDATE OF body ON mainfeed_comment BEGIN
+           INSERT INTO mainfeed_comment_fts(mainfeed_comment_fts, rowid, body)
+           VALUES ('delete', old.id, old.body);
+           INSERT INTO mainfeed_comment_fts(rowid, body)
+           VALUES (new.id, new.body); END""",
+        """INSERT INTO mainfeed_comment_fts(mainfeed_comment_fts)
+           VALUES ('rebuild')""",
+    ]
+
+    UNINSTALL_SQL = [
+        "DROP TABLE IF EXISTS mainfeed_post_fts",
+        "DROP TRIGGER IF EXISTS mainfeed_post_fts_insert",
+        "DROP TRIGGER IF EXISTS mainfeed_post_fts_delete",
+        "DROP TRIGGER IF EXISTS mainfeed_post_fts_update",
+        "DROP TABLE IF EXISTS mainfeed_comment_fts",
+        "DROP TRIGGER IF EXISTS mainfeed_comment_fts_insert",
+        "DROP TRIGGER IF EXISTS mainfeed_comment_fts_delete",
+        "DROP TRIGGER IF EXISTS mainfeed_comment_fts_update",
+    ]
+
+    MATCHING_SQL = """
+        SELECT rowid FROM mainfeed_post_fts
+        WHERE mainfeed_post_fts MATCH %s
+        UNION
+        SELECT search_comment.post_id FROM mainfeed_comment_fts
+        JOIN mainfeed_comment search_comment
+          ON search_comment.id = mainfeed_comment_fts.rowid
+        WHERE mainfeed_comment_fts MATCH %s"""
+
+    RANK_SQL = """
+        COALESCE((
+            SELECT -mainfeed_post_fts.rank FROM mainfeed_post_fts
+            WHERE mainfeed_post_fts MATCH %s
+              AND mainfeed_post_fts.rowid = mainfeed_post.id), 0)
+        + %s * COALESCE((
+            SELECT -min(mainfeed_comment_fts.rank) FROM mainfeed_comment_fts
+            JOIN mainfeed_comment search_comment
+              ON search_comment.id = mainfeed_comment_fts.rowid
+            WHERE mainfeed_comment_fts MATCH %s
+              AND search_comment.post_id = mainfeed_post.id), 0)"""
+
+    def match_query(self, terms):
+        # Each word is quoted so none is read as an FTS5 operator.
+        return " ".join(f'"{term}"' for term in terms)
+
+    def matching_sql(self, terms):
+        query = self.match_query(terms)
+        return self.MATCHING_SQL, [query, query]
+
+    def rank_sql(self, terms):
+        query = self.match_query(terms)
+        return self.RANK_SQL, [query, COMMENT_RANK_WEIGHT, query]
+
+
+# The search backend of each database vendor.
+SEARCH_BACKENDS = {
+    "postgresql": PostgresSearchBackend,
+    "sqlite": SQLiteSearchBackend,
+}
+
+
+def search_backend(connection):
+    """Gets the search backend for a database connection.
+
+    Raises:
+        ImproperlyConfigured: if the database has no search backend.
+    """
+
+    try:
+        return SEARCH_BACKENDS[connection.vendor]()
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Search is not supported on {connection.vendor} databases.")
+
+
+def install_search_index(connection):
+    """Creates the search index of a database, indexing existing rows.
+
+    Installing an index already in place changes nothing.
+    """
+
+    with connection.cursor() as cursor:
+        for sql in search_backend(connection).INSTALL_SQL:
+            cursor.execute(sql)
+
+
+def uninstall_search_index(connection):
+    """Drops the search index of a database."""
+
+    with connection.cursor() as cursor:
+        for sql in search_backend(connection).UNINSTALL_SQL:
+            cursor.execute(sql)
+
+
+def search_posts(queryset, query):
+    """Filters posts to those matching a search and ranks them.
+
+    A post matches when every word of the search is found in its text, or
+    every word is found in one of its comments. The text and each comment
+    are indexed separately, so a search whose words are split between
+    them finds nothing. Words are matched by their stem, so "baking" finds
+    "baked". Posts are found through the search index and only those
+    found are ranked.
+
+    Args:
+        queryset (QuerySet): The posts to search.
+        query (str): The search as the user typed it.
+
+    Returns:
+        QuerySet: the matching posts annotated with their rank, which is
+        higher for better matches, best match first. No posts if the
+        search has no words.
+    """
+
+    terms = search_terms(query)
+    if not terms:
+        return queryset.none()
+
+    backend = search_backend(connections[queryset.db])
+    matching = RawSQL(*backend.matching_sql(terms))
+    rank = RawSQL(*backend.rank_sql(terms), output_field=FloatField())
+    return (queryset.filter(id__in=matching).annotate(rank=rank)
+            .order_by(*SEARCH_ORDERING))
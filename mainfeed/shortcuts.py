@@ -0,0 +1,57 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from userprofile.models import UserProfile
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """Async version of get_object_or_404, reading with the async ORM.
+
+    Args:
+        queryset (QuerySet): The objects to get the object from.
+        **kwargs: The lookups selecting the object.
+
+    Returns:
+        Model: the object.
+
+    Raises:
+        Http404: if no object matches the lookups.
+    """
+
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(
+            f"No {queryset.model._meta.object_name} matches the given query.")
+
+
+async def aget_user(request):
+    """Gets the user making a request.
+
+    The user is read from the session synchronously, so they are loaded in
+    a thread. They stay loaded on the request for the rest of it.
+    """
+
+    await sync_to_async(getattr)(request.user, "pk")
+    return request.user
+
+
+def get_profile_id(request):
+    """Gets the id of the profile of the signed-in user making a request.
+
+    The profile is cached with the signed-in user, so it is only read if
+    the user was not cached.
+
+    Args:
+        request (HttpRequest): The request of the signed-in user.
+
+    Returns:
+        int: the id of the user's profile.
+
+    Raises:
+        Http404: if the user has no profile.
+    """
+
+    try:
+        return request.user.user_profile.pk
+    except UserProfile.DoesNotExist:
+        raise Http404("No UserProfile matches the given query.")
@@ -0,0 +1,143 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.urls import reverse
+from userprofile.models import UserProfile
+
+from .cache import (USERNAMES_VERSION_KEY, bump_version, invalidate_feed,
+                    post_comments_version_key, user_cache_key)
+from .deletions import image_public_id, queue_image_deletions
+from .events import publish_event
+from .models import Comment, ImageStatus, Post
+
+
+def deleted_with_post(comment, origin):
+    """Tells whether a comment is being deleted along with its post.
+
+    The post's own signal discards what showed it, so nothing needs to be
+    discarded for each of its comments.
+    """
+
+    return isinstance(origin, Post) and comment.post_id == origin.pk
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def invalidate_feed_on_change(sender, instance, origin=None, **kwargs):
+    """Discards rendered feed pages whenever content they show changes."""
+
+    if sender is Comment and deleted_with_post(instance, origin):
+        return
+    invalidate_feed()
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_post_fragments(sender, instance, origin=None, **kwargs):
+    """Discards the rendered fragments of a post when its comments
+    change."""
+
+    if deleted_with_post(instance, origin):
+        return
+    bump_version(post_comments_version_key(instance.post_id))
+
+
+@receiver(post_save, sender=Post)
+def publish_new_post(sender, instance, created, update_fields, **kwargs):
+    """Tells live feeds about a post once it is published.
+
+    Posts are published when their image finishes uploading, or straight
+    away if created with their image ready.
+    """
+
+    if instance.image_status != ImageStatus.READY:
+        return
+    if created or (update_fields and "image_status" in update_fields):
+        publish_event("post", {
+            "post": instance.id,
+            "url": reverse("post_fragment", args=[instance.id]),
+        })
+
+
+@receiver(post_save, sender=Comment)
+def publish_new_comment(sender, instance, created, **kwargs):
+    """Tells live feeds about a new comment, so they can refresh the
+    comments shown under its post."""
+
+    if created:
+        publish_event("comment", {
+            "post": instance.post_id,
+            "comment": instance.id,
+            "url": reverse("post_fragment", args=[instance.post_id]),
+        })
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=UserProfile)
+def record_image_public_id(sender, instance, **kwargs):
+    """Keeps the public id of a post or profile's image in step with it.
+
+    Saves limited by update_fields must list image_public_id alongside
+    image for it to be stored.
+    """
+
+    instance.image_public_id = image_public_id(instance.image) or ""
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=UserProfile)
+def queue_deleted_image(sender, instance, **kwargs):
+    """Queues the image of a deleted post or profile for deletion.
+
+    Posts and profiles deleted along with their user or author are
+    included, as cascade deletes send the signal for each of them.
+    """
+
+    queue_image_deletions([instance.image])
+
+
+@receiver(pre_save, sender=User)
+def track_username_change(sender, instance, update_fields, **kwargs):
+    """Records on the user whether a save changes their username.
+
+    Other saves of a user, such as recording their last login, are not
+    checked against the database.
+    """
+
+    instance._username_changed = False
+    if instance.pk is None:
+        return
+    if update_fields is not None and "username" not in update_fields:
+        return
+
+    previous_username = (User.objects.filter(pk=instance.pk)
+                         .values_list("username", flat=True).first())
+    instance._username_changed = previous_username != instance.username
+
+
+@receiver(post_save, sender=User)
+def invalidate_feed_on_username_change(sender, instance, **kwargs):
+    """Discards rendered feed pages and post fragments when a user changes
+    their username."""
+
+    if getattr(instance, "_username_changed", False):
+        invalidate_feed()
+        bump_version(USERNAMES_VERSION_KEY)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def forget_cached_user(sender, instance, **kwargs):
+    """Discards the cached copy of a user whenever they or their profile
+    are saved or deleted, so requests see their new password, name, status
+    or profile."""
+
+    user_id = instance.user_id if sender is UserProfile else instance.pk
+    cache.delete(user_cache_key(user_id))
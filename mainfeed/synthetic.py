@@ -0,0 +1,220 @@
+import itertools
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from userprofile.models import UserProfile
+
+from .cache import invalidate_feed
+from .deletions import image_public_id
+from .models import Comment, Post
+from .tags import tag_posts
+
+# Public ids stored on synthetic posts in place of uploaded images. Nothing
+# is uploaded, so these only need to build valid Cloudinary URLs.
+PLACEHOLDER_IMAGES = tuple(
+    f"foodfeed/synthetic/placeholder-{number}" for number in range(10))
+
+# How strongly activity is skewed towards the most active users and the
+# most popular posts, as the exponent of a Zipf distribution.
+ACTIVITY_SKEW = 1.1
+
+# Synthetic content is dated back from this moment rather than from now,
+# so the same seed always gives the same rows.
+SYNTHETIC_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Words synthetic post and comment text is made of.
+VOCABULARY = (
+    "roast", "vegan", "ugly", "tasty", "burnt", "crispy", "soggy", "spicy",
+    "curry", "pasta", "toast", "ramen", "pie", "salad", "tofu", "noodles",
+    "brunch", "dinner", "homemade", "leftovers", "delicious", "disaster",
+    "garlic", "cheese", "chocolate", "sourdough", "dumplings", "stew",
+)
+
+
+def zipf_cumulative_weights(count, skew=ACTIVITY_SKEW):
+    """Gets cumulative weights giving the item of rank n a share
+    proportional to 1 / n ** skew.
+
+    Cumulative weights let random.choices pick from millions of items
+    without summing the weights on every call.
+    """
+
+    return list(itertools.accumulate(
+        1 / rank ** skew for rank in range(1, count + 1)))
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Lets generated timestamps be saved in place of auto_now values.
+
+    bulk_create sets created_on and updated_on to the current time like
+    save does, which would give every synthetic row the same age.
+    """
+
+    fields = [field for model in models for field in model._meta.fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    try:
+        for field in fields:
+            field.auto_now = field.auto_now_add = False
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def batches(total, batch_size):
+    """Yields the start and size of each batch covering a total."""
+
+    for start in range(0, total, batch_size):
+        yield start, min(batch_size, total - start)
+
+
+def make_text(rng, index, label, words):
+    return f"{label} {index}: " + " ".join(rng.choices(VOCABULARY, k=words))
+
+
+def seed_dataset(users, posts, comments, seed=0, days=90, batch_size=5000,
+                 prefix="synthetic", images=PLACEHOLDER_IMAGES,
+                 progress=None):
+    """Fills the database with a synthetic feed using bulk inserts.
+
+    Rows are generated and inserted in batches, so memory use grows with
+    the number of posts rather than the number of comments. A few users
+    write most posts and comments, and a few posts receive most comments,
+    as in a real feed. Each post is tagged with the last word of its text.
+
+    Profiles are inserted directly rather than by the signal that creates
+    each user's profile, which bulk_create does not send. Nothing else
+    listening to saves is told either, so the cached feed is invalidated
+    once at the end.
+
+    Each part of the data is drawn from its own random stream seeded from
+    seed, so the same arguments always give the same rows.
+
+    Args:
+        users (int): The number of users and profiles to create.
+        posts (int): The number of posts to create.
+        comments (int): The number of comments to create.
+        seed (int): The seed of the random streams.
+        days (int): How many days the posts are spread over.
+        batch_size (int): The most rows inserted by one query.
+        prefix (str): The start of each synthetic username.
+        images (tuple): The image public ids given to posts in turn.
+        progress (callable): Called with a model name and the number of
+        its rows inserted so far after each batch.
+
+    Returns:
+        dict: the number of rows created for each model.
+    """
+
+    def report(name, done):
+        if progress is not None:
+            progress(name, done)
+
+    end = SYNTHETIC_EPOCH.timestamp()
+    start = end - days * 24 * 60 * 60
+    user_weights = zipf_cumulative_weights(users)
+    post_weights = zipf_cumulative_weights(posts)
+
+    # Users and their profiles.
+    profile_ids = array('q')
+    for first, size in batches(users, batch_size):
+        with transaction.atomic(), explicit_timestamps(UserProfile):
+            new_users = User.objects.bulk_create(
+                User(username=f"{prefix}_user_{index}", password="!",
+                     date_joined=SYNTHETIC_EPOCH)
+                for index in range(first, first + size))
+            new_profiles = UserProfile.objects.bulk_create(
+                UserProfile(user=user, bio=f"Synthetic bio {first + index}",
+                            updated_on=SYNTHETIC_EPOCH)
+                for index, user in enumerate(new_users))
+        profile_ids.extend(profile.id for profile in new_profiles)
+        report("users", len(profile_ids))
+
+    # Popularity is independent of age, so rank posts in a shuffled order.
+    popularity = list(range(posts))
+    random.Random(f"{seed}:popularity").shuffle(popularity)
+
+    def commented_posts():
+        """Yields the index of the post each comment is on, in batches.
+
+        The same stream is read twice: once to count each post's comments
+        before the posts are inserted, and again to insert the comments.
+        """
+
+        rng = random.Random(f"{seed}:commented-posts")
+        for _, size in batches(comments, batch_size):
+            yield [popularity[rank] for rank in rng.choices(
+                range(posts), cum_weights=post_weights, k=size)]
+
+    comment_counts = array('q', bytes(8 * posts))
+    for batch in commented_posts():
+        for index in batch:
+            comment_counts[index] += 1
+
+    # Posts, oldest first, with their comment counts already known.
+    post_ids = array('q')
+    post_times = array('d')
+    rng = random.Random(f"{seed}:posts")
+    with explicit_timestamps(Post):
+        for first, size in batches(posts, batch_size):
+            new_posts = []
+            for index in range(first, first + size):
+                created = start + (end - start) * (
+                    index + rng.random()) / posts
+                created_on = datetime.fromtimestamp(created, timezone.utc)
+                author = rng.choices(profile_ids, cum_weights=user_weights)[0]
+                text = make_text(rng, index, "Synthetic post",
+                                 rng.randint(3, 25))
+                image = images[index % len(images)]
+                new_posts.append(Post(
+                    author_id=author,
+                    image=image,
+                    # bulk_create sends no pre_save signal to set it.
+                    image_public_id=image_public_id(image) or "",
+                    # Tag each post with its last word.
+                    text=f"{text} #{text.rsplit(' ', 1)[-1]}",
+                    created_on=created_on,
+                    updated_on=created_on,
+                    comment_count=comment_counts[index],
+                ))
+                post_times.append(created)
+            with transaction.atomic():
+                new_posts = Post.objects.bulk_create(new_posts)
+                tag_posts(new_posts, created=True)
+            post_ids.extend(post.id for post in new_posts)
+            report("posts", len(post_ids))
+
+    # Comments, mostly made soon after their post.
+    rng = random.Random(f"{seed}:comments")
+    created_comments = 0
+    with explicit_timestamps(Comment):
+        for batch in commented_posts():
+            new_comments = []
+            for index in batch:
+                posted = post_times[index]
+                created = posted + (end - posted) * rng.random() ** 3
+                created_on = datetime.fromtimestamp(created, timezone.utc)
+                author = rng.choices(profile_ids, cum_weights=user_weights)[0]
+                new_comments.append(Comment(
+                    post_id=post_ids[index],
+                    author_id=author,
+                    body=make_text(rng, created_comments, "Synthetic comment",
+                                   rng.randint(2, 15)),
+                    created_on=created_on,
+                    updated_on=created_on,
+                ))
+                created_comments += 1
+            with transaction.atomic():
+                Comment.objects.bulk_create(new_comments)
+            report("comments", created_comments)
+
+    invalidate_feed()
+    return {"users": users, "posts": posts, "comments": created_comments}
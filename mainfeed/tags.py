@@ -0,0 +1,114 @@
+import re
+import unicodedata
+
+from django.db import transaction
+
+from .models import TAG_MAX_LENGTH, Post, PostTag, Tag
+
+# A hashtag: a # starting a word, followed by letters, digits or
+# underscores including at least one letter. A # inside a word or link,
+# such as "C#" or "page#top", does not start one.
+HASHTAG = re.compile(r"(?<![\w#&/])#(\w*[^\W\d_]\w*)")
+
+
+def normalise_tag(name):
+    """Normalises a tag so that differently written forms match."""
+
+    return unicodedata.normalize("NFKC", name).casefold()
+
+
+def extract_tags(text):
+    """Finds the tags used in a post's text.
+
+    Args:
+        text (str): The text of the post.
+
+    Returns:
+        set: the normalised name of each tag, leaving out tags longer than
+        TAG_MAX_LENGTH.
+    """
+
+    names = {normalise_tag(match) for match in HASHTAG.findall(text or "")}
+    return {name for name in names if len(name) <= TAG_MAX_LENGTH}
+
+
+def get_tags(names):
+    """Gets the tags with the given names, creating any that are missing.
+
+    Returns:
+        dict: each tag by its name.
+    """
+
+    if not names:
+        return {}
+    Tag.objects.bulk_create([Tag(name=name) for name in sorted(names)],
+                            ignore_conflicts=True)
+    return {tag.name: tag for tag in Tag.objects.filter(name__in=names)}
+
+
+def tag_posts(posts, created=False):
+    """Sets the tags of posts to the tags used in their text.
+
+    Tags no longer used by a post are removed and new ones added, so
+    unchanged tags cost nothing beyond reading them.
+
+    Args:
+        posts (list): The saved posts to tag.
+        created (bool): Whether the posts were just created and so have no
+        tags to read.
+
+    Returns:
+        int: the number of tags added to the posts.
+    """
+
+    wanted = {(post.pk, name) for post in posts
+              for name in extract_tags(post.text)}
+
+    existing = {}
+    if not created:
+        existing = {
+            (post_id, name): pk for pk, post_id, name in
+            PostTag.objects.filter(post__in=[post.pk for post in posts])
+            .values_list("pk", "post_id", "tag__name")}
+    stale = [pk for key, pk in existing.items() if key not in wanted]
+    if stale:
+        PostTag.objects.filter(pk__in=stale).delete()
+
+    added = wanted - existing.keys()
+    if not added:
+        return 0
+    tags = get_tags({name for _, name in added})
+    created_on = {post.pk: post.created_on for post in posts}
+    PostTag.objects.bulk_create(
+        [PostTag(post_id=post_id, tag=tags[name],
+                 created_on=created_on[post_id])
+         for post_id, name in sorted(added)],
+        ignore_conflicts=True)
+    return len(added)
+
+
+def backfill_post_tags(batch_size=1000, progress=None):
+    """Tags every existing post from its text, a batch at a time.
+
+    Args:
+        batch_size (int): The most posts read at once.
+        progress (callable): Called with the number of posts tagged and
+        tags added so far after each batch.
+
+    Returns:
+        tuple: the number of posts tagged and the number of tags added.
+    """
+
+    last_id = 0
+    tagged = added = 0
+    while True:
+        batch = list(Post.objects.filter(pk__gt=last_id).order_by("pk")
+                     .only("pk", "text", "created_on")[:batch_size])
+        if not batch:
+            return tagged, added
+        with transaction.atomic():
+            added += tag_posts(batch)
+        tagged += len(batch)
+        last_id = batch[-1].pk
+        if progress is not None:
+            progress(tagged, added)
@@ -0,0 +1,33 @@
+from django import template
+from django.urls import reverse
+from django.utils.html import conditional_escape, format_html
+from django.utils.safestring import mark_safe
+
+from mainfeed.models import TAG_MAX_LENGTH
+from mainfeed.tags import HASHTAG, normalise_tag
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def link_hashtags(text, autoescape=True):
+    """Links each hashtag in a post's text to the feed of its tag.
+
+    Usage: {{ post.text|link_hashtags }}
+    """
+
+    escape = conditional_escape if autoescape else str
+    parts = []
+    end = 0
+    for match in HASHTAG.finditer(text):
+        parts.append(escape(text[end:match.start()]))
+        name = normalise_tag(match[1])
+        if len(name) <= TAG_MAX_LENGTH:
+            parts.append(format_html(
+                '<a class="hashtag" href="{}">{}</a>',
+                reverse('tag_feed', args=[name]), match[0]))
+        else:
+            parts.append(escape(match[0]))
+        end = match.end()
+    parts.append(escape(text[end:]))
+    return mark_safe("".join(parts))
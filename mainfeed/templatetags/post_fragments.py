@@ -0,0 +1,25 @@
+from django import template
+
+from mainfeed.fragments import render_post_fragments
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_fragments(context, posts):
+    """Renders a page of posts from their cached feed fragments.
+
+    Usage: {% post_fragments post_list as fragments %}
+    """
+
+    return render_post_fragments(posts, context["user"])
+
+
+@register.simple_tag(takes_context=True)
+def post_fragment(context, post, variant="detail"):
+    """Renders a single post from its cached fragment.
+
+    Usage: {% post_fragment post %}
+    """
+
+    return render_post_fragments([post], context["user"], variant)[0]
@@ -0,0 +1,73 @@
+from cloudinary import CloudinaryImage, CloudinaryResource
+from django import template
+from django.utils.html import format_html
+
+register = template.Library()
+
+# Widths, in pixels, each image is offered at. Images are uploaded at most
+# 600 pixels wide, so no wider version is offered.
+IMAGE_WIDTHS = (300, 450, 600)
+
+# How wide a post's image is drawn at each breakpoint of the
+# .content-container it sits in.
+POST_IMAGE_SIZES = ("(min-width: 992px) 595px, (min-width: 768px) 60vw, "
+                    "(min-width: 576px) 530px, 95vw")
+
+
+def image_url(image, width):
+    """Builds the URL of an image scaled down to at most a width.
+
+    Cloudinary delivers it in the smallest format the browser accepts,
+    such as AVIF or WebP, at a quality chosen for its content.
+    """
+
+    return image.build_url(width=width, crop="limit", fetch_format="auto",
+                           quality="auto")
+
+
+@register.simple_tag
+def responsive_image(image, alt, sizes=POST_IMAGE_SIZES, widths=IMAGE_WIDTHS,
+                     css_class="img-fluid", lazy=True, width=None,
+                     height=None, placeholder=""):
+    """Renders an img element offering an image at several widths.
+
+    Usage: {% responsive_image post.image "post image" lazy=False %}
+
+    Given the image's size, the browser reserves its space before it
+    loads, and given a placeholder colour, paints the space that colour.
+
+    Args:
+        image (CloudinaryResource): The image, or its public id.
+        alt (str): The alternative text of the image.
+        sizes (str): How wide the image is drawn, as the sizes attribute.
+        widths (Union[tuple, str]): The widths to offer, or a string of
+        them separated by commas.
+        css_class (str): The class of the img element.
+        lazy (bool): Whether the image waits to load until it is scrolled
+        near.
+        width (int): The width the image is stored at, if known.
+        height (int): The height the image is stored at, if known.
+        placeholder (str): A colour to show until the image loads.
+
+    Returns:
+        SafeString: the img element.
+    """
+
+    if not isinstance(image, CloudinaryResource):
+        image = CloudinaryImage(str(image))
+    if isinstance(widths, str):
+        widths = [int(width) for width in widths.split(",")]
+
+    srcset = ", ".join(f"{image_url(image, offered)} {offered}w"
+                       for offered in widths)
+    size = ""
+    if width and height:
+        size = format_html(' width="{}" height="{}"', width, height)
+    style = ""
+    if placeholder:
+        style = format_html(' style="background-color: {}"', placeholder)
+    return format_html(
+        '<img class="{}" src="{}" srcset="{}" sizes="{}" alt="{}"{}{} '
+        'loading="{}" decoding="async">',
+        css_class, image_url(image, max(widths)), srcset, sizes, alt, size,
+        style, "lazy" if lazy else "eager")
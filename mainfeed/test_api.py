@@ -0,0 +1,197 @@
+import gzip
+import json
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .api import MAX_PAGE_SIZE
+from .models import Comment, ImageStatus, Post
+from .tags import tag_posts
+
+
+class TestJsonApi(TestCase):
+    """Test cases to validate the read-only JSON API."""
+
+    def setUp(self):
+        """Creates a user profile with posts, one of them commented, to be
+        used in test cases."""
+
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+
+        self.posts = []
+        for number in range(5):
+            post = Post.objects.create(
+                author=self.profile, image='test_image',
+                text=f'Test post {number} #tasty', image_width=600,
+                image_height=400, placeholder_colour='#aabbcc')
+            self.posts.append(post)
+        tag_posts(self.posts, created=True)
+        self.post = self.posts[-1]
+        Post.objects.create(author=self.profile, image='',
+                            image_status=ImageStatus.PROCESSING,
+                            text='Unpublished post')
+
+        for number in range(7):
+            Comment.objects.create(post=self.post, author=self.profile,
+                                   body=f'Test comment {number}')
+        Post.objects.filter(pk=self.post.id).update(comment_count=7)
+
+    def get_json(self, url, data=None, status=200, **extra):
+        response = self.client.get(url, data, **extra)
+        self.assertEqual(response.status_code, status)
+        self.assertEqual('application/json', response['Content-Type'])
+        if response.streaming:
+            content = b"".join(response.streaming_content)
+        else:
+            content = response.content
+        if response.get('Content-Encoding') == 'gzip':
+            content = gzip.decompress(content)
+        return json.loads(content)
+
+    def test_feed_pages_published_posts(self):
+        """Tests that the feed lists published posts newest first and that
+        its cursors walk every page."""
+
+        url = reverse('api_feed')
+        body = self.get_json(url, {'limit': 2, 'fields': 'id'})
+        self.assertIsNone(body['previous'])
+        seen = [post['id'] for post in body['data']]
+        while body['next']:
+            body = self.get_json(url, {'limit': 2, 'fields': 'id',
+                                       'after': body['next']})
+            seen.extend(post['id'] for post in body['data'])
+
+        self.assertEqual([post.id for post in reversed(self.posts)], seen)
+        self.assertIsNotNone(body['previous'])
+
+    def test_sparse_fieldsets(self):
+        """Tests that only the selected fields are included, and that
+        unknown fields and bad limits are rejected."""
+
+        body = self.get_json(reverse('api_feed'),
+                             {'fields': 'text,tags,image', 'limit': 1})
+        self.assertEqual([{
+            'text': 'Test post 4 #tasty',
+            'tags': ['tasty'],
+            'image': {
+                'url': body['data'][0]['image']['url'],
+                'width': 600,
+                'height': 400,
+                'placeholder': '#aabbcc',
+            },
+        }], body['data'])
+
+        body = self.get_json(reverse('api_feed'), {'fields': 'id,secret'},
+                             status=400)
+        self.assertEqual('Unknown fields: secret', body['error'])
+        self.get_json(reverse('api_feed'), {'limit': MAX_PAGE_SIZE + 1},
+                      status=400)
+        self.get_json(reverse('api_feed'), {'after': 'not-a-cursor'},
+                      status=400)
+
+    def test_post_and_profile(self):
+        """Tests that a post and a profile are serialised, and that missing
+        objects and other methods are answered with errors."""
+
+        body = self.get_json(reverse('api_post', args=[self.post.id]))
+        self.assertEqual(self.post.id, body['data']['id'])
+        self.assertEqual({'id': self.profile.id, 'username': 'test_user'},
+                         body['data']['author'])
+        self.assertEqual(7, body['data']['comment_count'])
+
+        body = self.get_json(reverse('api_profile', args=[self.profile.id]),
+                             {'fields': 'username,posts'})
+        self.assertEqual('test_user', body['data']['username'])
+        posts = self.get_json(body['data']['posts'], {'fields': 'id'})
+        self.assertEqual(5, len(posts['data']))
+
+        body = self.get_json(reverse('api_post', args=[999]), status=404)
+        self.assertEqual('Not found.', body['error'])
+        response = self.client.post(reverse('api_post', args=[self.post.id]))
+        self.assertEqual(405, response.status_code)
+
+    def test_comments_are_streamed(self):
+        """Tests that comments are streamed oldest first in pages linked by
+        their next cursor."""
+
+        url = reverse('api_comments', args=[self.post.id])
+        response = self.client.get(url, {'limit': 5})
+        self.assertTrue(response.streaming)
+
+        body = self.get_json(url, {'limit': 5, 'fields': 'body'})
+        self.assertEqual([{'body': f'Test comment {number}'}
+                          for number in range(5)], body['data'])
+        body = self.get_json(url, {'limit': 5, 'after': body['next']})
+        self.assertEqual(['Test comment 5', 'Test comment 6'],
+                         [comment['body'] for comment in body['data']])
+        self.assertIsNone(body['next'])
+
+        self.get_json(reverse('api_comments', args=[999]), status=404)
+
+    @mock.patch('mainfeed.api.COMMENT_STREAM_CHUNK_SIZE', 2)
+    def test_comments_are_streamed_over_asgi(self):
+        """Tests that over ASGI comments are streamed by an async generator,
+        so the server sends them as they are read, a chunk at a time."""
+
+        url = reverse('api_comments', args=[self.post.id])
+
+        async def read(**headers):
+            response = await self.async_client.get(
+                url, {'limit': 5}, headers=headers)
+            return response, [chunk async for chunk
+                              in response.streaming_content]
+
+        response, chunks = async_to_sync(read)()
+        self.assertTrue(response.is_async)
+        self.assertEqual(3, len(chunks))
+        body = json.loads(b"".join(chunks))
+        self.assertEqual([f'Test comment {number}' for number in range(5)],
+                         [comment['body'] for comment in body['data']])
+        self.assertIsNotNone(body['next'])
+
+        response, chunks = async_to_sync(read)(accept_encoding='gzip')
+        self.assertEqual('gzip', response['Content-Encoding'])
+        body = json.loads(gzip.decompress(b"".join(chunks)))
+        self.assertEqual(5, len(body['data']))
+
+    def test_asgi_comments_compressed_as_well(self):
+        """Tests that comments streamed over ASGI compress about as well
+        as over WSGI, rather than each comment being compressed alone."""
+
+        for number in range(7, 150):
+            Comment.objects.create(post=self.post, author=self.profile,
+                                   body=f'Test comment {number}')
+        url = reverse('api_comments', args=[self.post.id])
+
+        async def read(**headers):
+            response = await self.async_client.get(
+                url, {'limit': 150}, headers=headers)
+            return b"".join([chunk async for chunk
+                             in response.streaming_content])
+
+        plain = async_to_sync(read)()
+        compressed = async_to_sync(read)(accept_encoding='gzip')
+        response = self.client.get(url, {'limit': 150},
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        sync_compressed = b"".join(response.streaming_content)
+
+        self.assertEqual(plain, gzip.decompress(compressed))
+        self.assertLess(len(compressed), len(plain) / 4)
+        self.assertLess(len(compressed), len(sync_compressed) + 200)
+
+    def test_responses_compressed(self):
+        """Tests that responses are gzipped for clients accepting it."""
+
+        for url in (reverse('api_feed'),
+                    reverse('api_comments', args=[self.post.id])):
+            response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertEqual('gzip', response['Content-Encoding'])
+            body = self.get_json(url, HTTP_ACCEPT_ENCODING='gzip')
+            self.assertTrue(body['data'])
@@ -0,0 +1,129 @@
+from asgiref.sync import SyncToAsync, async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+
+from .models import Comment, ImageStatus, Post
+
+
+class TestAsyncViews(TestCase):
+    """Test cases to validate the async views served over ASGI."""
+
+    def setUp(self):
+        """Creates a user profile with a commented post and a post still
+        uploading, to be used in test cases."""
+
+        cache.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+        self.post = Post.objects.create(
+            author=self.profile, image='test_image', text='Test post text',
+            comment_count=1)
+        self.pending = Post.objects.create(
+            author=self.profile, image='', text='Pending post text',
+            image_status=ImageStatus.PROCESSING)
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.profile, body='Test comment text')
+        self.urls = [
+            reverse('feed'),
+            reverse('view_post', args=[self.post.id]),
+            reverse('view_comment', args=[self.post.id, self.comment.id]),
+            reverse('user_profile', args=[self.profile.id]),
+        ]
+
+    def asgi_get(self, url, **headers):
+        """Requests a page over ASGI."""
+
+        async def get():
+            return await self.async_client.get(url, headers=headers)
+
+        return async_to_sync(get)()
+
+    def test_asgi_routes_async_views(self):
+        """Tests that the ASGI URLconf serves the read-only pages with
+        async views at the same paths, and other pages as over WSGI."""
+
+        for url in self.urls:
+            with self.subTest(url=url):
+                match = resolve(url, urlconf=settings.ASGI_URLCONF)
+                self.assertTrue(iscoroutinefunction(match.func))
+                self.assertEqual(resolve(url).url_name, match.url_name)
+        match = resolve(reverse('create_post'), urlconf=settings.ASGI_URLCONF)
+        self.assertFalse(iscoroutinefunction(match.func))
+
+    def test_middleware_chain_is_async(self):
+        """Tests that every middleware runs on the event loop under ASGI,
+        rather than the whole chain being run in a thread."""
+
+        chain = ASGIHandler()._middleware_chain
+        self.assertTrue(iscoroutinefunction(chain))
+        self.assertNotIsInstance(chain, SyncToAsync)
+
+    @override_settings(VIEW_BUDGETS={})
+    def test_dangling_login_removed(self):
+        """Tests that a login left pending in the session is removed
+        once a page is served over ASGI, as it is over WSGI. Saving the
+        session is not part of any page's budget."""
+
+        self.async_client.force_login(self.test_user)
+        session = self.async_client.session
+        session['account_login'] = {}
+        session.save()
+
+        self.assertEqual(self.asgi_get(reverse('feed')).status_code, 200)
+        self.assertNotIn('account_login', self.async_client.session)
+
+    def test_pages_match_sync_views(self):
+        """Tests that the async views render the same pages as the sync
+        views, making the same queries."""
+
+        for url in self.urls + [reverse('feed') + '?page=1']:
+            with self.subTest(url=url):
+                cache.clear()
+                with CaptureQueriesContext(connection) as sync_queries:
+                    expected = self.client.get(url)
+                cache.clear()
+                with CaptureQueriesContext(connection) as async_queries:
+                    response = self.asgi_get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(expected.content, response.content)
+                self.assertEqual(
+                    [query['sql'] for query in sync_queries],
+                    [query['sql'] for query in async_queries])
+
+    def test_owner_sees_pending_posts(self):
+        """Tests that only the owner sees their posts still uploading on
+        their profile page."""
+
+        url = reverse('user_profile', args=[self.profile.id])
+        self.assertNotContains(self.asgi_get(url), 'Pending post text')
+        self.async_client.force_login(self.test_user)
+        self.assertContains(self.asgi_get(url), 'Pending post text')
+
+    def test_revalidation_and_missing_pages(self):
+        """Tests that unchanged pages are revalidated with a 304, and that
+        missing objects and invalid cursors are not found."""
+
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.asgi_get(url)['ETag']
+                response = self.asgi_get(url, if_none_match=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(etag, response['ETag'])
+
+        for url in [reverse('view_post', args=[999]),
+                    reverse('view_comment', args=[self.post.id, 999]),
+                    reverse('view_comment',
+                            args=[self.pending.id, self.comment.id]),
+                    reverse('user_profile', args=[999]),
+                    reverse('feed') + '?after=not-a-cursor']:
+            with self.subTest(url=url):
+                self.assertEqual(self.asgi_get(url).status_code, 404)
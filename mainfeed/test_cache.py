@@ -0,0 +1,268 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Comment, Post
+
+
+class TestFeedPageCache(TestCase):
+    """Test cases to validate caching of rendered feed pages."""
+
+    def setUp(self):
+        """Creates a user profile with a post to be used in test cases."""
+
+        cache.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+        self.post = Post.objects.create(
+            author=self.profile, image='test_image', text='Test post text')
+
+    def test_repeat_request_served_from_cache(self):
+        """Tests that a repeated request is served without queries."""
+
+        first_response = self.client.get(reverse('feed'))
+
+        with self.assertNumQueries(0):
+            second_response = self.client.get(reverse('feed'))
+
+        self.assertEqual(first_response.content, second_response.content)
+
+    def test_new_post_invalidates_cache(self):
+        """Tests that a new post is shown on the next request."""
+
+        self.client.get(reverse('feed'))
+        Post.objects.create(
+            author=self.profile, image='test_image', text='Newer post text')
+
+        response = self.client.get(reverse('feed'))
+        self.assertIn(b"Newer post text", response.content)
+
+    def test_comment_invalidates_cache(self):
+        """Tests that a new comment is shown on the next request."""
+
+        self.client.get(reverse('feed'))
+        Post.objects.filter(pk=self.post.id).update(comment_count=1)
+        Comment.objects.create(
+            post=self.post, author=self.profile, body='Test comment text')
+
+        response = self.client.get(reverse('feed'))
+        self.assertIn(b"Test comment text", response.content)
+
+    def test_username_change_invalidates_cache(self):
+        """Tests that a changed username is shown on the next request but
+        other saves of the user leave the cache in place."""
+
+        self.client.get(reverse('feed'))
+
+        self.test_user.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(reverse('feed'))
+
+        self.test_user.username = 'renamed_user'
+        self.test_user.save()
+        response = self.client.get(reverse('feed'))
+        self.assertIn(b"renamed_user", response.content)
+
+    def test_viewers_have_separate_pages(self):
+        """Tests that owner controls are not served to other viewers."""
+
+        self.client.login(
+            username="test_user", password="password")
+        response = self.client.get(reverse('feed'))
+        self.assertIn(b"Edit post", response.content)
+
+        self.client.logout()
+        response = self.client.get(reverse('feed'))
+        self.assertNotIn(b"Edit post", response.content)
+
+    def test_pages_with_messages_not_cached(self):
+        """Tests that a page showing a message is neither cached nor served
+        from the cache."""
+
+        self.client.get(reverse('feed'))
+
+        # Trigger a message for the next page.
+        self.client.get(reverse('create_post'))
+        response = self.client.get(reverse('feed'))
+        self.assertIn(b"Sign in to create a post!", response.content)
+
+        response = self.client.get(reverse('feed'))
+        self.assertNotIn(b"Sign in to create a post!", response.content)
+
+
+class TestPostFragmentCache(TestCase):
+    """Test cases to validate caching of rendered post fragments."""
+
+    def setUp(self):
+        """Creates two user profiles and a commented post to be used in test
+        cases."""
+
+        cache.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        User.objects.create_user(
+            username="other_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+        self.post = Post.objects.create(
+            author=self.profile, image='test_image', text='Test post text',
+            comment_count=1)
+        Comment.objects.create(
+            post=self.post, author=self.profile, body='Test comment text')
+
+    def fragment_rendered(self, response):
+        """Checks whether a response rendered the feed fragment of a post."""
+
+        return 'mainfeed/post_feed.html' in [
+            template.name for template in response.templates]
+
+    def test_fragment_shared_between_pages(self):
+        """Tests that a fragment rendered for the feed is reused by the
+        profile page without loading the post's comments again."""
+
+        response = self.client.get(reverse('feed'))
+        self.assertTrue(self.fragment_rendered(response))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('user_profile', args=[self.profile.id]))
+
+        self.assertFalse(self.fragment_rendered(response))
+        self.assertContains(response, "Test comment text")
+        self.assertFalse(any('ROW_NUMBER' in query['sql'].upper()
+                             for query in queries.captured_queries))
+
+    def test_comment_invalidates_fragment(self):
+        """Tests that a new comment renders the fragment again."""
+
+        self.client.get(reverse('feed'))
+        Post.objects.filter(pk=self.post.id).update(comment_count=2)
+        Comment.objects.create(
+            post=self.post, author=self.profile, body='Newer comment text')
+
+        response = self.client.get(
+            reverse('user_profile', args=[self.profile.id]))
+        self.assertTrue(self.fragment_rendered(response))
+        self.assertContains(response, "Newer comment text")
+
+    def test_post_edit_invalidates_fragment(self):
+        """Tests that an edited post is shown on its own page."""
+
+        self.client.get(reverse('view_post', args=[self.post.id]))
+        self.post.text = 'Edited post text'
+        self.post.save()
+
+        response = self.client.get(reverse('view_post', args=[self.post.id]))
+        self.assertContains(response, "Edited post text")
+
+    def test_controls_layered_per_viewer(self):
+        """Tests that only the owner is given edit and delete buttons on a
+        shared fragment."""
+
+        response = self.client.get(reverse('feed'))
+        self.assertNotContains(response, "Make a comment")
+        self.assertNotContains(response, "<!--viewer:")
+
+        self.client.login(username="other_user", password="password")
+        response = self.client.get(
+            reverse('user_profile', args=[self.profile.id]))
+        self.assertContains(response, "Make a comment")
+        self.assertNotContains(response, "Edit post")
+        self.assertNotContains(response, "Delete comment")
+
+        self.client.login(username="test_user", password="password")
+        response = self.client.get(
+            reverse('user_profile', args=[self.profile.id]))
+        self.assertContains(response, "Edit post")
+        self.assertContains(response, "Delete post")
+        self.assertContains(response, "Edit comment")
+        self.assertContains(response, "Delete comment")
+
+
+class TestCachedAuthentication(TestCase):
+    """Test cases to validate reading sessions and users from the cache."""
+
+    def setUp(self):
+        """Creates a user profile with a post to be used in test cases."""
+
+        cache.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.post = Post.objects.create(
+            author=self.test_user.user_profile, image='test_image',
+            text='Test post text')
+        self.urls = [
+            reverse('feed'),
+            reverse('view_post', args=[self.post.id]),
+            reverse('user_profile', args=[self.test_user.user_profile.id]),
+        ]
+
+    def auth_queries(self, url):
+        """Requests a page and lists the queries it made of the session and
+        user tables, and for the signed-in user's profile."""
+
+        profile_lookup = 'WHERE "userprofile_userprofile"."user_id" ='
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in captured.captured_queries
+                if 'FROM "django_session"' in query['sql']
+                or 'FROM "auth_user"' in query['sql']
+                or profile_lookup in query['sql']]
+
+    def test_anonymous_readers_have_no_session(self):
+        """Tests that anonymous readers are not given a session and that
+        their requests read neither sessions nor users."""
+
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual([], self.auth_queries(url))
+        self.assertNotIn('sessionid', self.client.cookies)
+
+    def test_signed_in_user_read_from_cache(self):
+        """Tests that a signed-in user's session, user and profile are read
+        from the database at most once, and then from the cache."""
+
+        self.client.login(username="test_user", password="password")
+        self.assertLessEqual(len(self.auth_queries(self.urls[0])), 2)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertEqual([], self.auth_queries(url))
+
+    def test_changed_password_signs_out(self):
+        """Tests that a cached user is discarded when saved, so changing
+        their password signs out their other sessions."""
+
+        self.client.login(username="test_user", password="password")
+        response = self.client.get(self.urls[0])
+        self.assertTrue(response.wsgi_request.user.is_authenticated)
+
+        self.test_user.set_password("new_password")
+        self.test_user.save()
+        response = self.client.get(self.urls[0])
+        self.assertFalse(response.wsgi_request.user.is_authenticated)
+
+    def test_edited_profile_discards_cached_user(self):
+        """Tests that a cached user is discarded when their profile is
+        saved, so requests see the edited profile."""
+
+        self.client.login(username="test_user", password="password")
+        self.client.get(self.urls[0])
+
+        profile = self.test_user.user_profile
+        profile.bio = 'Edited bio'
+        profile.save()
+        response = self.client.get(self.urls[0])
+        self.assertEqual(
+            'Edited bio', response.wsgi_request.user.user_profile.bio)
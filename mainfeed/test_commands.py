@@ -0,0 +1,236 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from .fragments import render_post_fragments
+from .models import Comment, Post
+from .tags import tag_posts
+
+
+class TestExplainHotQueriesCommand(TestCase):
+    """Test cases to validate the explain_hot_queries command."""
+
+    def setUp(self):
+        """Creates a user profile with a commented post to be used in test
+        cases."""
+
+        test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        profile = test_user.user_profile
+        post = Post.objects.create(
+            author=profile, image='test_image', text='Test post #text')
+        tag_posts([post], created=True)
+        Comment.objects.create(
+            post=post, author=profile, body='Test comment text')
+
+    def test_reports_index_use(self):
+        """Tests that every hot query is explained and uses its index."""
+
+        output = StringIO()
+        call_command('explain_hot_queries', '--fail-on-miss', stdout=output)
+
+        report = output.getvalue()
+        self.assertIn("feed first page: uses post_created_id_idx", report)
+        self.assertIn("tag feed page: uses post_tag_feed_idx", report)
+        self.assertIn("profile posts: uses post_author_created_idx", report)
+        self.assertIn("feed page comments: uses comment_post_created_idx",
+                      report)
+        self.assertIn("post comments: uses comment_post_created_idx", report)
+
+    def test_skips_queries_without_samples(self):
+        """Tests that queries needing rows the database does not hold are
+        skipped rather than explained with made-up ids."""
+
+        Post.objects.all().delete()
+        output = StringIO()
+        call_command('explain_hot_queries', stdout=output)
+
+        report = output.getvalue()
+        self.assertIn("tag feed page: skipped, no tagged posts", report)
+        self.assertIn("post comments: skipped, no posts", report)
+        self.assertIn("feed first page: uses post_created_id_idx", report)
+
+
+class TestReconcileCommentCountsCommand(TestCase):
+    """Test cases to validate the reconcile_comment_counts command."""
+
+    def setUp(self):
+        """Creates a post whose comment count has drifted."""
+
+        test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        profile = test_user.user_profile
+        self.post = Post.objects.create(
+            author=profile, image='test_image', text='Test post text',
+            comment_count=5)
+        Comment.objects.create(
+            post=self.post, author=profile, body='Test comment text')
+
+    def test_dry_run_makes_no_changes(self):
+        """Tests that a dry run reports drift without repairing it."""
+
+        output = StringIO()
+        call_command('reconcile_comment_counts', '--dry-run', stdout=output)
+
+        self.assertIn("1 post has a drifted comment count.",
+                      output.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(5, self.post.comment_count)
+
+    def test_repairs_drifted_counts(self):
+        """Tests that drifted comment counts are recounted."""
+
+        output = StringIO()
+        call_command('reconcile_comment_counts', stdout=output)
+
+        self.assertIn("Repaired the comment count of 1 post.",
+                      output.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(1, self.post.comment_count)
+
+    def test_repaired_counts_shown(self):
+        """Tests that cached fragments showing a drifted comment count are
+        discarded once it is repaired."""
+
+        def render():
+            post = Post.objects.with_authors().get(pk=self.post.id)
+            return render_post_fragments([post], AnonymousUser())[0]
+
+        cache.clear()
+        self.assertIn("5 comments", render())
+
+        call_command('reconcile_comment_counts', stdout=StringIO())
+
+        fragment = render()
+        self.assertIn("1 comment<", fragment)
+        self.assertNotIn("5 comments", fragment)
+
+
+class TestBenchCommand(TestCase):
+    """Test cases to validate the bench command."""
+
+    def setUp(self):
+        """Creates a directory for the JSON reports."""
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.report_path = os.path.join(directory.name, 'report.json')
+        self.arguments = ['bench', '--in-place', '--no-input', '--users',
+                          '5', '--posts', '20', '--comments', '40',
+                          '--requests', '2', '--warmup', '0']
+
+    def test_reports_every_page(self):
+        """Tests that every page is measured and written to the report."""
+
+        call_command(*self.arguments, '--json', self.report_path,
+                     stdout=StringIO())
+
+        with open(self.report_path) as file:
+            report = json.load(file)
+        self.assertEqual(40, report['dataset']['comments'])
+        self.assertIn('feed', report['endpoints'])
+        self.assertIn('edit_user_profile', report['endpoints'])
+        for result in report['endpoints'].values():
+            self.assertEqual(2, result['requests'])
+            self.assertLess(result['p50_ms'], result['p99_ms'] + 1e-9)
+            self.assertGreater(result['peak_memory_kb'], 0)
+
+    def test_regression_against_baseline(self):
+        """Tests that a page making more queries than its baseline fails
+        the comparison."""
+
+        with open(self.report_path, 'w') as file:
+            json.dump({'dataset': {}, 'endpoints': {'view_post': {
+                'p95_ms': 1000000, 'queries': 0, 'bytes': 1000000}}}, file)
+
+        with self.assertRaisesMessage(CommandError, "1 regressions"):
+            call_command(*self.arguments, '--endpoint', 'view_post',
+                         '--baseline', self.report_path, stdout=StringIO())
+
+    def test_scenarios_without_data_skipped(self):
+        """Tests that pages the seeded data holds nothing to request are
+        skipped, and that the staff user made for the benchmark is
+        removed."""
+
+        output = StringIO()
+        call_command('bench', '--in-place', '--no-input', '--users', '2',
+                     '--posts', '3', '--comments', '0', '--requests', '1',
+                     '--warmup', '0', '--json', self.report_path,
+                     stdout=output)
+
+        with open(self.report_path) as file:
+            report = json.load(file)
+        self.assertIn("feed_next_page: skipped, fewer than", output.getvalue())
+        self.assertIn("view_comment: skipped, the busiest post has no "
+                      "comments", output.getvalue())
+        self.assertNotIn('feed_next_page', report['endpoints'])
+        self.assertIn('feed', report['endpoints'])
+        self.assertFalse(User.objects.filter(username="bench_staff").exists())
+
+    def test_in_place_needs_confirmation(self):
+        """Tests that seeding the configured database must be confirmed."""
+
+        with mock.patch('builtins.input', return_value='no'):
+            with self.assertRaisesMessage(CommandError, "cancelled"):
+                call_command('bench', '--in-place', stdout=StringIO())
+        self.assertFalse(Post.objects.exists())
+
+
+class TestSeedFeedCommand(TestCase):
+    """Test cases to validate the seed_feed command."""
+
+    def seed(self, prefix):
+        """Seeds a small feed and returns the posts it created."""
+
+        newest_id = Post.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+        call_command('seed_feed', '--users', '6', '--posts', '25',
+                     '--comments', '80', '--batch-size', '7', '--seed', '3',
+                     '--prefix', prefix, stdout=StringIO())
+        return Post.objects.filter(id__gt=newest_id).order_by('id')
+
+    def test_seeds_consistent_feed(self):
+        """Tests that every user has a profile and comment counts match
+        the comments created."""
+
+        posts = self.seed('first')
+
+        self.assertEqual(6, User.objects.filter(
+            username__startswith='first_user_',
+            user_profile__isnull=False).count())
+        self.assertEqual(25, posts.count())
+        self.assertEqual(80, Comment.objects.count())
+        for post in posts:
+            self.assertEqual(post.comments.count(), post.comment_count)
+            self.assertFalse(post.comments.filter(
+                created_on__lt=post.created_on).exists())
+
+    def test_same_seed_same_data(self):
+        """Tests that seeding twice with one seed gives the same posts."""
+
+        def describe(posts):
+            return [(post.text, post.created_on, post.comment_count,
+                     post.image.public_id) for post in posts]
+
+        first = describe(self.seed('first'))
+        second = describe(self.seed('second'))
+
+        self.assertEqual(first, second)
+
+    def test_existing_prefix_rejected(self):
+        """Tests that seeding the same usernames again is refused."""
+
+        self.seed('first')
+        with self.assertRaises(CommandError):
+            self.seed('first')
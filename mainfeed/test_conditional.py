@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Comment, Post
+
+
+class TestConditionalGet(TestCase):
+    """Test cases to validate revalidation of pages by their ETag."""
+
+    def setUp(self):
+        """Creates a user profile with a commented post to be used in test
+        cases."""
+
+        cache.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+        self.post = Post.objects.create(
+            author=self.profile, image='test_image', text='Test post text',
+            comment_count=1)
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.profile, body='Test comment text')
+
+    def revalidate(self, url):
+        """Requests a page again with the ETag it was first served with."""
+
+        etag = self.client.get(url)['ETag']
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_not_modified(self):
+        """Tests that revalidating unchanged pages returns a 304."""
+
+        urls = [
+            reverse('feed'),
+            reverse('view_post', args=[self.post.id]),
+            reverse('view_comment', args=[self.post.id, self.comment.id]),
+            reverse('user_profile', args=[self.profile.id]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+
+    def test_validator_costs_one_query(self):
+        """Tests that revalidating a post page makes a single query."""
+
+        url = reverse('view_post', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_deleted_comment_changes_etag(self):
+        """Tests that deleting a comment, which leaves no timestamp, is seen
+        by revalidating clients."""
+
+        url = reverse('view_post', args=[self.post.id])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(
+            post=self.post, author=self.profile, body='Newer comment text')
+        self.comment.delete()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_profile_edit_changes_etag(self):
+        """Tests that an edited profile is served in full."""
+
+        url = reverse('user_profile', args=[self.profile.id])
+        etag = self.client.get(url)['ETag']
+        self.profile.bio = 'Edited bio'
+        self.profile.save()
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, "Edited bio")
+
+    def test_viewer_changes_etag(self):
+        """Tests that a page held by one viewer is not revalidated for
+        another."""
+
+        url = reverse('feed')
+        etag = self.client.get(url)['ETag']
+        self.client.login(username="test_user", password="password")
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_pages_with_messages_have_no_etag(self):
+        """Tests that a page showing a message cannot be revalidated."""
+
+        # Trigger a message for the next page.
+        self.client.get(reverse('create_post'))
+        response = self.client.get(reverse('feed'))
+
+        self.assertContains(response, "Sign in to create a post!")
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,126 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from .deletions import (MAX_DELETION_ATTEMPTS, process_pending_deletions,
+                        queue_image_deletions, referenced_public_ids)
+from .images import get_image_backend, upload_image
+from .models import PendingDeletion, Post
+from .testing import make_test_image
+
+
+class FailingImageBackend:
+    """Image backend whose deletions always fail."""
+
+    def destroy_many(self, public_ids):
+        raise ConnectionError("Image backend unavailable")
+
+
+class TestImageDeletionQueue(TestCase):
+    """Test cases to validate the image deletion queue and its worker."""
+
+    def setUp(self):
+        """Creates a user profile with a post showing an uploaded image to
+        be used in test cases."""
+
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+        self.image = upload_image(make_test_image(), folder="foodfeed/")
+        self.post = Post.objects.create(
+            author=self.profile, image=self.image, text='Test post text')
+
+    def queued(self):
+        return set(PendingDeletion.objects.values_list('public_id',
+                                                       flat=True))
+
+    def test_deleted_post_image_destroyed(self):
+        """Tests that the image of a deleted post is queued and then
+        destroyed by the worker."""
+
+        self.post.delete()
+        self.assertEqual({self.image.public_id}, self.queued())
+
+        self.assertEqual(1, process_pending_deletions())
+        self.assertNotIn(self.image.public_id, get_image_backend().images)
+        self.assertEqual(set(), self.queued())
+
+    def test_deleted_user_images_queued(self):
+        """Tests that deleting a user queues the images of their profile
+        and posts, but not the shared placeholder picture."""
+
+        self.test_user.delete()
+
+        self.assertEqual({self.image.public_id}, self.queued())
+
+    def test_referenced_image_kept(self):
+        """Tests that an image still shown by another post is not
+        destroyed."""
+
+        Post.objects.create(author=self.profile, image=self.image,
+                            text='Test post sharing the image')
+        self.post.delete()
+
+        process_pending_deletions()
+
+        self.assertIn(self.image.public_id, get_image_backend().images)
+        self.assertEqual(set(), self.queued())
+
+    def test_referenced_images_found_by_public_id(self):
+        """Tests that the public ids of images are recorded when posts and
+        profiles are saved, and that referenced images are found by them
+        with an exact lookup."""
+
+        self.assertEqual(self.image.public_id,
+                         Post.objects.get(pk=self.post.pk).image_public_id)
+        self.profile.image = self.image
+        self.profile.save()
+
+        with CaptureQueriesContext(connection) as captured:
+            referenced = referenced_public_ids(
+                [self.image.public_id, 'foodfeed/unused'])
+        self.assertEqual({self.image.public_id}, referenced)
+        self.assertFalse(any('LIKE' in query['sql'] for query in captured))
+
+        self.post.delete()
+        self.assertEqual({self.image.public_id},
+                         referenced_public_ids([self.image.public_id]))
+
+    @override_settings(IMAGE_BACKEND={
+        'BACKEND': 'mainfeed.test_deletions.FailingImageBackend'})
+    def test_failed_deletion_retried_then_dropped(self):
+        """Tests that a failing deletion is retried before it is dropped."""
+
+        queue_image_deletions(['foodfeed/unreferenced'])
+
+        for attempt in range(1, MAX_DELETION_ATTEMPTS + 1):
+            with self.assertLogs('mainfeed.deletions', 'WARNING'):
+                self.assertEqual(1, process_pending_deletions())
+            PendingDeletion.objects.update(available_on='2025-01-01T00:00Z')
+
+        self.assertEqual(set(), self.queued())
+
+    def test_orphan_scan(self):
+        """Tests that stored images nothing shows are reported, and only
+        queued without a dry run."""
+
+        orphan = upload_image(make_test_image(name="orphan.png",
+                                              content_type="image/png"),
+                              folder="foodfeed/orphaned")
+
+        output = StringIO()
+        call_command('scan_orphan_images', '--min-age', '0', '--dry-run',
+                     '--prefix', 'foodfeed/orphaned', stdout=output)
+        self.assertIn("1 orphaned images found.", output.getvalue())
+        self.assertEqual(set(), self.queued())
+
+        call_command('scan_orphan_images', '--min-age', '0',
+                     '--prefix', 'foodfeed/', stdout=StringIO())
+        self.assertIn(orphan.public_id, self.queued())
+        self.assertNotIn(self.image.public_id, self.queued())
@@ -0,0 +1,156 @@
+import asyncio
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .events import (POLL_DELAY, RECONNECT_DELAY, LocalEventBroker,
+                     get_event_broker, stream_events)
+from .models import Comment, ImageStatus, Post
+
+
+class TestEventBroker(TestCase):
+    """Test cases to validate passing events to connected streams."""
+
+    def test_publish_and_replay(self):
+        """Tests that events reach subscribed streams and can be replayed
+        from the id of an earlier event."""
+
+        async def publish_and_receive():
+            broker = LocalEventBroker(history=2)
+            subscription = broker.subscribe(asyncio.get_running_loop())
+            first_id = broker.latest_id()
+            for number in range(3):
+                broker.publish("post", {"post": number})
+            received = [await subscription.next_event(1) for _ in range(3)]
+            broker.unsubscribe(subscription)
+            broker.publish("post", {"post": 3})
+            return broker, first_id, received, subscription
+
+        broker, first_id, received, subscription = asyncio.run(
+            publish_and_receive())
+        self.assertEqual([0, 1, 2], [event.data["post"] for event in received])
+        self.assertEqual(list(range(first_id + 1, first_id + 4)),
+                         [event.id for event in received])
+        self.assertTrue(subscription.queue.empty())
+        self.assertEqual([{"post": 2}, {"post": 3}],
+                         [event.data for event in broker.since(first_id)])
+        self.assertEqual(
+            f'id: {first_id + 1}\nevent: post\ndata: {{"post":0}}\n\n',
+            received[0].encode())
+
+
+class TestFeedEvents(TestCase):
+    """Test cases to validate publishing new posts and comments to live
+    feeds, and the stream and fragments live feeds read."""
+
+    def setUp(self):
+        """Creates a user profile to author posts, and starts each test
+        with a new broker."""
+
+        get_event_broker.cache_clear()
+        self.broker = get_event_broker()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+
+    def add_post(self, **kwargs):
+        return Post.objects.create(author=self.profile, image='test_image',
+                                   text='Test post', **kwargs)
+
+    def test_events_published_on_commit(self):
+        """Tests that posts are announced when published and comments when
+        created, only once their transaction commits."""
+
+        start = self.broker.latest_id()
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.add_post()
+            pending = self.add_post(image_status=ImageStatus.PROCESSING)
+            self.assertEqual([], self.broker.since(start))
+        with self.captureOnCommitCallbacks(execute=True):
+            pending.text = 'Edited post'
+            pending.save()
+            pending.image_status = ImageStatus.READY
+            pending.save(update_fields=['image_status', 'updated_on'])
+            post.save()
+            comment = Comment.objects.create(post=post, author=self.profile,
+                                             body='Test comment')
+
+        self.assertEqual([
+            ('post', {'post': post.id,
+                      'url': reverse('post_fragment', args=[post.id])}),
+            ('post', {'post': pending.id,
+                      'url': reverse('post_fragment', args=[pending.id])}),
+            ('comment', {'post': post.id, 'comment': comment.id,
+                         'url': reverse('post_fragment', args=[post.id])}),
+        ], [(event.type, event.data) for event in self.broker.since(start)])
+
+    def test_polled_events(self):
+        """Tests that requests served without a held-open stream are sent
+        the events missed since their Last-Event-ID and told to poll."""
+
+        url = reverse('feed_events')
+        start = self.broker.latest_id()
+        response = self.client.get(url)
+        self.assertEqual('text/event-stream', response['Content-Type'])
+        self.assertEqual('no-cache', response['Cache-Control'])
+        self.assertEqual(f'retry: {POLL_DELAY}\nid: {start}\n\n'.encode(),
+                         response.content)
+
+        self.broker.publish('post', {'post': 1})
+        response = self.client.get(url, HTTP_LAST_EVENT_ID=str(start))
+        self.assertEqual(
+            f'retry: {POLL_DELAY}\n\nid: {start + 1}\nevent: post\n'
+            f'data: {{"post":1}}\n\n'.encode(),
+            response.content)
+
+    async def test_streamed_events(self):
+        """Tests that requests served over ASGI are streamed events as they
+        are published, and that reconnecting streams are sent the events
+        they missed."""
+
+        response = await self.async_client.get(reverse('feed_events'))
+        self.assertEqual('text/event-stream', response['Content-Type'])
+        stream = response.streaming_content
+        start = self.broker.latest_id()
+        self.assertEqual(f'retry: {RECONNECT_DELAY}\nid: {start}\n\n'.encode(),
+                         await anext(stream))
+
+        await asyncio.to_thread(self.broker.publish, 'post', {'post': 1})
+        self.assertEqual(
+            f'id: {start + 1}\nevent: post\ndata: {{"post":1}}\n\n'.encode(),
+            await asyncio.wait_for(anext(stream), 1))
+
+        stream = stream_events(self.broker, last_event_id=start)
+        self.assertEqual(f'retry: {RECONNECT_DELAY}\n\n', await anext(stream))
+        self.assertEqual(
+            f'id: {start + 1}\nevent: post\ndata: {{"post":1}}\n\n',
+            await anext(stream))
+        streams = len(self.broker.subscriptions)
+        await stream.aclose()
+        self.assertEqual(streams - 1, len(self.broker.subscriptions))
+
+    def test_post_fragment(self):
+        """Tests that a published post is rendered as shown in the feed,
+        and that unpublished posts are not found."""
+
+        post = self.add_post()
+        response = self.client.get(reverse('post_fragment', args=[post.id]))
+        self.assertContains(response, f'data-post-id="{post.id}"')
+        self.assertContains(response, 'Test post')
+
+        pending = self.add_post(image_status=ImageStatus.PROCESSING)
+        response = self.client.get(
+            reverse('post_fragment', args=[pending.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_first_feed_page_listens(self):
+        """Tests that the feed listens for events to keep itself up to
+        date."""
+
+        response = self.client.get(reverse('feed'))
+        self.assertContains(
+            response, f'data-events-url="{reverse("feed_events")}"')
+        self.assertContains(response, 'js/live_feed.js')
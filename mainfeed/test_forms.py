@@ -1,10 +1,8 @@
-import cloudinary.api
-import requests
-from cloudinary.uploader import destroy
-from django.core.files.base import ContentFile
 from django.test import TestCase
 
 from .forms import CommentForm, PostForm, PostTextForm
+from .images import destroy_image
+from .testing import make_test_image
 
 
 class TestPostForm(TestCase):
@@ -13,15 +11,7 @@ class TestPostForm(TestCase):
     def test_form_is_valid(self):
         """Tests that PostForm accepts valid text and image fields."""
 
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-
-        test_image = requests.get(test_image_url)
-
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         form = PostForm({'text': 'Test post text'}, image)
 
@@ -29,20 +19,12 @@ class TestPostForm(TestCase):
                         msg='Form is not valid, but it should be.')
 
         uploaded_asset_id = form.cleaned_data['image'].public_id
-        cloudinary.uploader.destroy(uploaded_asset_id)
+        destroy_image(uploaded_asset_id)
 
     def test_form_is_missing_text(self):
         """Tests that PostForm rejects submissions with empty text field."""
 
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-
-        test_image = requests.get(test_image_url)
-
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         form = PostForm({'text': ''}, image)
         self.assertFalse(
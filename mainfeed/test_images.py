@@ -0,0 +1,119 @@
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+
+from .forms import PostForm
+from .images import destroy_image, get_image_backend
+from .models import Post
+from .testing import make_png, make_test_image
+
+
+class TestLocalImageBackend(TestCase):
+    """Test cases to validate the local image backend used by the tests."""
+
+    def test_upload_is_deterministic(self):
+        """Tests that the same image is given the same public id and URL."""
+
+        first_form = PostForm({'text': 'Test post text'},
+                              {'image': make_test_image()})
+        second_form = PostForm({'text': 'Test post text'},
+                               {'image': make_test_image()})
+        self.assertTrue(first_form.is_valid())
+        self.assertTrue(second_form.is_valid())
+
+        first_image = first_form.cleaned_data['image']
+        second_image = second_form.cleaned_data['image']
+        self.assertTrue(first_image.public_id.startswith('foodfeed/'))
+        self.assertEqual(first_image.url, second_image.url)
+
+    def test_destroy_removes_image(self):
+        """Tests that a destroyed image is no longer stored."""
+
+        form = PostForm({'text': 'Test post text'},
+                        {'image': make_test_image()})
+        self.assertTrue(form.is_valid())
+        public_id = form.cleaned_data['image'].public_id
+        self.assertIn(public_id, get_image_backend().images)
+
+        self.assertEqual({'result': 'ok'}, destroy_image(public_id))
+        self.assertNotIn(public_id, get_image_backend().images)
+
+
+    def test_upload_reports_stored_size(self):
+        """Tests that the size is given as a limit crop would leave it."""
+
+        png = SimpleUploadedFile(name="wide.png", content=make_png(1200, 800),
+                                 content_type="image/png")
+
+        result = get_image_backend().upload(
+            png, folder="foodfeed/", crop="limit", width=600, height=600)
+
+        self.assertEqual((600, 400), (result["width"], result["height"]))
+        destroy_image(result["public_id"])
+
+class TestResponsiveImage(TestCase):
+    """Test cases to validate the responsive_image template tag."""
+
+    def render(self, template, **context):
+        return Template("{% load responsive_images %}" + template).render(
+            Context(context))
+
+    def test_srcset_offers_each_width(self):
+        """Tests that each width is offered in an automatic format and the
+        largest is the fallback source."""
+
+        html = self.render('{% responsive_image "foodfeed/abc" "A pie" %}')
+
+        for width in (300, 450, 600):
+            self.assertRegex(
+                html, rf"c_limit,f_auto,q_auto,w_{width}/\S*foodfeed/abc "
+                      rf"{width}w")
+        self.assertRegex(html, r'src="\S*/c_limit,f_auto,q_auto,w_600/'
+                               r'\S*foodfeed/abc"')
+        self.assertIn('sizes="(min-width: 992px) 595px', html)
+        self.assertIn('alt="A pie" loading="lazy"', html)
+        self.assertNotIn('width=', html)
+
+    def test_widths_and_loading_set(self):
+        """Tests that the widths and eager loading can be chosen."""
+
+        html = self.render(
+            '{% responsive_image "abc" "A pie" widths="100,200" '
+            'lazy=False %}')
+
+        self.assertRegex(html, r"w_100/\S*abc 100w, ")
+        self.assertRegex(html, r'w_200/\S*abc" srcset')
+        self.assertIn('loading="eager"', html)
+
+    def test_space_reserved_and_painted(self):
+        """Tests that the stored size and placeholder colour are given to
+        the browser."""
+
+        html = self.render(
+            '{% responsive_image "abc" "A pie" width=600 height=400 '
+            'placeholder="#e8d3a0" %}')
+
+        self.assertIn('width="600" height="400" '
+                      'style="background-color: #e8d3a0"', html)
+
+    def test_feed_loads_top_images_eagerly(self):
+        """Tests that only the images of the first posts on a feed page
+        load straight away."""
+
+        cache.clear()
+        profile = User.objects.create_user(
+            username="test_user", password="password").user_profile
+        for number in range(4):
+            Post.objects.create(author=profile, image=f'test_image_{number}',
+                                text='Test post text')
+
+        response = self.client.get(reverse('feed'))
+
+        html = response.content.decode()
+        self.assertEqual(2, html.count('loading="eager"'))
+        self.assertEqual(2, html.count('loading="lazy"'))
+        self.assertLess(html.index("test_image_2"),
+                        html.index('loading="lazy"'))
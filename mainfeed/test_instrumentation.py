@@ -0,0 +1,109 @@
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .instrumentation import (BudgetExceeded, RequestMetricsMiddleware,
+                              summary)
+from .models import Post
+
+
+class TestRequestMetricsMiddleware(TestCase):
+    """Test cases to validate the request metrics middleware."""
+
+    def setUp(self):
+        """Creates a user profile with a post to be used in test cases."""
+
+        cache.clear()
+        summary.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.post = Post.objects.create(
+            author=self.test_user.user_profile, image='test_image',
+            text='Test post text')
+
+    def test_server_timing_header(self):
+        """Tests that the timings are sent in a Server-Timing header."""
+
+        response = self.client.get(reverse('view_post', args=[self.post.id]))
+
+        self.assertRegex(response['Server-Timing'],
+                         r'^db;dur=[\d.]+;desc="\d+ queries", '
+                         r'tpl;dur=[\d.]+;desc="Templates", total;dur=[\d.]+$')
+
+    def test_records_tagged_by_view(self):
+        """Tests that each request is summarised under its view name."""
+
+        self.client.get(reverse('view_post', args=[self.post.id]))
+        self.client.get(reverse('view_post', args=[self.post.id]))
+
+        rows = {row['view_name']: row for row in summary.rows()}
+        self.assertEqual(2, rows['view_post']['requests'])
+        self.assertGreater(rows['view_post']['max_queries'], 0)
+        self.assertGreater(rows['view_post']['p95_template_ms'], 0)
+        self.assertGreater(rows['view_post']['mean_bytes'], 0)
+
+    def test_async_requests_measured(self):
+        """Tests that requests served over ASGI are measured, including
+        the queries their async views run in a worker thread."""
+
+        response = async_to_sync(self.async_client.get)(
+            reverse('view_post', args=[self.post.id]))
+
+        self.assertRegex(response['Server-Timing'],
+                         r'desc="[1-9]\d* queries"')
+        rows = {row['view_name']: row for row in summary.rows()}
+        self.assertGreater(rows['view_post']['max_queries'], 0)
+
+    def test_async_capable(self):
+        """Tests that the middleware runs asynchronously when the rest of
+        the chain is async, and synchronously otherwise."""
+
+        async def get_response(request):
+            pass
+
+        self.assertTrue(iscoroutinefunction(
+            RequestMetricsMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(
+            RequestMetricsMiddleware(lambda request: None)))
+
+    @override_settings(VIEW_BUDGETS={'view_post': {'queries': 1}})
+    def test_budget_enforced(self):
+        """Tests that a request over budget fails when budgets are
+        enforced."""
+
+        with self.assertRaisesMessage(BudgetExceeded,
+                                      "view_post exceeded its budget"):
+            self.client.get(reverse('view_post', args=[self.post.id]))
+
+    @override_settings(VIEW_BUDGETS={'view_post': {'queries': 1}},
+                       VIEW_BUDGET_MODE='log')
+    def test_budget_logged(self):
+        """Tests that a request over budget is logged when budgets are
+        not enforced."""
+
+        with self.assertLogs('mainfeed.instrumentation', 'WARNING'):
+            response = self.client.get(
+                reverse('view_post', args=[self.post.id]))
+
+        self.assertEqual(response.status_code, 200)
+        rows = {row['view_name']: row for row in summary.rows()}
+        self.assertEqual(1, rows['view_post']['budget_breaches'])
+
+    def test_summary_page_for_staff_only(self):
+        """Tests that only staff can view the summary page."""
+
+        self.client.get(reverse('feed'))
+
+        self.client.login(username="test_user", password="password")
+        response = self.client.get(reverse('request_metrics'))
+        self.assertEqual(response.status_code, 302)
+
+        self.test_user.is_staff = True
+        self.test_user.save()
+        response = self.client.get(reverse('request_metrics'))
+        self.assertContains(response, "<th scope=\"row\">feed</th>",
+                            html=False)
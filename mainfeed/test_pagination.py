@@ -0,0 +1,91 @@
+import base64
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+
+from .models import Post
+from .pagination import InvalidCursor, KeysetPaginator
+
+
+class TestKeysetPaginator(TestCase):
+    """Test cases to validate the KeysetPaginator."""
+
+    def setUp(self):
+        """Creates a user profile with seven posts, two of which share a
+        creation time."""
+
+        test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        profile = test_user.user_profile
+
+        for post_number in range(7):
+            Post.objects.create(
+                author=profile,
+                image='test_image',
+                text=f'Test post {post_number}'
+            )
+
+        # Give the posts distinct times apart from the last two.
+        start = timezone.now()
+        for index, post in enumerate(Post.objects.order_by('id')):
+            offset = min(index, 5)
+            Post.objects.filter(pk=post.id).update(
+                created_on=start + timedelta(minutes=offset))
+
+        self.ordered_ids = list(
+            Post.objects.order_by('-created_on', '-id')
+            .values_list('id', flat=True))
+        self.paginator = KeysetPaginator(Post.objects.all(), 3)
+
+    def test_walk_forwards(self):
+        """Tests that following next cursors visits every post once in
+        order."""
+
+        seen = []
+        page = self.paginator.page()
+        self.assertFalse(page.has_previous)
+        while True:
+            seen.extend(post.id for post in page)
+            if not page.has_next:
+                break
+            page = self.paginator.page(after=page.next_cursor)
+
+        self.assertEqual(self.ordered_ids, seen)
+
+    def test_walk_backwards(self):
+        """Tests that a previous cursor returns the page before it."""
+
+        first_page = self.paginator.page()
+        second_page = self.paginator.page(after=first_page.next_cursor)
+        previous_page = self.paginator.page(
+            before=second_page.previous_cursor)
+
+        self.assertEqual([post.id for post in first_page],
+                         [post.id for post in previous_page])
+        self.assertFalse(previous_page.has_previous)
+        self.assertTrue(previous_page.has_next)
+
+    def test_invalid_cursor(self):
+        """Tests that a malformed cursor is rejected."""
+
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(after='not-a-cursor')
+        with self.assertRaises(InvalidCursor):
+            self.paginator.page(after='WyJ4Il0')
+
+    def test_cursor_with_invalid_values(self):
+        """Tests that cursors holding values of the wrong type are rejected
+        rather than reaching the database."""
+
+        for payload in (b'[null,1]', b'[{"a":1},1]', b'[[1],1]',
+                        b'["2020-01-01T00:00:00",null]', b'[1.5,2]',
+                        b'[true,1]', b'["",1]'):
+            cursor = base64.urlsafe_b64encode(payload).decode().rstrip('=')
+            for direction in ('after', 'before'):
+                with self.subTest(payload=payload, direction=direction):
+                    with self.assertRaises(InvalidCursor):
+                        self.paginator.page(**{direction: cursor})
@@ -0,0 +1,123 @@
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.urls import reverse
+
+from .models import Comment, ImageStatus, Post
+from .search import MAX_SEARCH_TERMS, search_terms
+from .views import SEARCH_RESULTS_PER_PAGE
+
+
+class TestPostSearch(TestCase):
+    """Test cases to validate searching posts by their text and
+    comments."""
+
+    def setUp(self):
+        """Creates a user profile with posts and a comment to search."""
+
+        test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = test_user.user_profile
+
+        self.noodles = self.add_post('Spicy chilli noodles with garlic')
+        self.bread = self.add_post('Baked sourdough bread')
+        self.pie = self.add_post('Apple pie')
+        self.comment = Comment.objects.create(
+            post=self.pie, author=self.profile,
+            body='Would be better with chilli')
+
+    def add_post(self, text, **kwargs):
+        return Post.objects.create(author=self.profile, image='test_image',
+                                   text=text, **kwargs)
+
+    def search(self, query):
+        return list(Post.objects.search(query))
+
+    def test_search_terms(self):
+        """Tests that searches are split into words without operators."""
+
+        self.assertEqual(['chilli', 'or', 'noodles'],
+                         search_terms('"Chilli" OR -(noodles*'))
+        self.assertEqual([], search_terms('  !? '))
+        self.assertEqual(MAX_SEARCH_TERMS,
+                         len(search_terms('word ' * (MAX_SEARCH_TERMS + 5))))
+
+    def test_search_matches_text_and_comments(self):
+        """Tests that posts are found by their text or their comments, by
+        word stem, with matches in the text ranked first."""
+
+        results = self.search('chilli')
+        self.assertEqual([self.noodles, self.pie], results)
+        self.assertGreater(results[0].rank, results[1].rank)
+
+        self.assertEqual([self.bread], self.search('baking'))
+        self.assertEqual([self.noodles], self.search('garlic noodle'))
+        self.assertEqual([], self.search('chilli bread'))
+        self.assertEqual([], self.search('"" -'))
+
+    def test_words_split_between_text_and_comments(self):
+        """Tests that every word must be found in the post's text or in a
+        single comment, rather than across them."""
+
+        self.assertEqual([], self.search('apple chilli'))
+
+        Comment.objects.create(post=self.pie, author=self.profile,
+                               body='Apple crumble')
+        self.assertEqual([], self.search('crumble chilli'))
+        self.assertEqual([self.pie], self.search('apple crumble'))
+
+    def test_index_follows_edits_and_deletions(self):
+        """Tests that edited and deleted posts and comments are found by
+        their current content only."""
+
+        self.bread.text = 'Chilli cornbread'
+        self.bread.save()
+        self.comment.delete()
+        self.noodles.delete()
+
+        self.assertEqual([self.bread], self.search('chilli'))
+        self.assertEqual([], self.search('sourdough'))
+
+        Post.objects.filter(pk=self.pie.pk).update(text='Cherry pie')
+        self.assertEqual([self.pie], self.search('cherry'))
+
+    def test_search_page_cursor_pagination(self):
+        """Tests that following next cursors visits every published match
+        once, best match first."""
+
+        for number in range(SEARCH_RESULTS_PER_PAGE + 2):
+            self.add_post(f'Cheese toastie {number}')
+        self.add_post('Cheese soup', image_status=ImageStatus.PROCESSING)
+
+        seen = []
+        response = self.client.get(reverse('search'), {'q': 'cheese'})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            seen.extend(post.id for post in page)
+            if not page.has_next:
+                break
+            response = self.client.get(reverse('search'), {
+                'q': 'cheese', 'after': page.next_cursor})
+
+        expected = Post.objects.published().search('cheese')
+        self.assertEqual([post.id for post in expected], seen)
+        self.assertEqual(SEARCH_RESULTS_PER_PAGE + 2, len(seen))
+        self.assertContains(response, 'Cheese toastie')
+
+    def test_search_page_without_matches(self):
+        """Tests that the page shows the form alone until something is
+        searched for, and says when nothing is found."""
+
+        response = self.client.get(reverse('search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'])
+        self.assertNotContains(response, 'No posts found')
+
+        response = self.client.get(reverse('search'), {'q': 'tiramisu'})
+        self.assertContains(response, 'No posts found for')
+
+        response = self.client.get(reverse('search'),
+                                   {'q': 'chilli', 'after': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
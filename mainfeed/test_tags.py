@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import TAG_MAX_LENGTH, ImageStatus, Post, PostTag
+from .tags import extract_tags, tag_posts
+from .testing import make_test_image
+from .views import PostList
+
+
+class TestTagExtraction(TestCase):
+    """Test cases to validate finding the hashtags used in post text."""
+
+    def test_extract_tags(self):
+        """Tests that hashtags are found and normalised, and that a # inside
+        a word or link or before a number is not a tag."""
+
+        text = ("Ramen night! #Ramen #vegan_food #ＶＥＧＡＮ C# page#top "
+                "https://example.com/#top #2024 #" + "x" * TAG_MAX_LENGTH
+                + "y")
+        self.assertEqual({'ramen', 'vegan_food', 'vegan'},
+                         extract_tags(text))
+        self.assertEqual(set(), extract_tags(''))
+
+
+class TestPostTags(TestCase):
+    """Test cases to validate tagging posts and the tag feed."""
+
+    def setUp(self):
+        """Creates a user profile to author posts."""
+
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+
+    def add_post(self, text, **kwargs):
+        post = Post.objects.create(author=self.profile, image='test_image',
+                                   text=text, **kwargs)
+        tag_posts([post], created=True)
+        return post
+
+    def tag_names(self, post):
+        return set(post.tags.values_list('name', flat=True))
+
+    def test_create_and_edit_post_tag_post(self):
+        """Tests that posts are tagged when created and retagged when
+        edited."""
+
+        self.client.login(username="test_user", password="password")
+        self.client.post(reverse('create_post'), data={
+            'text': 'Dinner #Curry #spicy',
+            'image': make_test_image(name="Test image"),
+        })
+        post = Post.objects.get()
+        self.assertEqual({'curry', 'spicy'}, self.tag_names(post))
+        post_tag = PostTag.objects.filter(post=post).first()
+        self.assertEqual(post.created_on, post_tag.created_on)
+
+        self.client.post(reverse('edit_post', args=[post.id]),
+                         data={'text': 'Dinner #curry #mild'})
+        self.assertEqual({'curry', 'mild'}, self.tag_names(post))
+
+    def test_tag_feed_pages_tagged_posts(self):
+        """Tests that the tag feed lists the published posts using a tag
+        newest first, following cursors through every page."""
+
+        start = timezone.now()
+        tagged = []
+        for number in range(PostList.paginate_by + 2):
+            post = self.add_post(f'Noodles {number} #Ramen')
+            tagged.append(post)
+        for offset, post in enumerate(tagged):
+            # Two posts share a creation time to test the tie break.
+            created_on = start + timedelta(minutes=min(offset, 10))
+            Post.objects.filter(pk=post.pk).update(created_on=created_on)
+            PostTag.objects.filter(post=post).update(created_on=created_on)
+        self.add_post('Soup #ramen', image_status=ImageStatus.PROCESSING)
+        self.add_post('Toast #breakfast')
+
+        seen = []
+        url = reverse('tag_feed', args=['RAMEN'])
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            page = response.context['page_obj']
+            seen.extend(post.id for post in page)
+            if not page.has_next:
+                break
+            response = self.client.get(url, {'after': page.next_cursor})
+
+        expected = (Post.objects.filter(pk__in=[post.pk for post in tagged])
+                    .order_by('-created_on', '-id')
+                    .values_list('id', flat=True))
+        self.assertEqual(list(expected), seen)
+        self.assertContains(response, 'Posts tagged #ramen')
+        self.assertContains(
+            response, f'<a class="hashtag" href="{url.lower()}">#Ramen</a>',
+            html=True)
+
+        response = self.client.get(reverse('tag_feed', args=['unused']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_backfill_tags_command(self):
+        """Tests that the command tags posts made before tagging and
+        removes tags their text no longer uses."""
+
+        untagged = Post.objects.create(author=self.profile,
+                                       image='test_image',
+                                       text='Old post #toast #jam')
+        stale = self.add_post('Edited post #stew')
+        Post.objects.filter(pk=stale.pk).update(text='Edited post #soup')
+
+        output = StringIO()
+        call_command('backfill_tags', '--batch-size', '1', stdout=output)
+        self.assertIn("Tagged 2 posts, adding 3 tags.", output.getvalue())
+        self.assertEqual({'toast', 'jam'}, self.tag_names(untagged))
+        self.assertEqual({'soup'}, self.tag_names(stale))
+
+        call_command('backfill_tags', stdout=output)
+        self.assertIn("Tagged 2 posts, adding 0 tags.", output.getvalue())
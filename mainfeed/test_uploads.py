@@ -0,0 +1,178 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .deletions import process_pending_deletions
+from .images import LocalImageBackend, get_image_backend
+from .models import ImageStatus, PendingDeletion, PendingUpload, Post
+from .testing import make_test_image
+from .uploads import (MAX_UPLOAD_ATTEMPTS, claim_uploads,
+                      process_pending_uploads, process_upload, stage_upload)
+
+UPLOAD_OPTIONS = {"folder": "foodfeed/"}
+
+
+class FailingImageBackend:
+    """Image backend whose uploads always fail."""
+
+    def upload(self, file, **options):
+        raise ConnectionError("Image backend unavailable")
+
+    def destroy(self, public_id):
+        return {"result": "not found"}
+
+
+class ColourImageBackend(LocalImageBackend):
+    """Image backend giving colours as Cloudinary does when asked."""
+
+    def upload(self, file, **options):
+        result = super().upload(file, **options)
+        if options.get("colors"):
+            result["colors"] = [["#E8D3A0", 61.5], ["#3B2A1C", 20.1]]
+        return result
+
+
+class TestUploadWorker(TestCase):
+    """Test cases to validate the upload worker."""
+
+    def setUp(self):
+        """Creates a user profile with a post waiting for its image to be
+        used in test cases."""
+
+        cache.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+        self.post = Post.objects.create(
+            author=self.profile, image='', text='Processing post text',
+            image_status=ImageStatus.PROCESSING)
+        stage_upload(make_test_image(), UPLOAD_OPTIONS, post=self.post)
+
+    def test_post_published_once_uploaded(self):
+        """Tests that a post is left out of the feed until the worker has
+        uploaded its image."""
+
+        response = self.client.get(reverse('feed'))
+        self.assertNotContains(response, "Processing post text")
+
+        self.assertEqual(1, process_pending_uploads())
+
+        response = self.client.get(reverse('feed'))
+        self.assertContains(response, "Processing post text")
+        self.assertFalse(PendingUpload.objects.exists())
+
+    def test_owner_sees_processing_post(self):
+        """Tests that only the owner sees their processing post on their
+        profile."""
+
+        profile_url = reverse('user_profile', args=[self.profile.id])
+        response = self.client.get(profile_url)
+        self.assertNotContains(response, "Processing post text")
+
+        self.client.login(username="test_user", password="password")
+        response = self.client.get(profile_url)
+        self.assertContains(response, "This image is still being processed.")
+
+    def test_claimed_upload_not_claimed_again(self):
+        """Tests that an upload claimed by one worker is not given to
+        another."""
+
+        self.assertEqual(1, len(claim_uploads(10)))
+        self.assertEqual([], claim_uploads(10))
+
+    @override_settings(IMAGE_BACKEND={
+        'BACKEND': 'mainfeed.test_uploads.FailingImageBackend'})
+    def test_failed_upload_retried_then_marked_failed(self):
+        """Tests that a failing upload is retried before its post is marked
+        as failed."""
+
+        for attempt in range(1, MAX_UPLOAD_ATTEMPTS):
+            with self.assertLogs('mainfeed.uploads', 'WARNING'):
+                self.assertEqual(1, process_pending_uploads())
+            pending = PendingUpload.objects.get()
+            self.assertEqual(attempt, pending.attempts)
+            self.assertIn("unavailable", pending.last_error)
+
+            # The retry waits, so make it due now.
+            self.assertEqual(0, process_pending_uploads())
+            PendingUpload.objects.update(available_on=pending.created_on)
+
+        with self.assertLogs('mainfeed.uploads', 'WARNING'):
+            process_pending_uploads()
+
+        self.post.refresh_from_db()
+        self.assertEqual(ImageStatus.FAILED, self.post.image_status)
+        self.assertFalse(PendingUpload.objects.exists())
+
+    def test_upload_for_deleted_post_destroyed(self):
+        """Tests that an image uploaded for a post deleted meanwhile is
+        queued for deletion."""
+
+        backend = get_image_backend()
+        public_id = backend.upload(make_test_image(),
+                                   **UPLOAD_OPTIONS)['public_id']
+        pending = claim_uploads(10)[0]
+        self.post.delete()
+
+        process_upload(pending)
+        self.assertTrue(
+            PendingDeletion.objects.filter(public_id=public_id).exists())
+
+        process_pending_deletions()
+        self.assertNotIn(public_id, backend.images)
+
+    def test_command_processes_waiting_uploads(self):
+        """Tests that the worker command can process the waiting uploads
+        and exit."""
+
+        output = StringIO()
+        call_command('process_uploads', '--once', stdout=output)
+
+        self.assertIn("Processed 1 uploads.", output.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(ImageStatus.READY, self.post.image_status)
+
+
+class TestImagePlaceholder(TestCase):
+    """Test cases to validate a post's image size and colour are stored."""
+
+    def setUp(self):
+        """Creates a user profile to be used in test cases."""
+
+        cache.clear()
+        User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+
+    @override_settings(IMAGE_BACKEND={
+        'BACKEND': 'mainfeed.test_uploads.ColourImageBackend'})
+    def test_size_and_colour_stored(self):
+        """Tests that the image size is stored when a post is made and its
+        dominant colour once the image is uploaded, then both are
+        rendered."""
+
+        self.client.login(username="test_user", password="password")
+        self.client.post(reverse('create_post'), data={
+            'text': 'Test post text',
+            'image': make_test_image(),
+        })
+
+        post = Post.objects.get()
+        self.assertEqual((1, 1), (post.image_width, post.image_height))
+        self.assertEqual('', post.placeholder_colour)
+
+        process_pending_uploads()
+        post.refresh_from_db()
+        self.assertEqual('#e8d3a0', post.placeholder_colour)
+
+        response = self.client.get(reverse('feed'))
+        self.assertContains(
+            response,
+            'width="1" height="1" style="background-color: #e8d3a0"')
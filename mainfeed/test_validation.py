@@ -0,0 +1,75 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+
+from .testing import TEST_JPEG, TEST_PDF, make_png
+from .validation import INVALID_TYPE_MESSAGE, InvalidImage, inspect_image
+
+
+def make_upload(content, content_type="image/jpeg"):
+    return SimpleUploadedFile(name="upload", content=content,
+                              content_type=content_type)
+
+
+class TestInspectImage(SimpleTestCase):
+    """Test cases to validate images are identified by their content."""
+
+    def test_jpeg_identified(self):
+        """Tests that a JPEG's size is read from its frame header."""
+
+        info = inspect_image(make_upload(TEST_JPEG))
+
+        self.assertEqual(("jpg", "image/jpeg", 1, 1), info)
+
+    def test_png_identified(self):
+        """Tests that a PNG's size is read from its header chunk."""
+
+        info = inspect_image(make_upload(make_png(640, 480)))
+
+        self.assertEqual(("png", "image/png", 640, 480), info)
+
+    def test_svg_identified(self):
+        """Tests that an SVG's size is read from its root element, or its
+        view box when it has no width and height."""
+
+        sized = (b'<?xml version="1.0"?>\n<!-- logo -->\n'
+                 b'<svg xmlns="http://www.w3.org/2000/svg" width="120px" '
+                 b'height="80"></svg>')
+        boxed = b'<svg viewBox="0 0 300 150"></svg>'
+        unsized = b'<svg xmlns="http://www.w3.org/2000/svg"></svg>'
+
+        self.assertEqual(("svg", "image/svg+xml", 120, 80),
+                         inspect_image(make_upload(sized)))
+        self.assertEqual(("svg", "image/svg+xml", 300, 150),
+                         inspect_image(make_upload(boxed)))
+        self.assertEqual(("svg", "image/svg+xml", None, None),
+                         inspect_image(make_upload(unsized)))
+
+    def test_declared_type_ignored(self):
+        """Tests that a file is rejected by its content whatever type the
+        client declares."""
+
+        with self.assertRaisesMessage(InvalidImage, INVALID_TYPE_MESSAGE):
+            inspect_image(make_upload(TEST_PDF, content_type="image/png"))
+
+    def test_truncated_image_rejected(self):
+        """Tests that an image cut off before its size is rejected."""
+
+        for content in (TEST_JPEG[:20], make_png(10, 10)[:18]):
+            with self.assertRaisesMessage(InvalidImage,
+                                          INVALID_TYPE_MESSAGE):
+                inspect_image(make_upload(content))
+
+    @override_settings(IMAGE_UPLOAD_MAX_BYTES=1024 * 1024)
+    def test_large_file_rejected(self):
+        """Tests that a file over the size limit is rejected."""
+
+        with self.assertRaisesMessage(InvalidImage, "under 1 MB"):
+            inspect_image(make_upload(make_png(1, 1) + bytes(1024 * 1024)))
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000000)
+    def test_large_dimensions_rejected(self):
+        """Tests that an image with too many pixels is rejected."""
+
+        inspect_image(make_upload(make_png(1000, 1000)))
+        with self.assertRaisesMessage(InvalidImage, "at most 1 megapixels"):
+            inspect_image(make_upload(make_png(1001, 1000)))
@@ -1,19 +1,296 @@
-import cloudinary.api
-import requests
-from cloudinary.uploader import destroy
+from unittest import mock
+
 from django.contrib.auth.models import User
 from django.contrib.messages import get_messages
-from django.core.files.base import ContentFile
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
+from django.db import connection
 from django.shortcuts import get_object_or_404
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from mainfeed.forms import PostForm
 from mainfeed.models import Post
 
 from .forms import CommentForm, PostForm, PostTextForm
-from .models import Comment, Post
+from .images import destroy_image
+from .models import Comment, ImageStatus, PendingUpload, Post
+from .testing import TEST_PDF, make_invalid_file, make_test_image
+from .uploads import process_pending_uploads
+from .views import COMMENTS_PER_PAGE
+
+
+class TestPostListView(TestCase):
+    """Test cases to validate the PostList view.
+
+    The view is for the main feed of posts."""
+
+    def setUp(self):
+        """Creates two user profiles to author posts and comments."""
+
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.test_user_profile = self.test_user.user_profile
+
+        self.commenter = User.objects.create_user(
+            username="test_commenter",
+            password="password"
+        )
+        self.commenter_profile = self.commenter.user_profile
+
+    def add_posts_with_comments(self, post_count, comment_count):
+        """Creates posts that each have the given number of comments."""
+
+        for post_number in range(post_count):
+            post = Post.objects.create(
+                author=self.test_user_profile,
+                image='test_image',
+                text=f'Test post {post_number}'
+            )
+            for comment_number in range(comment_count):
+                Comment.objects.create(
+                    post=post,
+                    author=self.commenter_profile,
+                    body=f'Test comment {comment_number}'
+                )
+            Post.objects.filter(pk=post.id).update(comment_count=comment_count)
+
+    def test_render_feed_page(self):
+        """Tests the page renders successfully and includes expected
+        content."""
+
+        self.add_posts_with_comments(1, 1)
+
+        response = self.client.get(reverse('feed'))
+
+        # Check response.
+        self.assertEqual(response.status_code, 200)
+
+        # Check content rendered.
+        self.assertIn(b"Test post 0", response.content)
+        self.assertIn(b"Test comment 0", response.content)
+        self.assertIn(b"test_commenter", response.content)
+
+    def test_feed_query_count_is_constant(self):
+        """Tests that rendering the feed costs the same number of queries
+        however many posts and comments it shows."""
+
+        self.add_posts_with_comments(2, 1)
+        with CaptureQueriesContext(connection) as small_feed:
+            self.client.get(reverse('feed'))
+
+        self.add_posts_with_comments(8, 5)
+        with CaptureQueriesContext(connection) as full_feed:
+            response = self.client.get(reverse('feed'))
+
+        self.assertEqual(len(response.context['post_list']), 10)
+        self.assertEqual(len(small_feed), len(full_feed))
+
+    def test_feed_cursor_pagination(self):
+        """Tests that the feed pages by cursor without counting posts."""
+
+        self.add_posts_with_comments(12, 0)
+
+        with CaptureQueriesContext(connection) as first_page_queries:
+            response = self.client.get(reverse('feed'))
+
+        # Check no COUNT query was made.
+        for query in first_page_queries:
+            self.assertNotIn('COUNT', query['sql'])
+
+        # Check the next page holds the remaining posts.
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.has_next)
+        self.assertIn(f'?after={page_obj.next_cursor}'.encode(),
+                      response.content)
+
+        response = self.client.get(
+            reverse('feed'), {'after': page_obj.next_cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['post_list']), 2)
+        self.assertIn(b"Test post 0", response.content)
+        self.assertFalse(response.context['page_obj'].has_next)
+        self.assertTrue(response.context['page_obj'].has_previous)
+
+    def test_feed_page_number_pagination(self):
+        """Tests that links using a page number still work."""
+
+        self.add_posts_with_comments(12, 0)
+
+        response = self.client.get(reverse('feed'), {'page': 2})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['post_list']), 2)
+        self.assertIn(b"?page=1", response.content)
+
+    def test_feed_invalid_cursor(self):
+        """Tests that an invalid cursor results in a 404 response."""
+
+        response = self.client.get(reverse('feed'), {'after': 'invalid'})
+
+        self.assertEqual(response.status_code, 404)
+
+
+class TestCommentCount(TestCase):
+    """Test cases to validate the comment count kept on each post."""
+
+    def setUp(self):
+        """Creates a user profile with a post to be used in test cases."""
+
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.post = Post.objects.create(
+            author=self.test_user.user_profile,
+            image='test_image',
+            text='Test post text'
+        )
+
+    def test_create_and_delete_comment_update_count(self):
+        """Tests that creating and deleting a comment changes the count."""
+
+        self.client.login(
+            username="test_user", password="password")
+
+        self.client.post(
+            path=reverse('create_comment', args=[self.post.id]),
+            data={'body': 'Test comment text'})
+        self.post.refresh_from_db()
+        self.assertEqual(1, self.post.comment_count)
+
+        comment = Comment.objects.get(post=self.post)
+        self.client.post(path=reverse('delete_comment', args=[comment.id]))
+        self.post.refresh_from_db()
+        self.assertEqual(0, self.post.comment_count)
+
+    def test_racing_deletes_decrement_count_once(self):
+        """Tests that a request deleting a comment another request already
+        deleted leaves the count alone."""
+
+        self.client.login(
+            username="test_user", password="password")
+        for body in ('First comment', 'Second comment'):
+            self.client.post(
+                path=reverse('create_comment', args=[self.post.id]),
+                data={'body': body})
+        comment = Comment.objects.get(body='First comment')
+        url = reverse('delete_comment', args=[comment.id])
+
+        self.client.post(path=url)
+        # The second request found the comment before it was deleted.
+        with mock.patch('mainfeed.views.get_object_or_404',
+                        return_value=comment):
+            self.client.post(path=url)
+
+        self.post.refresh_from_db()
+        self.assertEqual(1, self.post.comment_count)
+
+    def test_feed_renders_comment_count(self):
+        """Tests that the feed renders the stored comment count."""
+
+        response = self.client.get(reverse('feed'))
+        self.assertIn(b"no-comments", response.content)
+
+        Post.objects.filter(pk=self.post.id).update(comment_count=2)
+        Comment.objects.create(
+            post=self.post,
+            author=self.test_user.user_profile,
+            body='Test comment text'
+        )
+        response = self.client.get(reverse('feed'))
+        self.assertIn(b"2 comments", response.content)
+
+
+class TestCommentPagination(TestCase):
+    """Test cases to validate the comment preview shown in the feed and the
+    comment pages loaded from it."""
+
+    def setUp(self):
+        """Creates a post with more comments than fit on a page."""
+
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        profile = self.test_user.user_profile
+        self.post = Post.objects.create(
+            author=profile, image='test_image', text='Test post text',
+            comment_count=COMMENTS_PER_PAGE + 5)
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=profile,
+                    body=f'Test comment {number:02}.')
+            for number in range(COMMENTS_PER_PAGE + 5)
+        )
+
+    def test_feed_shows_latest_comments(self):
+        """Tests that the feed only includes the latest comments of a post
+        with a button to load earlier ones."""
+
+        response = self.client.get(reverse('feed'))
+
+        latest = COMMENTS_PER_PAGE + 4
+        self.assertIn(f"Test comment {latest}.".encode(), response.content)
+        self.assertNotIn(b"Test comment 00.", response.content)
+        self.assertIn(b"View earlier comments", response.content)
+
+    def test_comment_list_pages_earlier_comments(self):
+        """Tests that the comment list loads the comments before the
+        preview."""
+
+        preview = Post.objects.for_feed().get(pk=self.post.id).comment_preview
+        response = self.client.get(
+            reverse('comment_list', args=[self.post.id]),
+            {'before': preview.previous_cursor})
+
+        # Check response.
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            len(response.context['comment_page']), COMMENTS_PER_PAGE)
+        self.assertIn(b"Test comment 02.", response.content)
+        self.assertNotIn(b"Test comment 01.", response.content)
+        self.assertIn(b"View earlier comments", response.content)
+
+        # The preview comments after this page are already shown.
+        self.assertTrue(response.context['comment_page'].has_next)
+        self.assertNotIn(b"View more comments", response.content)
+        self.assertNotIn(b"?after=", response.content)
+
+    def test_comment_list_pages_later_comments(self):
+        """Tests that a page loaded forwards only links to the comments
+        after it."""
+
+        first_page = self.client.get(
+            reverse('comment_list', args=[self.post.id]))
+        self.assertIn(b"View more comments", first_page.content)
+        self.assertNotIn(b"View earlier comments", first_page.content)
+
+        response = self.client.get(
+            reverse('comment_list', args=[self.post.id]),
+            {'after': first_page.context['comment_page'].next_cursor})
+        self.assertEqual(len(response.context['comment_page']), 5)
+        self.assertTrue(response.context['comment_page'].has_previous)
+        self.assertNotIn(b"View earlier comments", response.content)
+
+    def test_view_post_pages_comments(self):
+        """Tests that the view post page pages through comments oldest
+        first."""
+
+        response = self.client.get(reverse('view_post', args=[self.post.id]))
+
+        comment_page = response.context['comment_page']
+        self.assertEqual(len(comment_page), COMMENTS_PER_PAGE)
+        self.assertIn(b"Test comment 00.", response.content)
+        self.assertIn(b"View more comments", response.content)
+
+        response = self.client.get(
+            reverse('view_post', args=[self.post.id]),
+            {'after': comment_page.next_cursor})
+        self.assertEqual(len(response.context['comment_page']), 5)
+        self.assertIn(b"View earlier comments", response.content)
 
 
 class TestPostView(TestCase):
@@ -33,12 +310,7 @@ class TestPostView(TestCase):
         self.test_user_profile = self.test_user.user_profile
 
         # Get test image and create image object for test post.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         # Create test post.
         post_form = PostForm({'text': 'Test post text'}, image)
@@ -113,12 +385,7 @@ class TestCreatePostView(TestCase):
             username="test_user", password="password")
 
         # Set up details and then make the post request.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        new_image = SimpleUploadedFile(name="Test image",
-                                       content=test_image.content,
-                                       content_type="image/jpeg")
+        new_image = make_test_image(name="Test image")
 
         post_data = {
             'text': 'Test post text',
@@ -136,16 +403,25 @@ class TestCreatePostView(TestCase):
         post_made = get_object_or_404(Post, pk=1)
         self.assertEqual('test_user', post_made.author.user.username)
         self.assertEqual('Test post text', post_made.text)
-        if not hasattr(post_made.image, 'public_id'):
-            self.fail
+        self.assertEqual(ImageStatus.PROCESSING, post_made.image_status)
+        self.assertNotIn(post_made, Post.objects.published())
 
         # Check messages provided to user.
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(1, len(messages))
-        self.assertEqual("Post submitted successfully!", str(messages[0]))
+        self.assertEqual(
+            "Post submitted successfully! "
+            "It will appear in the feed once its image is processed.",
+            str(messages[0]))
         self.assertEqual('success', messages[0].level_tag)
 
-        cloudinary.uploader.destroy(post_made.image.public_id)
+        # Verify the post is published once the worker uploads its image.
+        self.assertEqual(1, process_pending_uploads())
+        post_made.refresh_from_db()
+        self.assertEqual(ImageStatus.READY, post_made.image_status)
+        self.assertTrue(post_made.image.public_id.startswith('foodfeed/'))
+
+        destroy_image(post_made.image.public_id)
 
     def test_create_post_invalid_image_rejection(self):
         """Tests that the view won't create a post with an invalid image
@@ -155,13 +431,7 @@ class TestCreatePostView(TestCase):
             username="test_user", password="password")
 
         # Set up details and then make the post request.
-        cloudinary_test_image = cloudinary.api.resource(
-            "invalid_content_type_file")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        new_image = SimpleUploadedFile(name="invalid_content_type_file",
-                                       content=test_image.content,
-                                       content_type="application/pdf")
+        new_image = make_invalid_file()
 
         post_data = {
             'text': 'Test post text',
@@ -189,6 +459,36 @@ class TestCreatePostView(TestCase):
         # Verify (no) new values.
         self.assertEqual(0, len(Post.objects.all()))
 
+    def test_create_post_disguised_file_rejection(self):
+        """Tests that the view won't create a post with a file declared to
+        be an image that is not one."""
+
+        self.client.login(
+            username="test_user", password="password")
+
+        # Set up details and then make the post request.
+        post_data = {
+            'text': 'Test post text',
+            'image': SimpleUploadedFile(name="disguised.jpg",
+                                        content=TEST_PDF,
+                                        content_type="image/jpeg")
+        }
+
+        response = self.client.post(
+            path=reverse('create_post'), data=post_data)
+
+        # Check messages provided to user.
+        messages = list(get_messages(response.wsgi_request))
+        self.assertEqual(2, len(messages))
+        self.assertEqual(
+            "File uploaded not one of the accepted types. "
+            "Please try uploading an image of JPG, PNG or SVG format.",
+            str(messages[0]))
+
+        # Verify (no) new values.
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(PendingUpload.objects.exists())
+
     def test_create_post_invalid_form_rejection(self):
         """Tests that an invalid form will fail to make a post."""
 
@@ -232,12 +532,7 @@ class TestEditPostView(TestCase):
         self.test_user_profile = self.test_user.user_profile
 
         # Get test image and create image object for test post.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         # Create test post.
         post_form = PostForm({'text': 'Test post text'}, image)
@@ -366,7 +661,7 @@ class TestEditPostView(TestCase):
     def tearDown(self):
         """Deletes Cloudinary resources uploaded during testing."""
 
-        cloudinary.uploader.destroy(
+        destroy_image(
             self.post.image.public_id)
 
 
@@ -384,12 +679,7 @@ class TestDeletePostView(TestCase):
         self.test_user_profile = self.test_user.user_profile
 
         # Get test image and create image object for test post.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         # Create test post.
         post_form = PostForm({'text': 'Test post text'}, image)
@@ -465,7 +755,7 @@ class TestDeletePostView(TestCase):
     def tearDown(self):
         """Deletes Cloudinary resources uploaded during testing."""
 
-        cloudinary.uploader.destroy(
+        destroy_image(
             self.post.image.public_id)
 
 
@@ -486,12 +776,7 @@ class TestCommentView(TestCase):
         self.test_user_profile = self.test_user.user_profile
 
         # Get test image and create image object for test post.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         # Create test post.
         post_form = PostForm({'text': 'Test post text'}, image)
@@ -538,12 +823,7 @@ class TestCreateCommentView(TestCase):
         self.test_user_profile = self.test_user.user_profile
 
         # Get test image and create image object for test post.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         # Create test post.
         post_form = PostForm({'text': 'Test post text'}, image)
@@ -617,6 +897,25 @@ class TestCreateCommentView(TestCase):
         self.assertEqual("Comment submitted successfully!", str(messages[0]))
         self.assertEqual('success', messages[0].level_tag)
 
+    def test_message_round_trip_skips_sessions(self):
+        """Tests that the message added before redirecting is carried by a
+        cookie, so neither the redirect nor the page showing it touches the
+        sessions table, as with Django's default message storage."""
+
+        self.client.login(
+            username="test_user", password="password")
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.post(
+                reverse('create_comment', args=[self.post.id]),
+                data={'body': 'Test comment text'}, follow=True)
+
+        self.assertEqual([('/', 302)], response.redirect_chain)
+        self.assertContains(response, "Comment submitted successfully!")
+        self.assertEqual('', self.client.cookies['messages'].value)
+        self.assertEqual([], [query['sql'] for query in captured
+                              if 'django_session' in query['sql']])
+
     def test_create_comment_invalid_form_rejection(self):
         """Tests that an invalid form will fail to make a comment."""
 
@@ -648,7 +947,7 @@ class TestCreateCommentView(TestCase):
     def tearDown(self):
         """Deletes Cloudinary resources uploaded during testing."""
 
-        cloudinary.uploader.destroy(
+        destroy_image(
             self.post.image.public_id)
 
 
@@ -667,12 +966,7 @@ class TestEditCommentView(TestCase):
         self.test_user_profile = self.test_user.user_profile
 
         # Get test image and create image object for test post.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         # Create test post.
         post_form = PostForm({'text': 'Test post text'}, image)
@@ -812,7 +1106,7 @@ class TestEditCommentView(TestCase):
     def tearDown(self):
         """Deletes Cloudinary resources uploaded during testing."""
 
-        cloudinary.uploader.destroy(
+        destroy_image(
             self.post.image.public_id)
 
 
@@ -831,12 +1125,7 @@ class TestDeleteCommentView(TestCase):
         self.test_user_profile = self.test_user.user_profile
 
         # Get test image and create image object for test post.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         # Create test post.
         post_form = PostForm({'text': 'Test post text'}, image)
@@ -918,5 +1207,93 @@ class TestDeleteCommentView(TestCase):
     def tearDown(self):
         """Deletes Cloudinary resources uploaded during testing."""
 
-        cloudinary.uploader.destroy(
+        destroy_image(
             self.post.image.public_id)
+
+
+class TestMutationQueryCounts(TestCase):
+    """Test cases to pin the queries made by the views changing posts and
+    comments, so lookups the views repeat are caught."""
+
+    def setUp(self):
+        """Creates a signed-in user profile with a commented post, to be
+        used in test cases. The user is read once, so each request finds
+        them cached."""
+
+        cache.clear()
+        self.test_user = User.objects.create_user(
+            username="test_user",
+            password="password"
+        )
+        self.profile = self.test_user.user_profile
+        self.post = Post.objects.create(
+            author=self.profile, image='test_image', text='Test post text',
+            comment_count=1)
+        self.comment = Comment.objects.create(
+            post=self.post, author=self.profile, body='Test comment text')
+        self.client.login(username="test_user", password="password")
+        self.client.get(reverse('feed'))
+
+    def assertRequestQueries(self, expected, method, url, data=None):
+        """Makes a request and checks the number of queries it made."""
+
+        with self.assertNumQueries(expected):
+            response = getattr(self.client, method)(url, data or {})
+        self.assertIn(response.status_code, (200, 302))
+
+    def test_comment_view_query_counts(self):
+        """Tests that the comment views read the post, comment and author
+        once each, and the signed-in user's profile from the cache. Saving
+        takes a savepoint and its release on top of the writes."""
+
+        create_url = reverse('create_comment', args=[self.post.id])
+        edit_url = reverse('edit_comment',
+                           args=[self.post.id, self.comment.id])
+        self.assertRequestQueries(2, 'get', create_url)
+        self.assertRequestQueries(5, 'post', create_url, {'body': 'New'})
+        self.assertRequestQueries(2, 'get', edit_url)
+        self.assertRequestQueries(2, 'post', edit_url, {'body': 'Edited'})
+        self.assertRequestQueries(
+            5, 'post', reverse('delete_comment', args=[self.comment.id]))
+
+    def test_post_view_query_counts(self):
+        """Tests that the post views read the post and author once, with
+        deleting the post also reading the comments it removes."""
+
+        edit_url = reverse('edit_post', args=[self.post.id])
+        self.assertRequestQueries(2, 'get', edit_url)
+        self.assertRequestQueries(5, 'post', edit_url, {'text': 'Edited'})
+        self.assertRequestQueries(
+            1, 'get', reverse('edit_user_profile', args=[self.profile.id]))
+        self.assertRequestQueries(
+            7, 'post', reverse('delete_post', args=[self.post.id]))
+
+    def test_delete_commented_post_counts(self):
+        """Tests that deleting a heavily commented post reads its comments
+        in one query and deletes them a hundred at a time, and discards the
+        cached content showing it once rather than for each comment."""
+
+        Comment.objects.bulk_create([
+            Comment(post=self.post, author=self.profile,
+                    body=f'Test comment {number}')
+            for number in range(99)])
+
+        with (mock.patch.object(cache, 'incr', wraps=cache.incr) as incr,
+              self.captureOnCommitCallbacks(execute=True)):
+            self.assertRequestQueries(
+                7, 'post', reverse('delete_post', args=[self.post.id]))
+        # The feed version, bumped straight away and again on commit.
+        self.assertEqual(2, incr.call_count)
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+
+    def test_comment_on_other_post_not_found(self):
+        """Tests that a comment is only viewed and edited at the URL of its
+        own post."""
+
+        other = Post.objects.create(
+            author=self.profile, image='test_image', text='Other post text')
+        for name in ('view_comment', 'edit_comment'):
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(name, args=[other.id, self.comment.id]))
+                self.assertEqual(response.status_code, 404)
@@ -0,0 +1,44 @@
+import base64
+import struct
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+# A 1x1 pixel JPEG, small enough to keep in the source.
+TEST_JPEG = base64.b64decode(
+    "/9j/4AAQSkZJRgABAQEASABIAAD/2wBDAP//////////////////////////////////////"
+    "////////////////////////////////////////////////wgALCAABAAEBAREA/8QAFBAB"
+    "AAAAAAAAAAAAAAAAAAAAAP/aAAgBAQABPxD/2Q==")
+
+# The start of a PDF, which is not an accepted image type.
+TEST_PDF = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n1 0 obj\n<<>>\nendobj\n%%EOF\n"
+
+
+def make_test_image(name="test_image.jpg", content_type="image/jpeg"):
+    """Builds an uploaded JPEG image for tests.
+
+    Args:
+        name (str): The file name of the upload.
+        content_type (str): The content type declared by the upload.
+
+    Returns:
+        SimpleUploadedFile: the image, as received from a form.
+    """
+
+    return SimpleUploadedFile(name=name, content=TEST_JPEG,
+                              content_type=content_type)
+
+
+def make_png(width, height):
+    """Builds the signature and header chunk of a PNG of a given size,
+    which is all of one that is read to identify it."""
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(header)) + b"IHDR"
+            + header + b"\x00" * 4)
+
+
+def make_invalid_file(name="invalid_content_type_file"):
+    """Builds an uploaded PDF for tests rejecting other file types."""
+
+    return SimpleUploadedFile(name=name, content=TEST_PDF,
+                              content_type="application/pdf")
@@ -0,0 +1,173 @@
+import logging
+import re
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from userprofile.models import UserProfile
+
+from .deletions import queue_image_deletions
+from .images import upload_image
+from .models import ImageStatus, PendingUpload, Post
+from .queues import claim_batch
+
+logger = logging.getLogger(__name__)
+
+# How many times an image is tried before its post is marked as failed.
+MAX_UPLOAD_ATTEMPTS = 3
+
+# How long a worker holds an upload before another worker may retry it.
+UPLOAD_LEASE = timedelta(minutes=5)
+
+# How long a failed upload waits before each retry, multiplied by the
+# number of attempts made so far.
+UPLOAD_RETRY_DELAY = timedelta(seconds=30)
+
+# A colour as Cloudinary reports it, such as "#e8d3a0".
+HEX_COLOUR = re.compile(r"^#[0-9a-fA-F]{6}$")
+
+
+def stage_upload(file, options, post=None, profile=None):
+    """Stores an uploaded image for the upload worker to upload.
+
+    A profile only keeps its latest staged image, so any image staged for
+    it earlier is discarded.
+
+    Args:
+        file (UploadedFile): The image submitted in the request.
+        options (dict): The Cloudinary upload options, such as the folder
+        and the transformation applied to the image.
+        post (Post): The post to give the image to.
+        profile (UserProfile): The profile to give the image to.
+
+    Returns:
+        PendingUpload: the staged upload.
+    """
+
+    if profile is not None:
+        PendingUpload.objects.filter(profile=profile).delete()
+    if hasattr(file, "seek"):
+        file.seek(0)
+    return PendingUpload.objects.create(
+        post=post,
+        profile=profile,
+        name=getattr(file, "name", "") or "",
+        content_type=getattr(file, "content_type", "") or "",
+        content=file.read(),
+        options=options,
+    )
+
+
+def claim_uploads(limit):
+    """Claims the next uploads no other worker is holding.
+
+    Args:
+        limit (int): The most uploads to claim.
+
+    Returns:
+        list: the claimed uploads, oldest first.
+    """
+
+    return claim_batch(PendingUpload.objects.all(), limit, UPLOAD_LEASE)
+
+
+def process_upload(pending):
+    """Uploads a staged image and gives it to its post or profile.
+
+    A post is published once it has its image, along with the size it is
+    stored at and its dominant colour. A profile's previous image
+    is queued for deletion once replaced. If the image cannot be
+    uploaded it is retried later, and after MAX_UPLOAD_ATTEMPTS its post
+    is marked as failed.
+
+    Args:
+        pending (PendingUpload): A claimed upload.
+
+    Returns:
+        bool: whether the image was uploaded.
+    """
+
+    file = ContentFile(bytes(pending.content), name=pending.name)
+    file.content_type = pending.content_type
+    try:
+        image = upload_image(file, **pending.options)
+    except Exception as error:
+        record_failure(pending, error)
+        return False
+
+    with transaction.atomic():
+        # The upload was discarded if its post was deleted or its profile
+        # was given another image while it was uploading.
+        deleted, _ = PendingUpload.objects.filter(pk=pending.pk).delete()
+        if deleted and pending.post_id is not None:
+            post = Post.objects.get(pk=pending.post_id)
+            post.image = image
+            post.image_status = ImageStatus.READY
+            set_placeholder(post, image.metadata)
+            post.save(update_fields=[
+                "image", "image_public_id", "image_status", "image_width",
+                "image_height", "placeholder_colour", "updated_on"])
+        elif deleted:
+            profile = UserProfile.objects.get(pk=pending.profile_id)
+            queue_image_deletions([profile.image])
+            profile.image = image
+            profile.save(
+                update_fields=["image", "image_public_id", "updated_on"])
+        else:
+            queue_image_deletions([image])
+    return True
+
+
+def set_placeholder(post, result):
+    """Sets a post's image size and dominant colour from an upload result.
+
+    The size is only replaced if the result gives one, and the colour is
+    the first of the colours Cloudinary gives when asked for them.
+    """
+
+    if result.get("width") and result.get("height"):
+        post.image_width = result["width"]
+        post.image_height = result["height"]
+    colours = result.get("colors") or []
+    if colours and HEX_COLOUR.match(colours[0][0]):
+        post.placeholder_colour = colours[0][0].lower()
+
+
+def record_failure(pending, error):
+    """Schedules a failed upload to be retried, or gives up on it."""
+
+    attempts = pending.attempts + 1
+    logger.warning("Upload %s failed on attempt %s: %s",
+                   pending.pk, attempts, error)
+
+    if attempts < MAX_UPLOAD_ATTEMPTS:
+        PendingUpload.objects.filter(pk=pending.pk).update(
+            attempts=attempts,
+            last_error=str(error),
+            available_on=timezone.now() + UPLOAD_RETRY_DELAY * attempts,
+        )
+        return
+
+    with transaction.atomic():
+        deleted, _ = PendingUpload.objects.filter(pk=pending.pk).delete()
+        post = Post.objects.filter(pk=pending.post_id).first()
+        if deleted and post is not None:
+            post.image_status = ImageStatus.FAILED
+            post.save(update_fields=["image_status", "updated_on"])
+
+
+def process_pending_uploads(limit=10):
+    """Claims and processes the next batch of staged uploads.
+
+    Args:
+        limit (int): The most uploads to process.
+
+    Returns:
+        int: the number of uploads claimed.
+    """
+
+    pending_uploads = claim_uploads(limit)
+    for pending in pending_uploads:
+        process_upload(pending)
+    return len(pending_uploads)
@@ -1,9 +1,11 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.PostList.as_view(), name='feed'),
+    path('tag/<str:tag_name>', views.TagPostList.as_view(), name='tag_feed'),
+    path('search', views.search, name='search'),
     path('create-post', views.create_post, name='create_post'),
     path('create-comment/<int:post_id>',
          views.create_comment, name='create_comment'),
@@ -14,6 +16,19 @@ urlpatterns = [
     path('delete-comment/<int:comment_id>',
          views.delete_comment, name='delete_comment'),
     path('view-post/<int:post_id>', views.view_post, name='view_post'),
+    path('view-post/<int:post_id>/comments',
+         views.comment_list, name='comment_list'),
+    path('view-post/<int:post_id>/fragment',
+         views.post_fragment, name='post_fragment'),
+    path('events', views.feed_events, name='feed_events'),
     path('view-post/<int:post_id>/view-comment/<int:comment_id>',
          views.view_comment, name='view_comment'),
+    path('metrics/requests', views.request_metrics,
+         name='request_metrics'),
+    path('api/v1/posts', api.api_feed, name='api_feed'),
+    path('api/v1/posts/<int:post_id>', api.api_post, name='api_post'),
+    path('api/v1/posts/<int:post_id>/comments',
+         api.api_comments, name='api_comments'),
+    path('api/v1/profiles/<int:user_profile_id>',
+         api.api_profile, name='api_profile'),
 ]
@@ -0,0 +1,174 @@
+import os
+import re
+import struct
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+
+# The message shown when a file is not one of the accepted image types.
+INVALID_TYPE_MESSAGE = ("File uploaded not one of the accepted types. "
+                        "Please try uploading an image of JPG, PNG or SVG "
+                        "format.")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+# JPEG markers starting a frame header, which holds the image size. The
+# other markers in their range define tables rather than frames.
+JPEG_FRAME_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# JPEG markers with no length or payload after them.
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+
+# How much of an SVG is read to find its root element.
+SVG_SNIFF_BYTES = 4096
+
+SVG_ROOT = re.compile(
+    r"^\s*(?:<\?xml[^>]*\?>\s*)?"
+    r"(?:(?:<!--.*?-->|<!DOCTYPE[^>]*>)\s*)*"
+    r"<svg\b(?P<attributes>[^>]*)>",
+    re.DOTALL)
+SVG_LENGTH = re.compile(
+    r'\b(?P<name>width|height)\s*=\s*["\']\s*'
+    r'(?P<value>[\d.]+)\s*(?:px)?\s*["\']')
+SVG_VIEW_BOX = re.compile(
+    r'\bviewBox\s*=\s*["\']\s*[-\d.]+[\s,]+[-\d.]+[\s,]+'
+    r'(?P<width>[\d.]+)[\s,]+(?P<height>[\d.]+)\s*["\']')
+
+
+class InvalidImage(ValueError):
+    """Raised when an uploaded file is not an image that can be accepted.
+
+    The message is written to be shown to the user.
+    """
+
+
+class ImageInfo(NamedTuple):
+    """The type and size of an image, read from its headers."""
+
+    format: str
+    content_type: str
+    width: Optional[int]
+    height: Optional[int]
+
+
+def inspect_image(file):
+    """Identifies an uploaded image by its content and checks its size.
+
+    The content type declared by the client is ignored. Only as much of
+    the file as is needed is read: its size is checked before anything is
+    read, the first bytes tell its type, and its dimensions are taken from
+    its headers without decoding it. Files too large, in bytes or pixels,
+    for IMAGE_UPLOAD_MAX_BYTES and IMAGE_UPLOAD_MAX_PIXELS are rejected.
+
+    Args:
+        file (UploadedFile): The file submitted in the request.
+
+    Returns:
+        ImageInfo: the format, content type and dimensions of the image.
+        SVGs without a size in their root element have no dimensions.
+
+    Raises:
+        InvalidImage: if the file is not a JPEG, PNG or SVG image, is
+        truncated, or is too large.
+    """
+
+    if file is None:
+        raise InvalidImage(INVALID_TYPE_MESSAGE)
+
+    max_megabytes = settings.IMAGE_UPLOAD_MAX_BYTES / 1024 / 1024
+    if (file.size or 0) > settings.IMAGE_UPLOAD_MAX_BYTES:
+        raise InvalidImage(
+            "The image uploaded is too large. Please try uploading an image "
+            f"under {max_megabytes:g} MB.")
+
+    file.seek(0)
+    try:
+        head = file.read(len(PNG_SIGNATURE))
+        if head.startswith(PNG_SIGNATURE):
+            info = read_png(file)
+        elif head.startswith(JPEG_SIGNATURE):
+            info = read_jpeg(file)
+        else:
+            file.seek(0)
+            info = read_svg(file)
+    except struct.error:
+        raise InvalidImage(INVALID_TYPE_MESSAGE)
+    finally:
+        file.seek(0)
+
+    if (info.width and info.height and info.width * info.height
+            > settings.IMAGE_UPLOAD_MAX_PIXELS):
+        max_megapixels = settings.IMAGE_UPLOAD_MAX_PIXELS / 1000000
+        raise InvalidImage(
+            "The image uploaded is too large. Please try uploading an image "
+            f"of at most {max_megapixels:g} megapixels.")
+    return info
+
+
+def read_png(file):
+    """Reads the size of a PNG from its header chunk, which comes first."""
+
+    length, chunk_type, width, height = struct.unpack(
+        ">I4sII", file.read(16))
+    if chunk_type != b"IHDR" or not width or not height:
+        raise InvalidImage(INVALID_TYPE_MESSAGE)
+    return ImageInfo("png", "image/png", width, height)
+
+
+def read_jpeg(file):
+    """Reads the size of a JPEG from its frame header.
+
+    The segments before the frame header are skipped by their length, so
+    only their markers are read.
+    """
+
+    file.seek(2)
+    while True:
+        if file.read(1) != b"\xff":
+            raise InvalidImage(INVALID_TYPE_MESSAGE)
+        marker = file.read(1)
+        # Any number of fill bytes may come before a marker.
+        while marker == b"\xff":
+            marker = file.read(1)
+        if not marker:
+            raise InvalidImage(INVALID_TYPE_MESSAGE)
+
+        code = marker[0]
+        if code in JPEG_STANDALONE_MARKERS:
+            continue
+        if code in (0xD9, 0xDA):
+            # The image data or its end came before any frame header.
+            raise InvalidImage(INVALID_TYPE_MESSAGE)
+
+        (length,) = struct.unpack(">H", file.read(2))
+        if code in JPEG_FRAME_MARKERS:
+            _, height, width = struct.unpack(">BHH", file.read(5))
+            if not width or not height:
+                raise InvalidImage(INVALID_TYPE_MESSAGE)
+            return ImageInfo("jpg", "image/jpeg", width, height)
+        if length < 2:
+            raise InvalidImage(INVALID_TYPE_MESSAGE)
+        file.seek(length - 2, os.SEEK_CUR)
+
+
+def read_svg(file):
+    """Reads the size of an SVG from the attributes of its root element."""
+
+    text = file.read(SVG_SNIFF_BYTES).decode("utf-8-sig", errors="ignore")
+    root = SVG_ROOT.match(text)
+    if root is None:
+        raise InvalidImage(INVALID_TYPE_MESSAGE)
+
+    attributes = root.group("attributes")
+    lengths = {match.group("name"): match.group("value")
+               for match in SVG_LENGTH.finditer(attributes)}
+    view_box = SVG_VIEW_BOX.search(attributes)
+    if len(lengths) < 2 and view_box is not None:
+        lengths = view_box.groupdict()
+    try:
+        width = round(float(lengths["width"]))
+        height = round(float(lengths["height"]))
+    except (KeyError, ValueError):
+        width = height = None
+    return ImageInfo("svg", "image/svg+xml", width, height)
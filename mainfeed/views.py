@@ -1,26 +1,238 @@
+from asgiref.sync import sync_to_async
 from django.contrib import messages
-from django.http import HttpResponseRedirect
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import transaction
+from django.db.models import F
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (Http404, HttpResponse, HttpResponseRedirect,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, render, reverse
+from django.template.loader import render_to_string
+from django.utils.decorators import method_decorator
 from django.views import generic
-from userprofile.models import UserProfile
+from django.views.decorators.http import condition
 
+from .cache import cache_feed_page, feed_page_cache_key
+from .conditional import async_condition, feed_etag, post_etag
 from .forms import CommentForm, PostForm, PostTextForm
-from .models import Comment, Post
+from .events import get_event_broker, poll_events, stream_events
+from .fragments import layer_viewer_controls, render_post_fragments
+from .images import limited_size
+from .instrumentation import summary
+from .models import Comment, ImageStatus, Post, Tag
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import SEARCH_ORDERING
+from .shortcuts import aget_object_or_404, get_profile_id
+from .tags import normalise_tag, tag_posts
+from .uploads import stage_upload
 
 # Create your views here.
 
+# The number of comments on each page of a post's comment thread.
+COMMENTS_PER_PAGE = 20
 
+# The number of posts on each page of search results.
+SEARCH_RESULTS_PER_PAGE = 10
+
+
+@method_decorator(condition(etag_func=feed_etag), name='dispatch')
 class PostList(generic.ListView):
     """View to list all posts.
 
     Post objects can be accessed in the template through post_list
+
+    Pages are selected by the opaque after and before cursors. Links using
+    the older ?page= number are still served by Django's paginator.
+
+    Posts whose image is still being uploaded are left out.
+
+    Rendered pages are cached until a post, comment, profile or username
+    changes. Each post is rendered from its cached fragment, so only the
+    fragments of changed posts are rendered again. Clients revalidating an
+    unchanged page are sent a 304.
     """
 
-    queryset = Post.objects.all()
+    queryset = Post.objects.published().with_authors()
     template_name = "mainfeed/index.html"
     paginate_by = 10
+    # Unique ordering of the posts, which cursors seek through.
+    cursor_ordering = ('-created_on', '-id')
+    # The page already read by AsyncPostList, if any.
+    cursor_page = None
+
+    def get(self, request, *args, **kwargs):
+        """Serves the page from the cache, rendering and storing it when
+        it is not there.
+
+        Args:
+            request (HttpRequest): The request for a page of the feed.
+
+        Returns:
+            HttpResponse: a response containing the page of posts.
+        """
+
+        cache_key = feed_page_cache_key(request)
+        if cache_key is not None:
+            content = cache.get(cache_key)
+            if content is not None:
+                return HttpResponse(content)
+
+        response = super().get(request, *args, **kwargs)
+        if cache_key is not None:
+            response.add_post_render_callback(
+                lambda rendered: cache_feed_page(cache_key, rendered))
+        return response
+
+    def paginate_queryset(self, queryset, page_size):
+        """Paginates the posts by cursor unless a page number is requested.
+
+        Args:
+            queryset (QuerySet): The posts to paginate.
+            page_size (int): The number of posts on each page.
+
+        Returns:
+            tuple: the paginator, page, posts on the page and whether there
+            is more than one page.
+        """
+
+        if self.cursor_page is not None:
+            return self.cursor_page
+        if self.page_kwarg in self.request.GET:
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size,
+                                    ordering=self.cursor_ordering)
+        try:
+            page = paginator.page(after=self.request.GET.get('after'),
+                                  before=self.request.GET.get('before'))
+        except InvalidCursor as error:
+            raise Http404(f"Invalid cursor: {error}")
+        return (paginator, page, page.object_list, page.has_other_pages)
+
+
+class AsyncPostList(PostList):
+    """Async variant of PostList, served over ASGI.
+
+    The page of posts is read with the async ORM. The ETag, cache key and
+    rendering read the session and cache synchronously, so they run in a
+    thread. Links using the older ?page= number are served by PostList.
+    """
+
+    async def dispatch(self, request, *args, **kwargs):
+        # PostList's dispatch checks the ETag synchronously, so it is
+        # skipped for View's.
+        view = async_condition(etag_func=feed_etag)(
+            super(PostList, self).dispatch)
+        return await view(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        """Serves the page from the cache, reading and rendering it when
+        it is not there.
+
+        Args:
+            request (HttpRequest): The request for a page of the feed.
+
+        Returns:
+            HttpResponse: a response containing the page of posts.
+        """
+
+        if self.page_kwarg in request.GET:
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+
+        cache_key = await sync_to_async(feed_page_cache_key)(request)
+        if cache_key is not None:
+            content = await cache.aget(cache_key)
+            if content is not None:
+                return HttpResponse(content)
+
+        self.object_list = self.get_queryset()
+        paginator = KeysetPaginator(self.object_list, self.paginate_by,
+                                    ordering=self.cursor_ordering)
+        try:
+            page = await paginator.apage(after=request.GET.get('after'),
+                                         before=request.GET.get('before'))
+        except InvalidCursor as error:
+            raise Http404(f"Invalid cursor: {error}")
+        self.cursor_page = (paginator, page, page.object_list,
+                            page.has_other_pages)
+
+        response = self.render_to_response(self.get_context_data())
+        if cache_key is not None:
+            response.add_post_render_callback(
+                lambda rendered: cache_feed_page(cache_key, rendered))
+        return response
+
+
+class TagPostList(PostList):
+    """View to list the posts using a tag, newest first.
+
+    Pages are rendered, cached and paginated as in the main feed. The
+    posts are ordered by the creation time copied onto their tag, so each
+    page is read from the tag's index.
+    """
+
+    cursor_ordering = ('-tagged_on', '-id')
+
+    def get_queryset(self):
+        self.tag = get_object_or_404(Tag, name=normalise_tag(
+            self.kwargs['tag_name']))
+        return (super().get_queryset().filter(post_tags__tag=self.tag)
+                .annotate(tagged_on=F('post_tags__created_on'))
+                .order_by(*self.cursor_ordering))
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tag'] = self.tag
+        return context
 
+
+def comment_paginator(post):
+    """Builds the paginator of a post's comments, oldest first, with their
+    authors loaded."""
+
+    comments = post.comments.select_related('author__user')
+    return KeysetPaginator(comments, COMMENTS_PER_PAGE,
+                           ordering=Comment.THREAD_ORDERING)
+
+
+def paginate_comments(request, post):
+    """Gets the page of a post's comments selected by the request.
+
+    Comments are paged oldest first by the after and before cursors
+    included in the request.
+
+    Args:
+        request (HttpRequest): The request that may include a cursor.
+        post (Post): The post whose comments are paginated.
+
+    Returns:
+        CursorPage: the page of comments with their authors loaded.
+
+    Raises:
+        Http404: if the cursor included in the request is invalid.
+    """
+
+    paginator = comment_paginator(post)
+    try:
+        return paginator.page(after=request.GET.get('after'),
+                              before=request.GET.get('before'))
+    except InvalidCursor as error:
+        raise Http404(f"Invalid cursor: {error}")
+
+
+async def apaginate_comments(request, post):
+    """Async version of paginate_comments, reading with the async ORM."""
+
+    paginator = comment_paginator(post)
+    try:
+        return await paginator.apage(after=request.GET.get('after'),
+                                     before=request.GET.get('before'))
+    except InvalidCursor as error:
+        raise Http404(f"Invalid cursor: {error}")
+
+
+@condition(etag_func=post_etag)
 def view_post(request, post_id):
     """Handles a request to view a post.
 
@@ -32,12 +244,165 @@ def view_post(request, post_id):
         HttpResponse: a response containing the post to render.
     """
 
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.select_related('author__user'),
+                             pk=post_id)
     return render(
         request,
         "mainfeed/view_post.html",
         {
             "post": post,
+            "comment_page": paginate_comments(request, post),
+        },
+    )
+
+
+@async_condition(etag_func=post_etag)
+async def async_view_post(request, post_id):
+    """Async variant of view_post, served over ASGI.
+
+    The post and its comments are read with the async ORM and the page is
+    rendered in a thread.
+
+    Args:
+        request (HttpRequest): The request to render the post.
+        post_id (int): The id of the post to display.
+
+    Returns:
+        HttpResponse: a response containing the post to render.
+    """
+
+    post = await aget_object_or_404(
+        Post.objects.select_related('author__user'), pk=post_id)
+    comment_page = await apaginate_comments(request, post)
+    return await sync_to_async(render)(
+        request,
+        "mainfeed/view_post.html",
+        {
+            "post": post,
+            "comment_page": comment_page,
+        },
+    )
+
+
+def comment_list(request, post_id):
+    """Handles a request for a page of a post's comments.
+
+    The page is rendered as a fragment to replace the button that
+    requested it in the comment thread of a post, with the edit and delete
+    buttons of the viewer's own comments layered on. Only the button
+    loading the comments further in the same direction is included.
+
+    Args:
+        request (HttpRequest): The request including the page cursor.
+        post_id (int): The id of the post whose comments to display.
+
+    Returns:
+        HttpResponse: a response containing the page of comments.
+    """
+
+    post = get_object_or_404(Post, pk=post_id)
+    if request.GET.get('before'):
+        direction = 'before'
+    elif request.GET.get('after'):
+        direction = 'after'
+    else:
+        direction = None
+    fragment = render_to_string(
+        "mainfeed/comment_list.html",
+        {
+            "post": post,
+            "comment_page": paginate_comments(request, post),
+            "direction": direction,
+        },
+        request,
+    )
+    return HttpResponse(layer_viewer_controls(fragment, request.user))
+
+
+def post_fragment(request, post_id):
+    """Handles a request for a published post as it is shown in the feed.
+
+    Feeds kept up to date by feed_events fetch new and changed posts one
+    fragment at a time rather than reloading the page.
+
+    Args:
+        request (HttpRequest): The request for the post.
+        post_id (int): The id of the post to render.
+
+    Returns:
+        HttpResponse: a response containing the post's feed fragment.
+    """
+
+    post = get_object_or_404(Post.objects.published().with_authors(),
+                             pk=post_id)
+    return HttpResponse(render_post_fragments([post], request.user)[0])
+
+
+async def feed_events(request):
+    """Handles a request for the stream of new posts and comments.
+
+    Served over ASGI, the events are streamed as server-sent events for as
+    long as the browser stays, each idle stream waiting without holding a
+    thread or database connection. Served over WSGI, where a held-open
+    stream would hold a worker, only the events missed since the browser's
+    Last-Event-ID are sent, and the browser polls for more.
+
+    Args:
+        request (HttpRequest): The request, which may include the id of the
+        last event the browser received.
+
+    Returns:
+        HttpResponse: a response containing the stream of events.
+    """
+
+    broker = get_event_broker()
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else None
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(
+            stream_events(broker, last_event_id),
+            content_type='text/event-stream')
+    else:
+        events = await sync_to_async(poll_events)(broker, last_event_id)
+        response = HttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stops proxies such as nginx holding back events to buffer them.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def search(request):
+    """Handles a request to search posts by their text and comments.
+
+    Posts matching the search in the q parameter are listed best match
+    first, paged by the after and before cursors included in the request.
+    Posts whose image is still being uploaded are left out.
+
+    Args:
+        request (HttpRequest): The request including the search.
+
+    Returns:
+        HttpResponse: a response containing the page of matching posts, or
+        only the search form if nothing was searched for.
+    """
+
+    query = request.GET.get('q', '').strip()
+    page = None
+    if query:
+        posts = Post.objects.published().with_authors().search(query)
+        paginator = KeysetPaginator(posts, SEARCH_RESULTS_PER_PAGE,
+                                    ordering=SEARCH_ORDERING)
+        try:
+            page = paginator.page(after=request.GET.get('after'),
+                                  before=request.GET.get('before'))
+        except InvalidCursor as error:
+            raise Http404(f"Invalid cursor: {error}")
+    return render(
+        request,
+        "mainfeed/search.html",
+        {
+            "query": query,
+            "page_obj": page,
         },
     )
 
@@ -46,9 +411,13 @@ def create_post(request):
     """Handles POST and GET requests related to post creation.
 
     For POST requests, a new post is added to the database:
-        - The post has its image and text fields set according to the form
-        contents included in the request.
+        - The post has its text field set according to the form contents
+        included in the request.
         - The user who submitted the form is set as the author.
+        - The post is tagged with the hashtags used in its text.
+        - The image is staged for the upload worker, which publishes the
+        post once the image is uploaded. The size it will be stored at is
+        recorded straight away.
 
     For GET requests, render the webpage for creating posts.
 
@@ -74,36 +443,32 @@ def create_post(request):
 
     # Handle if POST request
     if request.method == "POST":
-        post_form = PostForm(request.POST, request.FILES)
+        post_form = PostForm(request.POST, request.FILES, defer_upload=True)
 
-        # Get the image from the request.
-        # If unable then add an error to form to make it invalid.
-        try:
-            image = request.FILES.get('image')
-            content_type = image.content_type
-            valid_content = ["image/jpeg", "image/png", "image/svg+xml"]
-            if content_type not in valid_content:
-                messages.add_message(
-                    request, messages.ERROR,
-                    'File uploaded not one of the accepted types. '
-                    'Please try uploading an image of JPG, PNG or SVG format.'
-                )
-                raise ValueError(
-                    f'File content_type not in {valid_content}. '
-                    + 'Instead it was {content_type}.')
-        except (AttributeError, ValueError) as error:
-            post_form.add_error('image', error)
+        # The image is checked by its content when the form is cleaned.
+        # Tell the user if it was not an accepted type or was too large.
+        if post_form.has_error('image', code='invalid_image'):
+            messages.add_message(request, messages.ERROR,
+                                 post_form.errors['image'][0])
 
         # Save valid post or redirect on error.
         if post_form.is_valid():
-            profile_queryset = UserProfile.objects.filter(user=request.user)
-            author_profile = get_object_or_404(profile_queryset)
+            image = post_form.cleaned_data['image']
+            options = post_form.fields['image'].options
             post = post_form.save(commit=False)
-            post.author = author_profile
-            post.save()
+            post.author_id = get_profile_id(request)
+            post.image = ''
+            post.image_status = ImageStatus.PROCESSING
+            post.image_width, post.image_height = limited_size(
+                image.image_info.width, image.image_info.height, options)
+            with transaction.atomic():
+                post.save()
+                tag_posts([post], created=True)
+                stage_upload(image, options, post=post)
             messages.add_message(
                 request, messages.SUCCESS,
-                'Post submitted successfully!'
+                'Post submitted successfully! '
+                'It will appear in the feed once its image is processed.'
             )
             return HttpResponseRedirect(reverse('feed'))
         else:
@@ -131,6 +496,7 @@ def edit_post(request, post_id):
     For POST requests, the target post in the database is updated:
         - The post has its text field set according to the form contents
         included in the request.
+        - The post's tags are updated to the hashtags used in its text.
 
     For GET requests, render the webpage for editing a target post.
 
@@ -148,10 +514,12 @@ def edit_post(request, post_id):
             and the post edit form to render.
     """
 
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.select_related('author__user'),
+                             pk=post_id)
 
     # Redirect unauthorised users back to home page
-    if not request.user.is_authenticated or request.user != post.author.user:
+    if (not request.user.is_authenticated
+            or post.author.user_id != request.user.id):
         messages.add_message(
             request, messages.ERROR,
             'Not authorised to edit this post!'
@@ -163,8 +531,10 @@ def edit_post(request, post_id):
         post_form = PostTextForm(request.POST, instance=post)
 
         # Save valid post update or redirect on error.
-        if post_form.is_valid() and post.author.user == request.user:
-            post = post_form.save(commit=True)
+        if post_form.is_valid():
+            with transaction.atomic():
+                post = post_form.save(commit=True)
+                tag_posts([post])
             messages.add_message(request, messages.SUCCESS, 'Post updated!')
         else:
             messages.add_message(request, messages.ERROR,
@@ -179,6 +549,7 @@ def edit_post(request, post_id):
             "mainfeed/edit_post.html",
             {
                 "post": post,
+                "comment_page": paginate_comments(request, post),
                 "post_text_form": post_text_form,
             },
         )
@@ -195,10 +566,12 @@ def delete_post(request, post_id):
         HttpResponse: a redirect request including a success message.
     """
 
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             pk=post_id)
 
     # Delete post if authorised or redirect on error.
-    if request.user.is_authenticated and request.user == post.author.user:
+    if (request.user.is_authenticated
+            and post.author.user_id == request.user.id):
         post.delete()
         messages.add_message(request, messages.SUCCESS, 'Post deleted!')
     else:
@@ -207,6 +580,7 @@ def delete_post(request, post_id):
     return HttpResponseRedirect(reverse('feed'))
 
 
+@condition(etag_func=post_etag)
 def view_comment(request, post_id, comment_id):
     """Handles a request to view a comment.
 
@@ -220,14 +594,50 @@ def view_comment(request, post_id, comment_id):
         corresponding post to render.
     """
 
-    post = get_object_or_404(Post, pk=post_id)
-    comment = get_object_or_404(Comment, pk=comment_id)
+    post = get_object_or_404(Post.objects.select_related('author__user'),
+                             pk=post_id)
+    comment = get_object_or_404(
+        Comment.objects.select_related('author__user'), pk=comment_id,
+        post_id=post_id)
 
     return render(
         request,
         "mainfeed/view_comment.html",
         {
             "post": post,
+            "comment_page": paginate_comments(request, post),
+            "comment": comment
+        },
+    )
+
+
+@async_condition(etag_func=post_etag)
+async def async_view_comment(request, post_id, comment_id):
+    """Async variant of view_comment, served over ASGI.
+
+    Args:
+        request (HttpRequest): The request to render the comment.
+        post_id (int): The id of the post containing the comment.
+        comment_id (int): The id of the comment to display.
+
+    Returns:
+        HttpResponse: a response containing the comment and its
+        corresponding post to render.
+    """
+
+    post = await aget_object_or_404(
+        Post.objects.select_related('author__user'), pk=post_id)
+    comment = await aget_object_or_404(
+        Comment.objects.select_related('author__user'), pk=comment_id,
+        post_id=post_id)
+    comment_page = await apaginate_comments(request, post)
+
+    return await sync_to_async(render)(
+        request,
+        "mainfeed/view_comment.html",
+        {
+            "post": post,
+            "comment_page": comment_page,
             "comment": comment
         },
     )
@@ -241,6 +651,8 @@ def create_comment(request, post_id):
         contents included in the request.
         - The user who submitted the form is set as the author.
         - The comment is linked to its corresponding post.
+        - The comment count of the post is incremented in the same
+        transaction.
 
     For GET requests, render the webpage for creating comments.
 
@@ -257,7 +669,11 @@ def create_comment(request, post_id):
             and comment create form to render.
     """
 
-    post = get_object_or_404(Post, pk=post_id)
+    # Only the page rendered for GET requests shows the post's author.
+    if request.method == "POST":
+        post = get_object_or_404(Post, pk=post_id)
+    else:
+        post = get_object_or_404(Post.objects.with_authors(), pk=post_id)
 
     # Redirect unauthenticated users back to home page.
     if not request.user.is_authenticated:
@@ -273,13 +689,13 @@ def create_comment(request, post_id):
 
         # Save valid post or redirect on error.
         if comment_form.is_valid():
-            queryset = Post.objects.filter(pk=post_id)
-            profile_queryset = UserProfile.objects.filter(user=request.user)
-            author_profile = get_object_or_404(profile_queryset)
             comment = comment_form.save(commit=False)
-            comment.post = get_object_or_404(queryset)
-            comment.author = author_profile
-            comment.save()
+            comment.post = post
+            comment.author_id = get_profile_id(request)
+            with transaction.atomic():
+                comment.save()
+                Post.objects.filter(pk=post.id).update(
+                    comment_count=F('comment_count') + 1)
             messages.add_message(
                 request, messages.SUCCESS,
                 'Comment submitted successfully!'
@@ -294,14 +710,13 @@ def create_comment(request, post_id):
 
     # Render page if GET request.
     else:
-        post = get_object_or_404(Post, pk=post_id)
-
         comment_form = CommentForm()
         return render(
             request,
             "mainfeed/create_comment.html",
             {
                 "post": post,
+                "comment_page": paginate_comments(request, post),
                 "comment_form": comment_form,
             },
         )
@@ -330,11 +745,13 @@ def edit_comment(request, post_id, comment_id):
             and comment edit form to render.
     """
 
-    comment = get_object_or_404(Comment, pk=comment_id)
+    comment = get_object_or_404(
+        Comment.objects.select_related('author__user', 'post__author__user'),
+        pk=comment_id, post_id=post_id)
 
     # Redirect unauthorised users back to home page.
     if (not request.user.is_authenticated
-            or request.user != comment.author.user):
+            or comment.author.user_id != request.user.id):
         messages.add_message(
             request, messages.ERROR,
             'Not authorised to edit this comment!'
@@ -346,7 +763,7 @@ def edit_comment(request, post_id, comment_id):
         comment_form = CommentForm(request.POST, instance=comment)
 
         # Save valid comment update or redirect on error.
-        if comment_form.is_valid() and comment.author.user == request.user:
+        if comment_form.is_valid():
             comment = comment_form.save(commit=True)
             messages.add_message(request, messages.SUCCESS, 'Comment updated!')
         else:
@@ -356,14 +773,13 @@ def edit_comment(request, post_id, comment_id):
 
     # Render page if GET request.
     else:
-        post = get_object_or_404(Post, pk=post_id)
-        comment = get_object_or_404(Comment, pk=comment_id)
         comment_form = CommentForm(initial={'body': comment.body})
         return render(
             request,
             "mainfeed/edit_comment.html",
             {
-                "post": post,
+                "post": comment.post,
+                "comment_page": paginate_comments(request, comment.post),
                 "comment": comment,
                 "comment_form": comment_form,
             },
@@ -373,6 +789,10 @@ def edit_comment(request, post_id, comment_id):
 def delete_comment(request, comment_id):
     """Handles a request to delete a comment.
 
+    The comment count of its post is decremented in the same transaction,
+    only if the comment was deleted by this request rather than by another
+    one racing it.
+
     Args:
         request (HttpRequest): The request to process the deletion.
         comment_id (int): The id of the comment to delete.
@@ -382,12 +802,40 @@ def delete_comment(request, comment_id):
     """
 
     # Delete comment if authorised or redirect on error.
-    comment = get_object_or_404(Comment, pk=comment_id)
-
-    if request.user.is_authenticated and comment.author.user == request.user:
-        comment.delete()
+    comment = get_object_or_404(Comment.objects.select_related('author'),
+                                pk=comment_id)
+
+    if (request.user.is_authenticated
+            and comment.author.user_id == request.user.id):
+        with transaction.atomic():
+            deleted, _ = comment.delete()
+            if deleted:
+                Post.objects.filter(
+                    pk=comment.post_id, comment_count__gt=0
+                ).update(comment_count=F('comment_count') - 1)
         messages.add_message(request, messages.SUCCESS, 'Comment deleted!')
     else:
         messages.add_message(request, messages.ERROR,
                              'Not authorised to delete this comment!')
     return HttpResponseRedirect(reverse('feed'))
+
+
+@staff_member_required
+def request_metrics(request):
+    """Handles a request from staff for the rolling summary of request
+    metrics.
+
+    Args:
+        request (HttpRequest): The request to render the summary.
+
+    Returns:
+        HttpResponse: a response containing the metrics of each view.
+    """
+
+    return render(
+        request,
+        "mainfeed/request_metrics.html",
+        {
+            "rows": summary.rows(),
+        },
+    )
@@ -2,39 +2,36 @@
  * Adds the ability to trigger the delete confirmation modal and 
  * sets its contents depending on whether it was triggered by a 
  * post or comment.
+ *
+ * Clicks are handled on the document so that buttons in comments 
+ * loaded after the page also open the modal.
  */
 const deleteModal = new bootstrap.Modal(document.getElementById("deleteModal"));
-const deletePostButtons = document.getElementsByClassName("delete-post-button");
-const deleteCommentButtons = document.getElementsByClassName("delete-comment-button");
 const deleteConfirm = document.getElementById("deleteConfirm");
 const deleteModalLabel = document.getElementById("deleteModalLabel");
 const deleteModalBody = document.getElementById("deleteModalBody");
 
-for (let button of deletePostButtons) {
-  button.addEventListener("click", (e) => {
-    updateModal(e, "post");
-    deleteModal.show();
-  });
-}
-
-for (let button of deleteCommentButtons) {
-  button.addEventListener("click", (e) => {
-    updateModal(e, "comment");
-    deleteModal.show();
-  });
-}
+document.addEventListener("click", (e) => {
+  for (let contentType of ["post", "comment"]) {
+    let button = e.target.closest(`.delete-${contentType}-button`);
+    if (button) {
+      updateModal(button, contentType);
+      deleteModal.show();
+    }
+  }
+});
 
 /**
  * Updates the delete modal content depending on whether it was triggered
  * from a post or comment.
  *
- * @param {Event} e - The event object from the button click.
+ * @param {Element} button - The delete button that was clicked.
  * @param {string} contentType - The type of content being deleted.
  */
-function updateModal(e, contentType) {
+function updateModal(button, contentType) {
   let contentIdKey = `data-${contentType}-id`;
-  let contentId = e.target.getAttribute(contentIdKey);
+  let contentId = button.getAttribute(contentIdKey);
   deleteModalLabel.innerText = `Delete ${contentType}?`;
   deleteModalBody.innerText = `Are you sure you want to delete your ${contentType}? This action cannot be undone.`;
   deleteConfirm.href = `/delete-${contentType}/${contentId}`;
-}
\ No newline at end of file
+}
@@ -2,21 +2,21 @@
  * Adds the ability to copy a URL to the content by 
  * clicking on buttons with class "copy-link".
  * 
- * An event listener is added to these buttons which copies 
- * the link to the clipboard and then gives a pop-up as 
- * feedback.
+ * A click listener on the document copies the link of the 
+ * clicked button to the clipboard and then gives a pop-up as 
+ * feedback. This includes buttons in comments loaded after 
+ * the page.
  */
-const copyLinkItems = document.querySelectorAll('.copy-link');
-
-for (let item of copyLinkItems) {
-  let link = item.getAttribute('href');
-  item.addEventListener("click", (e) => {
-    e.preventDefault();
-    let textToCopy = window.location.origin;
-    textToCopy += link;
-    navigator.clipboard.writeText(textToCopy)
-      .then(() => {
-        alert('Link copied to clipboard!');
-      });
-  });
-}
\ No newline at end of file
+document.addEventListener("click", (e) => {
+  let item = e.target.closest(".copy-link");
+  if (!item) {
+    return;
+  }
+  e.preventDefault();
+  let textToCopy = window.location.origin;
+  textToCopy += item.getAttribute('href');
+  navigator.clipboard.writeText(textToCopy)
+    .then(() => {
+      alert('Link copied to clipboard!');
+    });
+});
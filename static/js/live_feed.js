@@ -0,0 +1,49 @@
+/**
+ * Keeps the first page of the feed up to date while it is open.
+ *
+ * New posts and comments are announced by the event stream at the URL
+ * in the data-events-url attribute of the feed. Only the fragment of the
+ * post concerned is fetched: new posts are added to the top of the feed
+ * and posts shown on it are replaced when they are commented on.
+ */
+let liveFeed = document.querySelector("[data-events-url]");
+
+function fetchPostFragment(url) {
+  return fetch(url).then((response) => {
+    if (!response.ok) {
+      throw new Error(`Failed to load post: ${response.status}`);
+    }
+    return response.text();
+  });
+}
+
+if (liveFeed && window.EventSource) {
+  let events = new EventSource(liveFeed.dataset.eventsUrl);
+
+  events.addEventListener("post", (e) => {
+    let data = JSON.parse(e.data);
+    if (liveFeed.querySelector(`[data-post-id="${data.post}"]`)) {
+      return;
+    }
+    fetchPostFragment(data.url)
+      .then((html) => {
+        liveFeed.insertAdjacentHTML("afterbegin", html);
+      })
+      .catch(() => {});
+  });
+
+  events.addEventListener("comment", (e) => {
+    let data = JSON.parse(e.data);
+    if (!liveFeed.querySelector(`[data-post-id="${data.post}"]`)) {
+      return;
+    }
+    fetchPostFragment(data.url)
+      .then((html) => {
+        let post = liveFeed.querySelector(`[data-post-id="${data.post}"]`);
+        if (post) {
+          post.outerHTML = html;
+        }
+      })
+      .catch(() => {});
+  });
+}
@@ -0,0 +1,28 @@
+/**
+ * Adds the ability to load further comments of a post by clicking
+ * on buttons with class "load-comments-button".
+ *
+ * The button is replaced by the page of comments fetched from the
+ * URL in its data-url attribute. The fetched page includes its own
+ * buttons to load any comments either side of it.
+ */
+document.addEventListener("click", (e) => {
+  let button = e.target.closest(".load-comments-button");
+  if (!button) {
+    return;
+  }
+  button.disabled = true;
+  fetch(button.dataset.url)
+    .then((response) => {
+      if (!response.ok) {
+        throw new Error(`Failed to load comments: ${response.status}`);
+      }
+      return response.text();
+    })
+    .then((html) => {
+      button.parentElement.outerHTML = html;
+    })
+    .catch(() => {
+      button.disabled = false;
+    });
+});
@@ -1,6 +1,6 @@
-from cloudinary.forms import CloudinaryFileField, CloudinaryInput
 from django import forms
 from django.contrib.auth.models import User
+from mainfeed.images import ImageFileField
 
 from .models import UserProfile
 
@@ -10,13 +10,21 @@ class UserProfileForm(forms.ModelForm):
         model = UserProfile
         fields = ('image', 'bio',)
 
-    image = CloudinaryFileField(
+    image = ImageFileField(
         options={"folder": "foodfeed/",
                  "crop": "limit", "width": 600, "height": 600, })
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, defer_upload=False, **kwargs):
+        """Builds the form.
+
+        Args:
+            defer_upload (bool): Leave the cleaned image as the submitted
+            file, for the upload worker, instead of uploading it.
+        """
+
         super(UserProfileForm, self).__init__(*args, **kwargs)
         self.fields['image'].required = False
+        self.fields['image'].autosave = not defer_upload
         self.fields['image'].label = "Profile picture"
 
 
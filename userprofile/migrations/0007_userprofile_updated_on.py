@@ -0,0 +1,21 @@
+# Generated by Django 4.2.25 on 2026-10-18 10:12
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userprofile', '0006_alter_userprofile_bio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='updated_on',
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.25 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+def record_image_public_ids(apps, schema_editor):
+    """Sets the image public id of each existing profile."""
+
+    UserProfile = apps.get_model('userprofile', 'UserProfile')
+    for profile in UserProfile.objects.exclude(image='').iterator():
+        UserProfile.objects.filter(pk=profile.pk).update(
+            image_public_id=profile.image.public_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('userprofile', '0007_userprofile_updated_on'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='image_public_id',
+            field=models.CharField(blank=True, db_index=True, editable=False,
+                                   max_length=255),
+        ),
+        migrations.RunPython(record_image_public_ids,
+                             migrations.RunPython.noop),
+    ]
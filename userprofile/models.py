@@ -18,6 +18,11 @@ class UserProfile(models.Model):
         related_name="user_profile")
     bio = models.TextField(max_length=800, blank=True)
     image = CloudinaryField('image', default='no-profile-image')
+    # The public id of the image, kept in step with it on saving, so the
+    # deletion worker can find the profiles showing an image by index.
+    image_public_id = models.CharField(max_length=255, blank=True,
+                                       editable=False, db_index=True)
+    updated_on = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.user}"
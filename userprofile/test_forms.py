@@ -1,8 +1,6 @@
-import cloudinary.api
-import requests
-from cloudinary.uploader import destroy
-from django.core.files.base import ContentFile
 from django.test import TestCase
+from mainfeed.images import destroy_image
+from mainfeed.testing import make_test_image
 
 from .forms import UserForm, UserProfileForm
 
@@ -13,15 +11,7 @@ class TestProfileUserForm(TestCase):
     def test_form_is_valid(self):
         """Tests that UserProfileForm accepts valid bio and image fields."""
 
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-
-        test_image = requests.get(test_image_url)
-
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         form = UserProfileForm({'bio': 'Test bio text'}, image)
 
@@ -29,20 +19,13 @@ class TestProfileUserForm(TestCase):
                         msg='Form is not valid, but it should be.')
 
         uploaded_asset_id = form.cleaned_data['image'].public_id
-        cloudinary.uploader.destroy(uploaded_asset_id)
+        destroy_image(uploaded_asset_id)
 
     def test_form_is_missing_bio(self):
         """Tests that UserProfileForm accepts submissions with empty bio
         field."""
 
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         form = UserProfileForm(data={'bio': ''}, files=image)
 
@@ -50,7 +33,7 @@ class TestProfileUserForm(TestCase):
             form.is_valid(),
             msg='Form is invalid, but empty bio should be accepted.')
         uploaded_asset_id = form.cleaned_data['image'].public_id
-        cloudinary.uploader.destroy(uploaded_asset_id)
+        destroy_image(uploaded_asset_id)
 
     def test_form_is_missing_image(self):
         """Tests that UserProfileForm accepts submissions with empty image
@@ -1,15 +1,13 @@
-import cloudinary.api
-import requests
-from cloudinary.uploader import destroy
 from django.contrib.auth.models import User
 from django.contrib.messages import get_messages
-from django.core.files.base import ContentFile
-from django.core.files.uploadedfile import SimpleUploadedFile
 from django.shortcuts import get_object_or_404
 from django.test import TestCase
 from django.urls import reverse
 from mainfeed.forms import PostForm
+from mainfeed.images import destroy_image
 from mainfeed.models import Post
+from mainfeed.testing import make_invalid_file, make_test_image
+from mainfeed.uploads import process_pending_uploads
 
 from userprofile.forms import UserForm, UserProfileForm
 from userprofile.models import UserProfile
@@ -54,17 +52,8 @@ class TestUserProfileView(TestCase):
         self.profile_id = user_profile.id
 
         # Get test image and create image objects for test posts.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
-
-        test_image_content_2 = ContentFile(test_image.content)
-        test_image_content_2.name = 'test_image.jpg'
-        image2 = {'image': test_image_content_2}
+        image = {'image': make_test_image()}
+        image2 = {'image': make_test_image()}
 
         # Create test posts.
         post_form_1 = PostForm({'text': 'Test post one'}, image)
@@ -103,7 +92,7 @@ class TestUserProfileView(TestCase):
         self.assertIn(b"Test post two", response.content)
 
         post_list = self.post_list
-        [cloudinary.uploader.destroy(post.image.public_id)
+        [destroy_image(post.image.public_id)
          for post in post_list]
 
 
@@ -131,12 +120,7 @@ class TestUserProfileEditView(TestCase):
             password="password"
         )
 
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        test_image_content = ContentFile(test_image.content)
-        test_image_content.name = 'test_image.jpg'
-        image = {'image': test_image_content}
+        image = {'image': make_test_image()}
 
         user_profile_set_bio_image = self.user_set_bio_image.user_profile
         user_profile_set_bio_image_form = UserProfileForm(
@@ -253,12 +237,7 @@ class TestUserProfileEditView(TestCase):
             username="test_no_bio_or_image", password="password")
 
         # Set up details and then make the post request.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        new_image = SimpleUploadedFile(name="new profile image",
-                                       content=test_image.content,
-                                       content_type="image/jpeg")
+        new_image = make_test_image(name="new profile image")
 
         post_data = {
             'username': 'new_username',
@@ -279,16 +258,22 @@ class TestUserProfileEditView(TestCase):
             UserProfile, pk=self.profile_id_no_bio_image)
         self.assertEqual('new_username', profile.user.username)
         self.assertEqual('new test bio', profile.bio)
-        self.assertNotEqual('no-profile-image', profile.image)
-        if not hasattr(profile.image, 'public_id'):
-            self.fail
+        self.assertEqual('no-profile-image', profile.image.public_id)
 
         # Check messages provided to user.
         messages = list(get_messages(response.wsgi_request))
         self.assertEqual(1, len(messages))
-        self.assertEqual("Profile updated!", str(messages[0]))
+        self.assertEqual(
+            "Profile updated! "
+            "Your new picture will appear once it is processed.",
+            str(messages[0]))
         self.assertEqual('success', messages[0].level_tag)
 
+        # Verify the image is set once the worker uploads it.
+        self.assertEqual(1, process_pending_uploads())
+        profile.refresh_from_db()
+        self.assertTrue(profile.image.public_id.startswith('foodfeed/'))
+
     def test_profile_edits_no_update(self):
         """Tests that the view does not update the user profile when
         provided no changes from an authorised user."""
@@ -365,13 +350,7 @@ class TestUserProfileEditView(TestCase):
             username="test_set_bio_or_image", password="password")
 
         # Set up details and then make the post request.
-        cloudinary_test_image = cloudinary.api.resource(
-            "invalid_content_type_file")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        new_image = SimpleUploadedFile(name="invalid_content_type_file",
-                                       content=test_image.content,
-                                       content_type="application/pdf")
+        new_image = make_invalid_file()
 
         post_data = {
             'username': self.user_profile_set_bio_image.user.username,
@@ -414,12 +393,7 @@ class TestUserProfileEditView(TestCase):
             username="test_set_bio_or_image", password="password")
 
         # Set up details and then make the post request.
-        cloudinary_test_image = cloudinary.api.resource("test_image")
-        test_image_url = cloudinary_test_image.get('url')
-        test_image = requests.get(test_image_url)
-        new_image = SimpleUploadedFile(name="new profile image",
-                                       content=test_image.content,
-                                       content_type="image/jpeg")
+        new_image = make_test_image(name="new profile image")
 
         post_data = {
             'username': self.user_profile_set_bio_image.user.username,
@@ -452,5 +426,5 @@ class TestUserProfileEditView(TestCase):
     def tearDown(self):
         """Deletes Cloudinary resources uploaded during testing."""
 
-        cloudinary.uploader.destroy(
+        destroy_image(
             self.user_profile_set_bio_image.image.public_id)
@@ -1,12 +1,19 @@
-import cloudinary.api
-from cloudinary.uploader import destroy
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 from django.contrib import messages
 from django.db.models.signals import post_save
+from django.db import transaction
 from django.dispatch import receiver
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render, reverse
-
+from django.views.decorators.http import condition
+
+from mainfeed.conditional import async_condition, profile_etag
+from mainfeed.deletions import queue_image_deletions
+from mainfeed.models import PendingUpload
+from mainfeed.shortcuts import aget_object_or_404, aget_user
+from mainfeed.uploads import stage_upload
+from mainfeed.validation import InvalidImage, inspect_image
 from userprofile.models import UserProfile
 
 from .forms import UserForm, UserProfileForm
@@ -22,6 +29,26 @@ def create_user_profile(sender, instance, created, **kwargs):
         UserProfile.objects.create(user=instance)
 
 
+def profile_posts(profile, viewer):
+    """Gets the posts shown on a profile page, with their authors loaded.
+
+    Owners also see their posts whose image is still being uploaded.
+
+    Args:
+        profile (UserProfile): The profile whose posts to show.
+        viewer (Union[User, AnonymousUser]): The user viewing the page.
+
+    Returns:
+        QuerySet: the posts to show.
+    """
+
+    users_posts = profile.users_posts.with_authors()
+    if viewer != profile.user:
+        users_posts = users_posts.published()
+    return users_posts
+
+
+@condition(etag_func=profile_etag)
 def view_user_profile(request, user_profile_id):
     """Handles POST and GET requests related to profile editing.
 
@@ -39,16 +66,45 @@ def view_user_profile(request, user_profile_id):
         (HttpResponse): a response containing the profile page to render.
     """
 
-    profile = get_object_or_404(UserProfile, pk=user_profile_id)
-
-    users_posts = profile.users_posts.all()
+    profile = get_object_or_404(
+        UserProfile.objects.select_related('user'), pk=user_profile_id)
 
     return render(
         request,
         "userprofile/profile.html",
         {
             "profile": profile,
-            "posts": users_posts,
+            "posts": profile_posts(profile, request.user),
+        },
+    )
+
+
+@async_condition(etag_func=profile_etag)
+async def async_view_user_profile(request, user_profile_id):
+    """Async variant of view_user_profile, served over ASGI.
+
+    The profile and its posts are read with the async ORM and the page is
+    rendered in a thread.
+
+    Args:
+        request (HttpRequest): The request for the profile page.
+        user_profile_id (int): The id of the user profile to display.
+
+    Returns:
+        (HttpResponse): a response containing the profile page to render.
+    """
+
+    profile = await aget_object_or_404(
+        UserProfile.objects.select_related('user'), pk=user_profile_id)
+
+    users_posts = profile_posts(profile, await aget_user(request))
+
+    return await sync_to_async(render)(
+        request,
+        "userprofile/profile.html",
+        {
+            "profile": profile,
+            "posts": [post async for post in users_posts],
         },
     )
 
@@ -74,9 +130,11 @@ def edit_user_profile(request, user_profile_id):
             and the profile edit form to render.
     """
 
-    profile = get_object_or_404(UserProfile, pk=user_profile_id)
+    profile = get_object_or_404(UserProfile.objects.select_related('user'),
+                                pk=user_profile_id)
 
-    if not request.user.is_authenticated or request.user != profile.user:
+    if (not request.user.is_authenticated
+            or profile.user_id != request.user.id):
         messages.add_message(
             request, messages.ERROR,
             'Unauthorised to edit this profile!'
@@ -117,8 +175,11 @@ def handle_user_profile_edits(request, profile):
 
     The image value is determined by handle_set_image to set the image
     depending on the delete_image_toggle and if a file was submitted.
-    If remove_image_checked is True then the image will be set to the default
-    placeholder and the previous image hosted on cloudinary will be deleted.
+    A submitted image is staged for the upload worker, which gives it to
+    the profile once uploaded. If remove_image_checked is True then the
+    image will be set to the default placeholder, any staged image will be
+    discarded and the previous image hosted on cloudinary will be queued
+    for deletion.
 
     Any valid changes found will be saved to the corresponding profile via
     saving of the respective form objects. The UserProfile includes a key to
@@ -147,24 +208,32 @@ def handle_user_profile_edits(request, profile):
     if no_changes_made:
         return
 
+    current_image = profile.image
     user_profile_form = UserProfileForm(
-        data={'bio': bio}, files={'image': image}, instance=profile)
+        data={'bio': bio}, files={'image': image}, instance=profile,
+        defer_upload=True)
     user_form = UserForm(data={'username': username}, instance=profile.user)
 
     if user_profile_form.is_valid() and user_form.is_valid():
         profile = user_profile_form.save(commit=False)
 
-        if remove_image_checked:
-            uploaded_asset_id = profile.image.public_id
-            cloudinary.uploader.destroy(uploaded_asset_id)
-            profile.image = 'no-profile-image'
-
-        profile.save()
-        user_form.save(commit=True)
-        messages.add_message(
-            request, messages.SUCCESS,
-            'Profile updated!'
-        )
+        with transaction.atomic():
+            if remove_image_checked:
+                PendingUpload.objects.filter(profile=profile).delete()
+                queue_image_deletions([profile.image])
+                profile.image = 'no-profile-image'
+            elif image is not None:
+                # Keep the current image until the new one is uploaded.
+                profile.image = current_image
+                stage_upload(image, user_profile_form.fields['image'].options,
+                             profile=profile)
+            profile.save()
+            user_form.save(commit=True)
+
+        message = 'Profile updated!'
+        if image is not None:
+            message += ' Your new picture will appear once it is processed.'
+        messages.add_message(request, messages.SUCCESS, message)
     else:
         messages.add_message(
             request, messages.ERROR,
@@ -175,9 +244,10 @@ def handle_user_profile_edits(request, profile):
 def handle_set_image(request, remove_image_checked):
     """Gets the valid submitted image or returns none.
 
-    Valid image types are determined by the content-type property
-    included in the request. Invalid file types are ignored and None is
-    returned instead.
+    Valid images are JPEG, PNG or SVG images no larger than the upload
+    limits, as determined by inspect_image from the file's content rather
+    than the content-type included in the request. Invalid files are
+    ignored and None is returned instead.
 
     Args:
         request (HttpRequest): The request to process user profile edits.
@@ -186,28 +256,24 @@ def handle_set_image(request, remove_image_checked):
 
     Returns:
         Union[MultiValueDict, None]:
-            - The image file of valid content-type
+            - The valid image file
             - None if no changes were found.
     """
 
     if remove_image_checked:
         return None
 
+    image = request.FILES.get('image')
+    if image is None:
+        return None
+
     try:
-        image = request.FILES.get('image')
-        content_type = image.content_type
-        valid_content = ["image/jpeg", "image/png", "image/svg+xml"]
-        if content_type not in valid_content:
-            raise ValueError
-    except AttributeError:
-        image = None
-    except ValueError:
-        image = None
+        inspect_image(image)
+    except InvalidImage as error:
         messages.add_message(
             request, messages.ERROR,
-            'File uploaded not one of the accepted types. '
-            + 'Please try uploading an image of JPG, PNG or SVG format. '
-            + 'No changes made to profile picture.'
+            f'{error} No changes made to profile picture.'
         )
+        return None
 
     return image